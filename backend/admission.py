@@ -0,0 +1,146 @@
+"""
+Contrôle d'admission du chatbot
+`/api/chat` est la route la plus coûteuse (appels au LLM et à la base). Pour
+qu'un pic de conversations n'affame pas les réservations et les tableaux de bord :
+- chaque client (compte connecté, sinon adresse IP) dispose d'un seau de jetons :
+  au-delà, 429 avec Retry-After;
+- le nombre de conversations simultanées est borné; quelques places sont
+  réservées au personnel connecté (admin, secrétaire, médecin);
+- une conversation qui n'obtient pas de place dans le délai d'attente est servie
+  en mode simulation (CHAT_DEGRADATION=simulation, par défaut) ou refusée en 503.
+L'état est propre à chaque processus.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from http.cookies import SimpleCookie
+from typing import NamedTuple
+
+from session_auth import COOKIE_NAME, decoder_session_token
+
+DEBIT_PAR_MINUTE = float(os.getenv("CHAT_DEBIT_PAR_MINUTE", "20"))
+RAFALE = float(os.getenv("CHAT_RAFALE", "5"))
+CONCURRENCE_MAX = int(os.getenv("CHAT_CONCURRENCE_MAX", "8"))
+PLACES_PERSONNEL = int(os.getenv("CHAT_PLACES_PERSONNEL", "2"))
+ATTENTE_S = float(os.getenv("CHAT_ATTENTE_S", "2"))
+DEGRADATION = os.getenv("CHAT_DEGRADATION", "simulation")  # "simulation" ou "refus"
+MAX_CLIENTS = 50000
+
+ROLES_PERSONNEL = ("admin", "secretaire", "medecin")
+INTERVALLE_ATTENTE_S = 0.05
+
+
+class Refus(Exception):
+    """Requête non admise : statut HTTP et délai conseillé avant nouvel essai"""
+
+    def __init__(self, statut: int, detail: str, reessayer_apres: float):
+        super().__init__(detail)
+        self.statut = statut
+        self.detail = detail
+        self.reessayer_apres = max(1, math.ceil(reessayer_apres))
+
+    def entetes(self) -> dict:
+        return {"Retry-After": str(self.reessayer_apres)}
+
+
+class Sature(Refus):
+    """Aucune place libre dans le délai d'attente"""
+
+
+class Client(NamedTuple):
+    cle: str
+    prioritaire: bool
+
+
+def identifier(request) -> Client:
+    """Client de la requête, d'après le cookie de session (sans accès à la base)"""
+    entete = request.headers.get("cookie")
+    if entete:
+        cookie = SimpleCookie()
+        cookie.load(entete)
+        if COOKIE_NAME in cookie:
+            session = decoder_session_token(cookie[COOKIE_NAME].value)
+            if session:
+                return Client(f"utilisateur:{session.get('sub')}", session.get("role") in ROLES_PERSONNEL)
+    hote = request.client.host if request.client else "inconnu"
+    return Client(f"ip:{hote}", False)
+
+
+class LimiteurDebit:
+    """Seaux de jetons par client (nombre de clients borné, LRU)"""
+
+    def __init__(self, debit_par_minute: float = DEBIT_PAR_MINUTE, rafale: float = RAFALE,
+                 max_clients: int = MAX_CLIENTS):
+        self.debit_par_s = debit_par_minute / 60
+        self.rafale = rafale
+        self.max_clients = max_clients
+        self._seaux: "OrderedDict[str, list]" = OrderedDict()  # cle -> [jetons, instant]
+        self._verrou = threading.Lock()
+
+    def consommer(self, cle: str):
+        """Prend un jeton du seau du client; lève Refus (429) s'il est vide"""
+        maintenant = time.monotonic()
+        with self._verrou:
+            seau = self._seaux.get(cle)
+            if seau is None:
+                seau = self._seaux[cle] = [self.rafale, maintenant]
+                while len(self._seaux) > self.max_clients:
+                    self._seaux.popitem(last=False)
+            else:
+                self._seaux.move_to_end(cle)
+                seau[0] = min(self.rafale, seau[0] + (maintenant - seau[1]) * self.debit_par_s)
+                seau[1] = maintenant
+            if seau[0] >= 1:
+                seau[0] -= 1
+                return
+            manque = 1 - seau[0]
+        raise Refus(429, "Trop de messages, veuillez patienter", manque / self.debit_par_s)
+
+
+class LimiteurConcurrence:
+    """
+    Places de conversation simultanées, dont `places_reservees` pour les clients
+    prioritaires. Indépendant de la boucle d'événements (plusieurs boucles possibles).
+    """
+
+    def __init__(self, places: int = CONCURRENCE_MAX, places_reservees: int = PLACES_PERSONNEL,
+                 attente_s: float = ATTENTE_S):
+        self.places = places
+        self.places_reservees = min(places_reservees, places)
+        self.attente_s = attente_s
+        self.occupees = 0
+        self._verrou = threading.Lock()
+
+    def _prendre(self, prioritaire: bool) -> bool:
+        limite = self.places if prioritaire else self.places - self.places_reservees
+        with self._verrou:
+            if self.occupees < limite:
+                self.occupees += 1
+                return True
+            return False
+
+    def _rendre(self):
+        with self._verrou:
+            self.occupees -= 1
+
+    @asynccontextmanager
+    async def place(self, prioritaire: bool):
+        """Occupe une place pendant le bloc; lève Sature après le délai d'attente"""
+        echeance = time.monotonic() + self.attente_s
+        while not self._prendre(prioritaire):
+            if time.monotonic() >= echeance:
+                raise Sature(503, "Assistant momentanément saturé, veuillez réessayer", self.attente_s)
+            await asyncio.sleep(INTERVALLE_ATTENTE_S)
+        try:
+            yield
+        finally:
+            self._rendre()
+
+
+debit_chat = LimiteurDebit()
+concurrence_chat = LimiteurConcurrence()
@@ -0,0 +1,215 @@
+"""
+Annuaire des médecins en mémoire
+Instantané immuable des médecins (nom, spécialité, horaires hebdomadaires) avec un
+index par spécialité, partagé par l'API, le chatbot et le moteur de recommandation.
+Toute validation de transaction modifiant un médecin, son compte ou ses horaires
+incrémente la version et l'instantané est reconstruit au prochain accès.
+Les insertions en masse hors ORM doivent appeler `invalider()`.
+"""
+
+import bisect
+import hashlib
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models import Medecin, Utilisateur, HoraireMedecin, RoleUtilisateur
+import specialites
+
+# Durée de vie maximale d'un instantané : rattrape les écritures d'autres processus
+TTL_S = float(os.getenv("ANNUAIRE_TTL_S", "300"))
+
+
+class FicheMedecin(NamedTuple):
+    """Médecin de l'annuaire; horaires[jour] = (début, fin) ou None, 0=Lundi"""
+    id: int
+    utilisateur_id: int
+    nom: str
+    specialite: str
+    specialite_normalisee: str
+    description: Optional[str]
+    duree_consultation: int
+    est_disponible: bool
+    horaires: Tuple[Optional[Tuple[str, str]], ...]
+
+    def en_dict(self) -> dict:
+        """Représentation publique (schéma MedecinReponse)"""
+        return {
+            "id": self.id,
+            "nom": self.nom,
+            "specialite": self.specialite,
+            "description": self.description,
+            "duree_consultation": self.duree_consultation,
+        }
+
+
+class Instantane:
+    """Vue immuable de l'annuaire à une version donnée"""
+
+    __slots__ = ("version", "etiquette", "medecins", "disponibles", "par_specialite", "_cles", "_utilisateurs")
+
+    def __init__(self, version: int, fiches: List[FicheMedecin]):
+        self.version = version
+        # Empreinte du contenu : identique d'un processus à l'autre pour les mêmes données
+        self.etiquette = hashlib.blake2b(repr(fiches).encode("utf-8"), digest_size=8).hexdigest()
+        self.medecins: Mapping[int, FicheMedecin] = MappingProxyType({f.id: f for f in fiches})
+        self.disponibles: Tuple[FicheMedecin, ...] = tuple(f for f in fiches if f.est_disponible)
+        # Index trié : forme repliée de la spécialité et de chacun de ses mots
+        # ("medecine generale", "generale") -> médecins; recherche par préfixe (bisect)
+        index: Dict[str, List[FicheMedecin]] = {}
+        for fiche in self.disponibles:
+            mots = fiche.specialite_normalisee.split(" ")
+            for position in range(len(mots)):
+                index.setdefault(" ".join(mots[position:]), []).append(fiche)
+        self.par_specialite: Mapping[str, Tuple[FicheMedecin, ...]] = MappingProxyType(
+            {cle: tuple(liste) for cle, liste in index.items()}
+        )
+        self._cles: Tuple[str, ...] = tuple(sorted(index))
+        self._utilisateurs = frozenset(f.utilisateur_id for f in fiches)
+
+    def medecin(self, medecin_id: int) -> Optional[FicheMedecin]:
+        return self.medecins.get(medecin_id)
+
+    def rechercher(self, specialite: Optional[str] = None) -> Tuple[FicheMedecin, ...]:
+        """
+        Médecins disponibles dont la spécialité (ou l'un de ses mots) commence par
+        le texte, sans tenir compte des accents ni de la casse, synonymes résolus
+        """
+        terme = specialites.terme_recherche(specialite)
+        if not terme:
+            return self.disponibles
+        trouves = {}
+        position = bisect.bisect_left(self._cles, terme)
+        while position < len(self._cles) and self._cles[position].startswith(terme):
+            for fiche in self.par_specialite[self._cles[position]]:
+                trouves[fiche.id] = fiche
+            position += 1
+        return tuple(trouves[medecin_id] for medecin_id in sorted(trouves))
+
+    def concerne_utilisateur(self, utilisateur_id: int) -> bool:
+        return utilisateur_id in self._utilisateurs
+
+
+_verrou = threading.Lock()
+_version = 0
+_instantane: Optional[Instantane] = None
+_date_chargement = 0.0
+
+
+def _charger(version: int) -> Instantane:
+    from database import SessionLecture
+
+    db = SessionLecture()
+    try:
+        lignes = db.execute(select(
+            Medecin.id,
+            Medecin.utilisateur_id,
+            Utilisateur.nom,
+            Medecin.specialite,
+            Medecin.specialite_normalisee,
+            Medecin.description,
+            Medecin.duree_consultation,
+            Medecin.est_disponible,
+        ).join(Utilisateur, Medecin.utilisateur_id == Utilisateur.id).order_by(Medecin.id.asc())).all()
+
+        horaires: Dict[int, List[Optional[Tuple[str, str]]]] = {}
+        for medecin_id, jour, debut, fin in db.execute(select(
+            HoraireMedecin.medecin_id,
+            HoraireMedecin.jour_semaine,
+            HoraireMedecin.heure_debut,
+            HoraireMedecin.heure_fin,
+        ).where(HoraireMedecin.est_actif == True).order_by(HoraireMedecin.id.asc())):  # noqa: E712
+            semaine = horaires.setdefault(medecin_id, [None] * 7)
+            if jour is not None and 0 <= jour < 7 and semaine[jour] is None:
+                semaine[jour] = (debut, fin)
+    finally:
+        db.close()
+
+    return Instantane(version, [
+        FicheMedecin(
+            id=ligne.id,
+            utilisateur_id=ligne.utilisateur_id,
+            nom=ligne.nom,
+            specialite=ligne.specialite,
+            specialite_normalisee=ligne.specialite_normalisee or specialites.normaliser(ligne.specialite),
+            description=ligne.description,
+            duree_consultation=ligne.duree_consultation or 30,
+            est_disponible=bool(ligne.est_disponible),
+            horaires=tuple(horaires.get(ligne.id, [None] * 7)),
+        )
+        for ligne in lignes
+    ])
+
+
+def obtenir() -> Instantane:
+    """Instantané courant (reconstruit s'il est invalidé ou trop ancien)"""
+    global _instantane, _date_chargement
+    instantane = _instantane
+    if instantane is not None and instantane.version == _version and time.monotonic() - _date_chargement < TTL_S:
+        return instantane
+    with _verrou:
+        instantane = _instantane
+        if instantane is None or instantane.version != _version or time.monotonic() - _date_chargement >= TTL_S:
+            instantane = _charger(_version)
+            _instantane = instantane
+            _date_chargement = time.monotonic()
+        return instantane
+
+
+def version() -> int:
+    """Version de l'annuaire (incrémentée à chaque modification validée)"""
+    return _version
+
+
+def invalider():
+    """Force la reconstruction de l'instantané au prochain accès"""
+    global _version
+    with _verrou:
+        _version += 1
+
+
+# ==================== Invalidation sur écriture ====================
+
+def _modifie_annuaire(objet, instantane: Optional[Instantane]) -> bool:
+    if isinstance(objet, (Medecin, HoraireMedecin)):
+        return True
+    if isinstance(objet, Utilisateur):
+        return objet.role == RoleUtilisateur.MEDECIN.value or (
+            instantane is not None and objet.id is not None and instantane.concerne_utilisateur(objet.id)
+        )
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _apres_flush(session, contexte_flush):
+    instantane = _instantane
+    if any(
+        _modifie_annuaire(objet, instantane)
+        for objet in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info["annuaire_modifie"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _execution_orm(etat):
+    """Modifications en masse (query.update/delete, insert/update/delete ORM)"""
+    if (etat.is_insert or etat.is_update or etat.is_delete) and any(
+        mapper.class_ in (Medecin, Utilisateur, HoraireMedecin) for mapper in etat.all_mappers
+    ):
+        etat.session.info["annuaire_modifie"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apres_commit(session):
+    if session.info.pop("annuaire_modifie", False):
+        invalider()
+
+
+@event.listens_for(Session, "after_rollback")
+def _apres_rollback(session):
+    session.info.pop("annuaire_modifie", None)
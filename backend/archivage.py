@@ -0,0 +1,149 @@
+"""
+Archivage des rendez-vous passés
+Les rendez-vous terminés ou annulés antérieurs à ARCHIVAGE_JOURS sont déplacés
+de `rendez_vous` (table vivante : réservations, disponibilités, tableaux de bord)
+vers `rendez_vous_archive`, par lots courts : chaque lot est une transaction
+(INSERT ... SELECT puis DELETE) suivie d'une pause qui laisse passer les écritures
+de l'application. Les identifiants sont conservés.
+
+Les lectures d'historique passent par `rendez_vous_pour_periode` : la table
+vivante seule si la période ne touche pas l'archive, sinon l'union des deux.
+
+Usage:
+    python archivage.py                 # archive au-delà de ARCHIVAGE_JOURS
+    python archivage.py --jours 365 --lot 5000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
+
+from models import RendezVous, RendezVousArchive, StatutRendezVous
+
+# 0 désactive l'archivage nocturne (le script reste utilisable)
+ARCHIVAGE_JOURS = int(os.getenv("ARCHIVAGE_JOURS", "180"))
+HEURE_ARCHIVAGE = int(os.getenv("ARCHIVAGE_HEURE", "4"))
+TAILLE_LOT = int(os.getenv("ARCHIVAGE_TAILLE_LOT", "2000"))
+# Pause entre deux lots : l'unique écrivain SQLite est rendu à l'application
+PAUSE_S = float(os.getenv("ARCHIVAGE_PAUSE_S", "0.05"))
+
+STATUTS_ARCHIVABLES = (StatutRendezVous.TERMINE.value, StatutRendezVous.ANNULE.value)
+COLONNES = ("id", "patient_id", "medecin_id", "date_heure", "statut", "motif", "notes", "date_creation")
+
+
+def archiver(moteur: Engine, jours: int = ARCHIVAGE_JOURS, taille_lot: int = TAILLE_LOT,
+             pause_s: float = PAUSE_S) -> int:
+    """
+    Déplace les rendez-vous archivables par lots de `taille_lot`
+
+    Le rendez-vous d'identifiant maximal reste toujours dans la table vivante :
+    SQLite attribue max(id) + 1 au suivant, un identifiant archivé ne peut donc
+    pas être réattribué.
+
+    Returns:
+        Nombre de rendez-vous archivés
+    """
+    seuil = datetime.now() - timedelta(days=jours)
+    vivants = RendezVous.__table__
+    archive = RendezVousArchive.__table__
+    colonnes = [vivants.c[nom] for nom in COLONNES]
+    # Base antérieure à l'archive, utilisée sans passer par le démarrage de l'application
+    archive.create(moteur, checkfirst=True)
+
+    total = 0
+    curseur = 0
+    while True:
+        with moteur.begin() as connexion:
+            ids = list(connexion.scalars(
+                select(vivants.c.id).where(
+                    vivants.c.id > curseur,
+                    vivants.c.id < select(func.max(vivants.c.id)).scalar_subquery(),
+                    vivants.c.statut.in_(STATUTS_ARCHIVABLES),
+                    vivants.c.date_heure < seuil,
+                ).order_by(vivants.c.id.asc()).limit(taille_lot)
+            ))
+            if not ids:
+                break
+            connexion.execute(insert(archive).from_select(
+                list(COLONNES), select(*colonnes).where(vivants.c.id.in_(ids))
+            ))
+            connexion.execute(delete(vivants).where(vivants.c.id.in_(ids)))
+        total += len(ids)
+        curseur = ids[-1]
+        if len(ids) < taille_lot:
+            break
+        time.sleep(pause_s)
+    return total
+
+
+# ==================== Lectures d'historique ====================
+
+def seuil_archive(db: Session) -> Optional[datetime]:
+    """Date du rendez-vous archivé le plus récent (None si l'archive est vide)"""
+    return db.scalar(select(func.max(RendezVousArchive.date_heure)))
+
+
+def historique_complet():
+    """Entité `RendezVous` portant sur l'union de la table vivante et de l'archive"""
+    union = union_all(
+        select(*(RendezVous.__table__.c[nom] for nom in COLONNES)),
+        select(*(RendezVousArchive.__table__.c[nom] for nom in COLONNES)),
+    ).subquery("rendez_vous_historique")
+    return aliased(RendezVous, union, adapt_on_names=True)
+
+
+def rendez_vous_pour_periode(db: Session, debut: Optional[datetime] = None):
+    """
+    Entité à interroger pour les rendez-vous à partir de `debut` (tout l'historique si None) :
+    `RendezVous` si l'archive ne contient rien d'aussi récent, sinon l'union des deux tables
+    """
+    if debut is not None:
+        seuil = seuil_archive(db)
+        if seuil is None or seuil < debut:
+            return RendezVous
+    return historique_complet()
+
+
+# ==================== Planification ====================
+
+def _archiver_avec_moteur() -> int:
+    from database import engine
+    return archiver(engine)
+
+
+async def boucle_nocturne():
+    """Archive chaque nuit à HEURE_ARCHIVAGE (si ARCHIVAGE_JOURS > 0)"""
+    while True:
+        maintenant = datetime.now()
+        prochaine = maintenant.replace(hour=HEURE_ARCHIVAGE, minute=0, second=0, microsecond=0)
+        if prochaine <= maintenant:
+            prochaine += timedelta(days=1)
+        await asyncio.sleep((prochaine - maintenant).total_seconds())
+        try:
+            nombre = await asyncio.to_thread(_archiver_avec_moteur)
+            print(f"🗄️ {nombre} rendez-vous archivés")
+        except Exception as e:
+            print(f"⚠️ Échec de l'archivage : {e}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Archivage des rendez-vous passés")
+    parser.add_argument("--jours", type=int, default=ARCHIVAGE_JOURS or 180,
+                        help="Âge minimal (en jours) des rendez-vous archivés")
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT, help="Rendez-vous par transaction")
+    arguments = parser.parse_args()
+
+    debut_chrono = time.perf_counter()
+    archives = archiver(engine, jours=arguments.jours, taille_lot=arguments.lot)
+    print(f"✅ {archives} rendez-vous archivés en {time.perf_counter() - debut_chrono:.1f} s")
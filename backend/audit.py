@@ -0,0 +1,175 @@
+"""
+Journal d'audit
+Qui a créé, modifié ou annulé un rendez-vous, qui a consulté des données de
+patients. Une requête ne fait qu'ajouter un tuple à un tampon circulaire en
+mémoire (quelques microsecondes, sans accès à la base); un fil d'écriture vide le
+tampon par lots dans la table en ajout seul `journal_audit` (ou, si AUDIT_FICHIER
+est défini, dans un fichier NDJSON) dès que AUDIT_TAILLE_LOT événements attendent
+ou toutes les AUDIT_INTERVALLE_S secondes. L'arrêt de l'application vide le tampon.
+
+Si le tampon est plein (écriture durablement en échec), les événements les plus
+anciens sont perdus et comptés dans /metrics (`audit_evenements_total{issue="perdu"}`).
+"""
+
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import orjson
+from sqlalchemy import insert
+
+import admission
+import metriques
+from models import EvenementAudit
+
+CAPACITE = int(os.getenv("AUDIT_CAPACITE", "100000"))
+TAILLE_LOT = int(os.getenv("AUDIT_TAILLE_LOT", "500"))
+INTERVALLE_S = float(os.getenv("AUDIT_INTERVALLE_S", "1"))
+FICHIER = os.getenv("AUDIT_FICHIER", "")
+ARRET_ATTENTE_S = 10
+
+# (horodatage, acteur, action, cible_type, cible_id, details)
+Evenement = tuple
+
+
+# ==================== Destinations ====================
+
+def ecrire_en_base(lot: List[Evenement]):
+    """Insère un lot dans `journal_audit` (une transaction, executemany)"""
+    from database import engine
+
+    with engine.begin() as connexion:
+        connexion.execute(insert(EvenementAudit.__table__), [
+            {
+                "horodatage": horodatage,
+                "acteur": acteur,
+                "action": action,
+                "cible_type": cible_type,
+                "cible_id": cible_id,
+                "details": orjson.dumps(details, default=str).decode() if details else None,
+            }
+            for horodatage, acteur, action, cible_type, cible_id, details in lot
+        ])
+
+
+def ecrivain_fichier(chemin: str) -> Callable[[List[Evenement]], None]:
+    """Destination NDJSON : une ligne par événement, ajoutée en fin de fichier"""
+    def ecrire(lot: List[Evenement]):
+        lignes = b"".join(
+            orjson.dumps({
+                "horodatage": horodatage,
+                "acteur": acteur,
+                "action": action,
+                "cible_type": cible_type,
+                "cible_id": cible_id,
+                "details": details,
+            }, default=str) + b"\n"
+            for horodatage, acteur, action, cible_type, cible_id, details in lot
+        )
+        with open(chemin, "ab") as fichier:
+            fichier.write(lignes)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+    return ecrire
+
+
+def destination_par_defaut() -> Callable[[List[Evenement]], None]:
+    return ecrivain_fichier(FICHIER) if FICHIER else ecrire_en_base
+
+
+# ==================== Journal ====================
+
+class JournalAudit:
+    """Tampon circulaire d'événements vidé par lots par un fil d'écriture"""
+
+    def __init__(self, capacite: int = CAPACITE, taille_lot: int = TAILLE_LOT,
+                 intervalle_s: float = INTERVALLE_S):
+        self.taille_lot = taille_lot
+        self.intervalle_s = intervalle_s
+        self._tampon: deque = deque(maxlen=capacite)
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._verrou_vidage = threading.Lock()
+        self._fil: Optional[threading.Thread] = None
+        self._ecrire: Optional[Callable[[List[Evenement]], None]] = None
+
+    def enregistrer(self, action: str, acteur: str, cible_type: Optional[str] = None,
+                    cible_id: Optional[int] = None, **details):
+        """Ajoute un événement au tampon (appelé sur le chemin de la requête)"""
+        tampon = self._tampon
+        if len(tampon) == tampon.maxlen:
+            metriques.enregistrer_audit("perdu", 1)
+        tampon.append((datetime.utcnow(), acteur, action, cible_type, cible_id, details or None))
+        if len(tampon) >= self.taille_lot:
+            self._reveil.set()
+
+    def en_attente(self) -> int:
+        return len(self._tampon)
+
+    def vider(self) -> int:
+        """
+        Écrit les événements en attente par lots de `taille_lot`
+
+        Un lot en échec est remis en tête du tampon pour le vidage suivant.
+
+        Returns:
+            Nombre d'événements écrits
+        """
+        if self._ecrire is None:
+            return 0
+        ecrits = 0
+        with self._verrou_vidage:
+            while self._tampon:
+                lot = []
+                try:
+                    while len(lot) < self.taille_lot:
+                        lot.append(self._tampon.popleft())
+                except IndexError:
+                    pass
+                try:
+                    self._ecrire(lot)
+                except Exception as e:
+                    self._tampon.extendleft(reversed(lot))
+                    metriques.enregistrer_audit("echec", len(lot))
+                    print(f"⚠️ Échec d'écriture du journal d'audit : {e}")
+                    break
+                ecrits += len(lot)
+        if ecrits:
+            metriques.enregistrer_audit("ecrit", ecrits)
+        return ecrits
+
+    def _boucle(self):
+        while not self._arret.is_set():
+            self._reveil.wait(self.intervalle_s)
+            self._reveil.clear()
+            self.vider()
+
+    def demarrer(self, ecrire: Optional[Callable[[List[Evenement]], None]] = None):
+        """Lance le fil d'écriture (au démarrage de l'application)"""
+        self._ecrire = ecrire or destination_par_defaut()
+        if self._fil is not None and self._fil.is_alive():
+            return
+        self._arret.clear()
+        self._fil = threading.Thread(target=self._boucle, name="journal-audit", daemon=True)
+        self._fil.start()
+
+    def arreter(self) -> int:
+        """Arrête le fil d'écriture et vide le tampon (à l'arrêt de l'application)"""
+        self._arret.set()
+        self._reveil.set()
+        if self._fil is not None:
+            self._fil.join(ARRET_ATTENTE_S)
+            self._fil = None
+        return self.vider()
+
+
+def acteur(request, utilisateur=None) -> str:
+    """Auteur d'une action : compte connecté, sinon adresse IP (d'après le cookie, sans accès à la base)"""
+    if utilisateur is not None:
+        return f"utilisateur:{utilisateur.id}"
+    return admission.identifier(request).cle
+
+
+journal = JournalAudit()
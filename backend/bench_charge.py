@@ -0,0 +1,280 @@
+"""
+Benchmark de charge de bout en bout
+Pilote l'application ASGI en mémoire (httpx + ASGITransport, sans serveur) avec
+des clients concurrents et mesure débit et latences p50/p95/p99 par scénario :
+- disponibilites : recherche de médecins puis consultation des créneaux
+- reservations : rafale de réservations sur quelques médecins et jours très demandés
+- tableau_de_bord : rafraîchissements des tableaux de bord admin et médecin
+- chat : conversation avec le chatbot en mode simulation
+
+La base est celle de DATABASE_URL (voir generer_donnees.py). Les réservations
+écrivent dans la base : lancer le benchmark sur une copie.
+
+Usage:
+    DATABASE_URL=sqlite:///./charge.db python bench_charge.py --duree 20 --concurrence 16 --sortie resultats.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Le chatbot doit fonctionner en mode simulation, quel que soit le .env
+os.environ["OPENAI_API_KEY"] = ""
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+import main  # noqa: E402
+from database import DATABASE_URL, SessionLocal  # noqa: E402
+from models import Medecin, HoraireMedecin, RendezVous, Utilisateur, RoleUtilisateur  # noqa: E402
+
+COMPTES = {
+    "admin": ("admin@clinique.fr", "admin123"),
+    "medecin": ("martin.dupont@clinique.fr", "medecin123"),
+}
+MESSAGES_CHAT = (
+    "Bonjour", "Quels médecins sont disponibles ?", "Je cherche un cardiologue",
+    "Je voudrais un rendez-vous demain", "Quels sont vos horaires ?", "Merci, au revoir",
+)
+
+
+class Mesures:
+    """Latences et statuts HTTP d'un scénario"""
+
+    def __init__(self):
+        self.durees = []
+        self.statuts = Counter()
+        self.issues = Counter()
+        self.erreurs = 0
+        self.actif = False
+
+    async def requete(self, client: httpx.AsyncClient, methode: str, url: str, **options):
+        debut = time.perf_counter()
+        try:
+            reponse = await client.request(methode, url, **options)
+        except Exception:
+            if self.actif:
+                self.erreurs += 1
+            return None
+        if self.actif:
+            self.durees.append(time.perf_counter() - debut)
+            self.statuts[reponse.status_code] += 1
+            if reponse.status_code >= 500:
+                self.erreurs += 1
+        return reponse
+
+    def resume(self, duree: float) -> dict:
+        durees = np.array(self.durees) * 1000 if self.durees else np.zeros(1)
+        p50, p95, p99 = np.percentile(durees, [50, 95, 99])
+        return {
+            "requetes": len(self.durees),
+            "debit_rps": round(len(self.durees) / duree, 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(durees.max()), 2),
+            "statuts": {str(statut): nombre for statut, nombre in sorted(self.statuts.items())},
+            "issues": dict(self.issues),
+            "erreurs": self.erreurs,
+        }
+
+
+# ==================== Données de référence ====================
+
+def _jours_ouvres(nombre: int) -> list:
+    jours = []
+    jour = datetime.now() + timedelta(days=1)
+    while len(jours) < nombre:
+        if jour.weekday() < 5:
+            jours.append(jour.strftime("%Y-%m-%d"))
+        jour += timedelta(days=1)
+    return jours
+
+
+def charger_reference() -> dict:
+    """Médecins, spécialités et volumes de la base, lus une fois avant la mesure"""
+    db = SessionLocal()
+    try:
+        medecins = [
+            ligne[0] for ligne in db.execute(
+                select(Medecin.id).join(HoraireMedecin, HoraireMedecin.medecin_id == Medecin.id)
+                .where(Medecin.est_disponible.is_(True)).distinct()
+            )
+        ]
+        specialites = [ligne[0] for ligne in db.execute(select(Medecin.specialite).distinct())]
+        volumes = {
+            "medecins": db.scalar(select(func.count(Medecin.id))),
+            "patients": db.scalar(select(func.count(Utilisateur.id)).where(
+                Utilisateur.role == RoleUtilisateur.PATIENT.value
+            )),
+            "rendez_vous": db.scalar(select(func.count(RendezVous.id))),
+        }
+    finally:
+        db.close()
+    return {"medecins": medecins, "specialites": specialites, "jours": _jours_ouvres(10), "volumes": volumes}
+
+
+# ==================== Scénarios ====================
+
+async def scenario_disponibilites(client, mesures: Mesures, reference: dict, aleatoire: random.Random):
+    specialite = aleatoire.choice(reference["specialites"])
+    await mesures.requete(client, "GET", "/api/medecins", params={"specialite": specialite[:5]})
+    medecin_id = aleatoire.choice(reference["medecins"])
+    await mesures.requete(
+        client, "GET", f"/api/medecins/{medecin_id}/disponibilites",
+        params={"date": aleatoire.choice(reference["jours"])}
+    )
+
+
+async def scenario_reservations(client, mesures: Mesures, reference: dict, aleatoire: random.Random):
+    # Tous les clients visent les mêmes médecins le même jour : conflits garantis
+    medecin_id = aleatoire.choice(reference["medecins"][:5])
+    minutes = 9 * 60 + 30 * aleatoire.randrange(16)
+    reponse = await mesures.requete(client, "POST", "/api/rendez-vous", json={
+        "medecin_id": medecin_id,
+        "nom_patient": "Patient Charge",
+        "telephone_patient": f"05{aleatoire.randrange(10 ** 8):08d}",
+        "date": reference["jours"][0],
+        "heure": f"{minutes // 60:02d}:{minutes % 60:02d}",
+        "motif": "Test de charge",
+    })
+    if reponse is not None and reponse.status_code == 200 and mesures.actif:
+        mesures.issues["reserve" if reponse.json().get("succes") else "refuse"] += 1
+
+
+async def scenario_tableau_de_bord(client, mesures: Mesures, reference: dict, aleatoire: random.Random):
+    if client.role == "admin":
+        await mesures.requete(client, "GET", "/api/auth/me")
+        await mesures.requete(client, "GET", "/api/admin/rendez-vous")
+        await mesures.requete(client, "GET", "/api/admin/users")
+        await mesures.requete(client, "GET", "/api/admin/previsions")
+    else:
+        await mesures.requete(client, "GET", "/api/auth/me")
+        await mesures.requete(client, "GET", "/api/medecin/rendez-vous")
+
+
+async def scenario_chat(client, mesures: Mesures, reference: dict, aleatoire: random.Random):
+    historique = []
+    for message in aleatoire.sample(MESSAGES_CHAT, 3):
+        reponse = await mesures.requete(client, "POST", "/api/chat", json={
+            "message": message, "historique_conversation": historique
+        })
+        if reponse is None or reponse.status_code != 200:
+            return
+        historique = reponse.json()["historique_conversation"]
+
+
+SCENARIOS = {
+    "disponibilites": scenario_disponibilites,
+    "reservations": scenario_reservations,
+    "tableau_de_bord": scenario_tableau_de_bord,
+    "chat": scenario_chat,
+}
+
+
+# ==================== Exécution ====================
+
+async def _nouveau_client(role: str = None) -> httpx.AsyncClient:
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120
+    )
+    client.role = role
+    if role is not None:
+        email, mot_de_passe = COMPTES[role]
+        reponse = await client.post("/api/auth/login", json={"email": email, "mot_de_passe": mot_de_passe})
+        reponse.raise_for_status()
+    return client
+
+
+async def executer_scenario(nom: str, reference: dict, concurrence: int, duree: float,
+                            echauffement: float, graine: int) -> dict:
+    fonction = SCENARIOS[nom]
+    mesures = Mesures()
+    clients = []
+    for indice in range(concurrence):
+        role = ("admin" if indice % 2 == 0 else "medecin") if nom == "tableau_de_bord" else None
+        clients.append(await _nouveau_client(role))
+
+    fin = time.perf_counter() + echauffement + duree
+
+    async def travailleur(client, indice: int):
+        aleatoire = random.Random(graine * 1000 + indice)
+        while time.perf_counter() < fin:
+            await fonction(client, mesures, reference, aleatoire)
+
+    async def demarrer_mesure():
+        await asyncio.sleep(echauffement)
+        mesures.actif = True
+
+    debut = time.perf_counter()
+    await asyncio.gather(demarrer_mesure(), *(travailleur(c, i) for i, c in enumerate(clients)))
+    duree_mesuree = time.perf_counter() - debut - echauffement
+    for client in clients:
+        await client.aclose()
+    return mesures.resume(duree_mesuree)
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def executer(noms: list, concurrence: int, duree: float, echauffement: float, graine: int) -> dict:
+    async with main.app.router.lifespan_context(main.app):
+        reference = charger_reference()
+        resultats = {
+            "commit": _commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "base": DATABASE_URL.split("@")[-1],
+            "volumes": reference["volumes"],
+            "concurrence": concurrence,
+            "duree_s": duree,
+            "scenarios": {},
+        }
+        for nom in noms:
+            print(f"⏱️ {nom}...", file=sys.stderr)
+            resultats["scenarios"][nom] = await executer_scenario(
+                nom, reference, concurrence, duree, echauffement, graine
+            )
+    return resultats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de charge par scénario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Liste séparée par des virgules parmi : {', '.join(SCENARIOS)}")
+    parser.add_argument("--duree", type=float, default=10.0, help="Durée mesurée par scénario (s)")
+    parser.add_argument("--echauffement", type=float, default=1.0)
+    parser.add_argument("--concurrence", type=int, default=8)
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--sortie", help="Fichier JSON de résultats (sinon sortie standard)")
+    arguments = parser.parse_args()
+
+    scenarios_demandes = [nom.strip() for nom in arguments.scenarios.split(",") if nom.strip()]
+    inconnus = [nom for nom in scenarios_demandes if nom not in SCENARIOS]
+    if inconnus:
+        parser.error(f"Scénario(s) inconnu(s) : {', '.join(inconnus)}")
+
+    rapport = asyncio.run(executer(
+        scenarios_demandes, arguments.concurrence, arguments.duree, arguments.echauffement, arguments.graine
+    ))
+    texte = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if arguments.sortie:
+        with open(arguments.sortie, "w", encoding="utf-8") as fichier:
+            fichier.write(texte + "\n")
+        print(f"✅ Résultats écrits dans {arguments.sortie}", file=sys.stderr)
+    else:
+        print(texte)
@@ -0,0 +1,157 @@
+"""
+Benchmark de concurrence SQLite : profil "standard" contre profil "performance"
+Des threads réservent des créneaux (écritures) pendant que d'autres rafraîchissent
+un tableau de bord (lectures), sur une base temporaire identique pour chaque profil.
+Affiche débit, latence p95 et erreurs "database is locked" en JSON.
+
+Usage:
+    python bench_concurrence.py --duree 10 --ecrivains 4 --lecteurs 4
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import creer_moteurs
+from models import Base, Utilisateur, Medecin, RendezVous, StatutRendezVous
+
+NB_MEDECINS = 20
+
+
+def preparer_base(chemin: str, nb_rendez_vous: int):
+    moteur, _ = creer_moteurs(f"sqlite:///{chemin}", profil="standard")
+    Base.metadata.create_all(moteur)
+    maintenant = datetime.now().replace(second=0, microsecond=0)
+    with moteur.begin() as connexion:
+        connexion.execute(insert(Utilisateur), [
+            {"nom": f"Dr. Bench {i}", "telephone": f"07{i:08d}", "role": "medecin"} for i in range(NB_MEDECINS)
+        ] + [{"nom": "Patient Bench", "telephone": "0600000099", "role": "patient"}])
+        connexion.execute(insert(Medecin), [
+            {"utilisateur_id": i + 1, "specialite": "Médecine Générale", "duree_consultation": 30}
+            for i in range(NB_MEDECINS)
+        ])
+        connexion.execute(insert(RendezVous), [
+            {"patient_id": NB_MEDECINS + 1, "medecin_id": 1 + i % NB_MEDECINS,
+             "date_heure": maintenant - timedelta(minutes=30 * i),
+             "statut": StatutRendezVous.TERMINE.value, "date_creation": maintenant}
+            for i in range(nb_rendez_vous)
+        ])
+    moteur.dispose()
+
+
+def mesurer_profil(profil: str, base_modele: str, duree: float, ecrivains: int, lecteurs: int) -> dict:
+    dossier = tempfile.mkdtemp(prefix=f"bench_{profil}_")
+    chemin = os.path.join(dossier, "bench.db")
+    shutil.copyfile(base_modele, chemin)
+    ecriture, lecture = creer_moteurs(f"sqlite:///{chemin}", profil=profil)
+    SessionEcriture = sessionmaker(bind=ecriture)
+    SessionLecture = sessionmaker(bind=lecture)
+
+    resultats = {"ecriture": [], "lecture": []}
+    erreurs = {"ecriture": 0, "lecture": 0}
+    verrou = threading.Lock()
+    fin = time.perf_counter() + duree
+    debut_futur = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+    def reserver(indice: int):
+        aleatoire = random.Random(indice)
+        while time.perf_counter() < fin:
+            medecin_id = aleatoire.randint(1, NB_MEDECINS)
+            date_heure = debut_futur + timedelta(minutes=30 * aleatoire.randrange(100000))
+            debut = time.perf_counter()
+            db = SessionEcriture()
+            try:
+                conflit = db.execute(select(RendezVous.id).where(
+                    RendezVous.medecin_id == medecin_id, RendezVous.date_heure == date_heure
+                ).limit(1)).first()
+                if conflit is None:
+                    db.add(RendezVous(patient_id=NB_MEDECINS + 1, medecin_id=medecin_id, date_heure=date_heure,
+                                      statut=StatutRendezVous.CONFIRME.value))
+                    db.commit()
+                with verrou:
+                    resultats["ecriture"].append(time.perf_counter() - debut)
+            except OperationalError:
+                db.rollback()
+                with verrou:
+                    erreurs["ecriture"] += 1
+            finally:
+                db.close()
+
+    def rafraichir(indice: int):
+        aleatoire = random.Random(1000 + indice)
+        while time.perf_counter() < fin:
+            debut = time.perf_counter()
+            db = SessionLecture()
+            try:
+                medecin_id = aleatoire.randint(1, NB_MEDECINS)
+                db.execute(select(RendezVous).where(
+                    RendezVous.medecin_id == medecin_id
+                ).order_by(RendezVous.date_heure.desc()).limit(200)).all()
+                db.execute(select(RendezVous.statut, func.count(RendezVous.id)).group_by(RendezVous.statut)).all()
+                with verrou:
+                    resultats["lecture"].append(time.perf_counter() - debut)
+            except OperationalError:
+                with verrou:
+                    erreurs["lecture"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=reserver, args=(i,)) for i in range(ecrivains)]
+    threads += [threading.Thread(target=rafraichir, args=(i,)) for i in range(lecteurs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ecriture.dispose()
+    lecture.dispose()
+    shutil.rmtree(dossier, ignore_errors=True)
+
+    rapport = {}
+    for nature, durees in resultats.items():
+        valeurs = np.array(durees) * 1000 if durees else np.zeros(1)
+        rapport[nature] = {
+            "operations": len(durees),
+            "debit_par_s": round(len(durees) / duree, 1),
+            "p50_ms": round(float(np.percentile(valeurs, 50)), 2),
+            "p95_ms": round(float(np.percentile(valeurs, 95)), 2),
+            "erreurs_verrou": erreurs[nature],
+        }
+    return rapport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de concurrence des profils SQLite")
+    parser.add_argument("--duree", type=float, default=10.0)
+    parser.add_argument("--ecrivains", type=int, default=4)
+    parser.add_argument("--lecteurs", type=int, default=4)
+    parser.add_argument("--rendez-vous", type=int, default=100000)
+    arguments = parser.parse_args()
+
+    dossier_modele = tempfile.mkdtemp(prefix="bench_modele_")
+    base = os.path.join(dossier_modele, "modele.db")
+    preparer_base(base, arguments.rendez_vous)
+    try:
+        rapport_final = {
+            "ecrivains": arguments.ecrivains,
+            "lecteurs": arguments.lecteurs,
+            "duree_s": arguments.duree,
+            "profils": {
+                profil: mesurer_profil(profil, base, arguments.duree, arguments.ecrivains, arguments.lecteurs)
+                for profil in ("standard", "performance")
+            },
+        }
+    finally:
+        shutil.rmtree(dossier_modele, ignore_errors=True)
+    print(json.dumps(rapport_final, indent=2, ensure_ascii=False))
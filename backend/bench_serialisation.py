@@ -0,0 +1,98 @@
+"""
+Benchmark de sérialisation des listes de rendez-vous
+Compare le chemin FastAPI habituel (un modèle Pydantic par ligne puis response_model)
+au chemin rapide de reponses_rapides, en temps et en octets
+
+Usage:
+    python bench_serialisation.py --lignes 10000
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import reponses_rapides
+from schemas import RendezVousAdminReponse
+
+
+def generer_lignes(nombre: int) -> List[dict]:
+    debut = datetime(2025, 1, 6, 9, 0)
+    return [
+        {
+            "id": i,
+            "patient_id": 1000 + i % 5000,
+            "patient_nom": f"Patient {i % 5000}",
+            "patient_telephone": f"06{i % 100000000:08d}",
+            "medecin_id": 1 + i % 40,
+            "medecin_nom": f"Dr. Médecin {i % 40}",
+            "date_heure": debut + timedelta(minutes=20 * i),
+            "statut": "confirme" if i % 7 else "annule",
+            "motif": "Consultation de suivi" if i % 3 else None,
+            "notes": None,
+        }
+        for i in range(nombre)
+    ]
+
+
+def chemin_habituel(lignes: List[dict]) -> bytes:
+    """Un modèle par ligne, revalidé par response_model puis encodé par JSONResponse"""
+    modeles = [RendezVousAdminReponse(**ligne) for ligne in lignes]
+    champ = TypeAdapter(List[RendezVousAdminReponse])
+    valides = champ.validate_python([m.model_dump() for m in modeles])
+    return json.dumps(
+        jsonable_encoder(valides), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def chemin_typeadapter(lignes: List[dict]) -> bytes:
+    adaptateur = reponses_rapides.adaptateur_liste(RendezVousAdminReponse)
+    return adaptateur.dump_json(adaptateur.validate_python(lignes))
+
+
+def chemin_sans_validation(lignes: List[dict]) -> bytes:
+    return reponses_rapides.serialiser(lignes)
+
+
+def mesurer(fonction, lignes: List[dict], repetitions: int) -> dict:
+    fonction(lignes)  # échauffement
+    durees = []
+    corps = b""
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        corps = fonction(lignes)
+        durees.append(time.perf_counter() - debut)
+    debut = time.perf_counter()
+    compresse = gzip.compress(corps, compresslevel=reponses_rapides.NIVEAU_GZIP)
+    duree_gzip = time.perf_counter() - debut
+    return {
+        "ms_min": round(min(durees) * 1000, 2),
+        "ms_median": round(sorted(durees)[len(durees) // 2] * 1000, 2),
+        "octets": len(corps),
+        "octets_gzip": len(compresse),
+        "ms_gzip": round(duree_gzip * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de sérialisation des listes")
+    parser.add_argument("--lignes", type=int, default=10000)
+    parser.add_argument("--repetitions", type=int, default=10)
+    arguments = parser.parse_args()
+
+    lignes = generer_lignes(arguments.lignes)
+    resultats = {
+        "lignes": arguments.lignes,
+        "orjson": reponses_rapides.orjson is not None,
+        "chemins": {
+            "modele_par_ligne": mesurer(chemin_habituel, lignes, arguments.repetitions),
+            "typeadapter": mesurer(chemin_typeadapter, lignes, arguments.repetitions),
+            "sans_validation": mesurer(chemin_sans_validation, lignes, arguments.repetitions),
+        },
+    }
+    print(json.dumps(resultats, indent=2, ensure_ascii=False))
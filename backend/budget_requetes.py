@@ -0,0 +1,304 @@
+"""
+Contrôle du budget de requêtes SQL de chaque route de l'API
+Appelle toutes les routes de main.py via le client de test ASGI sur une base
+synthétique, à deux volumes de données, et vérifie que le nombre de requêtes SQL
+par appel reste sous un plafond fixe et ne grandit pas avec le nombre de lignes.
+Une route sans scénario est une erreur : toute nouvelle route doit être ajoutée ici.
+
+Usage:
+    python budget_requetes.py
+Code de sortie 1 en cas de dépassement.
+"""
+
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Base temporaire et chatbot en mode simulation, avant tout import de l'application
+_dossier = tempfile.mkdtemp(prefix="budget_requetes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_dossier, 'budget.db')}"
+os.environ["OPENAI_API_KEY"] = ""
+
+from fastapi.routing import APIRoute  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert, func  # noqa: E402
+
+import annuaire  # noqa: E402
+import audit  # noqa: E402
+import main  # noqa: E402
+from database import engine, engine_lecture, SessionLocal  # noqa: E402
+from models import (  # noqa: E402
+    Utilisateur, Medecin, HoraireMedecin, RendezVous, RoleUtilisateur, StatutRendezVous
+)
+
+IDENTIFIANTS = {
+    "admin": ("admin@clinique.fr", "admin123"),
+    "medecin": ("martin.dupont@clinique.fr", "medecin123"),
+}
+
+DEMAIN = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _nouveau_rdv(db) -> dict:
+    """Crée un rendez-vous annulable et retourne ses paramètres de chemin"""
+    rdv = RendezVous(
+        patient_id=7, medecin_id=1, statut=StatutRendezVous.CONFIRME.value,
+        date_heure=datetime.now() + timedelta(days=400, minutes=db.query(func.count(RendezVous.id)).scalar())
+    )
+    db.add(rdv)
+    db.commit()
+    return {"rdv_id": rdv.id}
+
+
+_creneaux = iter(range(1, 100000))
+
+
+def _corps_reservation(db) -> dict:
+    """Créneau toujours libre pour POST /api/rendez-vous"""
+    jour = datetime.now() + timedelta(days=500 + next(_creneaux))
+    return {
+        "medecin_id": 1, "nom_patient": "Patient Budget", "telephone_patient": "0698765432",
+        "date": jour.strftime("%Y-%m-%d"), "heure": "10:00", "motif": "Contrôle"
+    }
+
+
+# (méthode, chemin déclaré) -> scénario
+# role : session utilisée; budget : plafond de requêtes SQL par appel;
+# chemin / params / json : valeurs ou fonctions (db) -> valeurs, évaluées hors comptage
+SCENARIOS = {
+    ("GET", "/"): {"budget": 0},
+    ("GET", "/metrics"): {"budget": 0},
+    ("GET", "/api/medecins"): {"budget": 0, "params": {"specialite": "Cardio"}},
+    ("GET", "/api/medecins/{medecin_id}"): {"budget": 0, "chemin": {"medecin_id": 1}},
+    ("GET", "/api/medecins/{medecin_id}/disponibilites"): {
+        "budget": 1, "chemin": {"medecin_id": 1}, "params": {"date": DEMAIN}
+    },
+    ("POST", "/api/rendez-vous"): {"budget": 5, "json": _corps_reservation},
+    ("GET", "/api/rendez-vous"): {"budget": 2, "params": {"telephone": "0698765432"}},
+    ("DELETE", "/api/rendez-vous/{rdv_id}"): {"budget": 2, "chemin": _nouveau_rdv},
+    ("POST", "/api/chat"): {"budget": 0, "json": {"message": "Quels médecins sont disponibles ?"}},
+    ("POST", "/api/auth/login"): {
+        "budget": 1, "json": {"email": "admin@clinique.fr", "mot_de_passe": "admin123"}
+    },
+    ("POST", "/api/auth/logout"): {"budget": 0, "session_jetable": True},
+    ("GET", "/api/auth/me"): {"budget": 1, "role": "admin"},
+    ("GET", "/api/admin/users"): {"budget": 2, "role": "admin"},
+    ("GET", "/api/admin/rendez-vous"): {"budget": 3, "role": "admin"},
+    ("GET", "/api/medecin/rendez-vous"): {"budget": 3, "role": "medecin"},
+    ("GET", "/api/admin/recherche"): {"budget": 3, "role": "admin", "params": {"q": "patient 1"}},
+    ("GET", "/api/admin/rendez-vous/export"): {"budget": 2, "role": "admin"},
+    ("PATCH", "/api/admin/rendez-vous/{rdv_id}"): {
+        "budget": 4, "role": "admin", "chemin": {"rdv_id": 1}, "json": {"notes": "RAS"}
+    },
+    ("POST", "/api/admin/notifications"): {
+        "budget": 3, "role": "admin", "json": {"utilisateur_id": 7, "sujet": "Test", "message": "Test"}
+    },
+    # La diffusion en masse s'exécute en tâche de fond dans le même appel;
+    # son nombre de requêtes croît avec le nombre de lots (NOTIFICATIONS_TAILLE_LOT)
+    ("POST", "/api/admin/notifications/masse"): {
+        "budget": 5, "role": "admin", "json": {"sujet": "Test", "message": "Test", "role": "medecin"}
+    },
+    ("GET", "/api/admin/notifications/masse/{tache_id}"): {
+        "budget": 1, "role": "admin", "chemin": {"tache_id": "inconnue"}
+    },
+    ("POST", "/api/admin/ml/placeholder"): {
+        "budget": 3, "role": "admin", "json": {"specialite": "Cardio", "patient_id": 7}
+    },
+    ("GET", "/api/admin/previsions"): {"budget": 2, "role": "admin"},
+    # Authentification, utilisateurs, rendez-vous (et annulations si le modèle est chargé),
+    # prévisions; les médecins viennent de l'annuaire
+    ("GET", "/api/dashboard/bootstrap"): {"budget": 5, "role": "admin"},
+    # Par lot : conflits (emails, téléphones) puis insertion
+    ("POST", "/api/admin/import/{type_import}"): {
+        "budget": 3, "role": "admin", "chemin": {"type_import": "patients"},
+        "contenu": "nom,telephone,email\nPatient importé,0699887766,importe@budget.fr\n",
+        "entetes": {"Content-Type": "text/csv"}
+    },
+}
+
+# Pages et ressources statiques : servies depuis la mémoire, sans requête SQL
+BUDGET_STATIQUE = 0
+
+
+def _evaluer(valeur, db):
+    return valeur(db) if callable(valeur) else valeur
+
+
+def _ajouter_donnees(facteur: int):
+    """Ajoute des médecins, horaires, patients et rendez-vous en masse"""
+    db = SessionLocal()
+    try:
+        premier_utilisateur = (db.query(func.max(Utilisateur.id)).scalar() or 0) + 1
+        premier_medecin = (db.query(func.max(Medecin.id)).scalar() or 0) + 1
+        nb_medecins = 5 * facteur
+        nb_patients = 50 * facteur
+
+        utilisateurs = [
+            {"nom": f"Dr. Synthétique {i}", "email": f"medecin{premier_utilisateur + i}@budget.fr",
+             "telephone": f"07{premier_utilisateur + i:08d}", "role": RoleUtilisateur.MEDECIN.value,
+             "est_actif": True, "date_creation": datetime.utcnow()}
+            for i in range(nb_medecins)
+        ] + [
+            {"nom": f"Patient {i}", "email": None, "telephone": f"06{premier_utilisateur + nb_medecins + i:08d}",
+             "role": RoleUtilisateur.PATIENT.value, "est_actif": True, "date_creation": datetime.utcnow()}
+            for i in range(nb_patients)
+        ]
+        db.execute(insert(Utilisateur), utilisateurs)
+        db.execute(insert(Medecin), [
+            {"utilisateur_id": premier_utilisateur + i, "specialite": "Cardiologie",
+             "description": "Synthétique", "duree_consultation": 30, "est_disponible": True}
+            for i in range(nb_medecins)
+        ])
+        db.execute(insert(HoraireMedecin), [
+            {"medecin_id": premier_medecin + i, "jour_semaine": jour,
+             "heure_debut": "09:00", "heure_fin": "17:00", "est_actif": True}
+            for i in range(nb_medecins) for jour in range(5)
+        ])
+        maintenant = datetime.now()
+        db.execute(insert(RendezVous), [
+            {"patient_id": premier_utilisateur + nb_medecins + i % nb_patients,
+             "medecin_id": 1 + i % (premier_medecin + nb_medecins - 1),
+             "date_heure": maintenant + timedelta(days=i % 60 - 30, hours=i % 8),
+             "statut": StatutRendezVous.CONFIRME.value if i % 5 else StatutRendezVous.ANNULE.value,
+             "motif": "Synthétique", "date_creation": maintenant}
+            for i in range(200 * facteur)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    # Insertions hors ORM : l'annuaire est rechargé ici, hors comptage
+    annuaire.invalider()
+    annuaire.obtenir()
+
+
+def _routes_a_controler():
+    """Toutes les routes de l'application : (méthode, chemin, scénario)"""
+    routes = []
+    for route in main.app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for methode in sorted(route.methods):
+            scenario = SCENARIOS.get((methode, route.path))
+            if scenario is None and methode == "GET" and not route.include_in_schema or \
+                    route.path in main.PAGES_FRONTEND:
+                scenario = {"budget": BUDGET_STATIQUE}
+            routes.append((methode, route.path, scenario))
+    return routes
+
+
+def mesurer(clients: dict) -> dict:
+    """Appelle chaque route une fois et retourne {(méthode, chemin): (statut, instructions)}"""
+    instructions = []
+    comptage = {"actif": False}
+
+    def _enregistrer(conn, cursor, statement, parameters, context, executemany):
+        if comptage["actif"]:
+            instructions.append(statement)
+
+    # Les lots du journal d'audit, écrits par un autre fil, ne sont pas imputés aux routes :
+    # le fil d'écriture est arrêté pendant la mesure (le tampon est vidé à l'arrêt du client)
+    audit.journal.arreter()
+
+    moteurs = {engine, engine_lecture}
+    for moteur in moteurs:
+        event.listen(moteur, "before_cursor_execute", _enregistrer)
+    resultats = {}
+    try:
+        for methode, chemin, scenario in _routes_a_controler():
+            if scenario is None:
+                resultats[(methode, chemin)] = None
+                continue
+
+            db = SessionLocal()
+            try:
+                parametres_chemin = _evaluer(scenario.get("chemin", {}), db)
+                params = _evaluer(scenario.get("params"), db)
+                corps = _evaluer(scenario.get("json"), db)
+            finally:
+                db.close()
+
+            if scenario.get("session_jetable"):
+                client = TestClient(main.app)
+            else:
+                client = clients[scenario.get("role", "anonyme")]
+
+            del instructions[:]
+            comptage["actif"] = True
+            try:
+                reponse = client.request(
+                    methode, chemin.format(**parametres_chemin), params=params, json=corps,
+                    content=scenario.get("contenu"), headers=scenario.get("entetes")
+                )
+            finally:
+                comptage["actif"] = False
+            resultats[(methode, chemin)] = (reponse.status_code, list(instructions))
+    finally:
+        for moteur in moteurs:
+            event.remove(moteur, "before_cursor_execute", _enregistrer)
+    return resultats
+
+
+def _instruction_repetee(instructions: list) -> str:
+    if not instructions:
+        return ""
+    instruction, nombre = Counter(instructions).most_common(1)[0]
+    resume = " ".join(instruction.split())[:160]
+    return f"{nombre}x « {resume} »"
+
+
+def verifier() -> list:
+    """Exécute le contrôle et retourne la liste des échecs"""
+    echecs = []
+    with TestClient(main.app) as anonyme:
+        clients = {"anonyme": anonyme}
+        for role, (email, mot_de_passe) in IDENTIFIANTS.items():
+            client = TestClient(main.app)
+            reponse = client.post("/api/auth/login", json={"email": email, "mot_de_passe": mot_de_passe})
+            if reponse.status_code != 200:
+                return [f"Connexion impossible pour le rôle {role}"]
+            clients[role] = client
+
+        _ajouter_donnees(facteur=1)
+        petit = mesurer(clients)
+        _ajouter_donnees(facteur=10)
+        grand = mesurer(clients)
+
+    for cle, mesure in sorted(grand.items()):
+        methode, chemin = cle
+        nom = f"{methode} {chemin}"
+        if mesure is None:
+            echecs.append(f"{nom} : aucun scénario dans budget_requetes.SCENARIOS")
+            continue
+
+        statut, instructions = mesure
+        scenario = SCENARIOS.get(cle, {"budget": BUDGET_STATIQUE})
+        budget = scenario["budget"]
+        nombre_petit = len(petit[cle][1])
+        if statut >= 500:
+            echecs.append(f"{nom} : erreur serveur {statut}")
+        elif len(instructions) > budget:
+            echecs.append(
+                f"{nom} : {len(instructions)} requêtes SQL (budget {budget}) — "
+                f"{_instruction_repetee(instructions)}"
+            )
+        elif len(instructions) > nombre_petit:
+            echecs.append(
+                f"{nom} : {nombre_petit} → {len(instructions)} requêtes SQL quand les données "
+                f"grossissent — {_instruction_repetee(instructions)}"
+            )
+        else:
+            print(f"   ✅ {nom} : {len(instructions)}/{budget}")
+    return echecs
+
+
+if __name__ == "__main__":
+    print("🔍 Contrôle du budget de requêtes SQL par route")
+    resultat_echecs = verifier()
+    for echec in resultat_echecs:
+        print(f"   ❌ {echec}")
+    if resultat_echecs:
+        print(f"\n{len(resultat_echecs)} route(s) hors budget")
+        sys.exit(1)
+    print("\n✅ Toutes les routes respectent leur budget")
@@ -5,14 +5,21 @@ Supporte le mode avec OpenAI API ou le mode simulation (sans API)
 
 import os
 import json
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, List
+import fastapi.concurrency
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from models import (
-    Medecin, RendezVous, Utilisateur, HoraireMedecin,
+    Medecin, RendezVous, Utilisateur,
     StatutRendezVous, RoleUtilisateur
 )
+import metriques
+import annuaire
+import audit
+import telephones
 
 # Vérifier si on utilise l'API OpenAI ou le mode simulation
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -66,7 +73,7 @@ FONCTIONS_CHATBOT = [
             "properties": {
                 "specialite": {
                     "type": "string",
-                    "description": "La spécialité recherchée (ex: Cardiologie, Dentiste, Pédiatrie)"
+                    "description": "La spécialité recherchée (ex: Cardiologie, Dentiste, Pédiatrie, ou cardio, dentaire)"
                 }
             }
         }
@@ -159,14 +166,16 @@ class ChatbotMedical:
     Classe principale du chatbot médical
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, acteur: str = "anonyme"):
         """
         Initialise le chatbot avec une session de base de données
 
         Args:
             db: Session SQLAlchemy pour accéder à la base de données
+            acteur: Auteur des actions inscrites au journal d'audit (voir audit.acteur)
         """
         self.db = db
+        self.acteur = acteur
 
     # ==================== Fonctions de gestion des médecins ====================
 
@@ -180,31 +189,8 @@ class ChatbotMedical:
         Returns:
             Dictionnaire avec la liste des médecins
         """
-        # Requête avec jointure pour obtenir les noms
-        requete = self.db.query(Medecin, Utilisateur).join(
-            Utilisateur,
-            Medecin.utilisateur_id == Utilisateur.id
-        )
-
-        # Filtrer par spécialité si spécifié
-        if specialite:
-            requete = requete.filter(
-                Medecin.specialite.ilike(f"%{specialite}%")
-            )
-
-        # Filtrer les médecins disponibles
-        medecins = requete.filter(Medecin.est_disponible == True).all()
-
-        # Formater les résultats
-        resultats = []
-        for medecin, utilisateur in medecins:
-            resultats.append({
-                "id": medecin.id,
-                "nom": utilisateur.nom,
-                "specialite": medecin.specialite,
-                "description": medecin.description,
-                "duree_consultation": medecin.duree_consultation
-            })
+        # Annuaire en mémoire (index par spécialité, médecins disponibles)
+        resultats = [fiche.en_dict() for fiche in annuaire.obtenir().rechercher(specialite)]
 
         return {
             "succes": True,
@@ -241,26 +227,16 @@ class ChatbotMedical:
                 "erreur": "Impossible de réserver dans le passé"
             }
 
-        # Vérifier que le médecin existe
-        medecin = self.db.query(Medecin).filter(Medecin.id == medecin_id).first()
+        # Vérifier que le médecin existe (annuaire en mémoire)
+        medecin = annuaire.obtenir().medecin(medecin_id)
         if not medecin:
             return {
                 "succes": False,
                 "erreur": "Médecin non trouvé"
             }
 
-        # Obtenir le nom du médecin
-        utilisateur = self.db.query(Utilisateur).filter(
-            Utilisateur.id == medecin.utilisateur_id
-        ).first()
-
         # Obtenir l'horaire du médecin pour ce jour
-        jour_semaine = date_cible.weekday()
-        horaire = self.db.query(HoraireMedecin).filter(
-            HoraireMedecin.medecin_id == medecin_id,
-            HoraireMedecin.jour_semaine == jour_semaine,
-            HoraireMedecin.est_actif == True
-        ).first()
+        horaire = medecin.horaires[date_cible.weekday()]
 
         if not horaire:
             return {
@@ -270,8 +246,8 @@ class ChatbotMedical:
             }
 
         # Générer tous les créneaux possibles
-        heure_debut, minute_debut = map(int, horaire.heure_debut.split(":"))
-        heure_fin, minute_fin = map(int, horaire.heure_fin.split(":"))
+        heure_debut, minute_debut = map(int, horaire[0].split(":"))
+        heure_fin, minute_fin = map(int, horaire[1].split(":"))
 
         duree = medecin.duree_consultation
         creneaux = []
@@ -311,12 +287,22 @@ class ChatbotMedical:
         return {
             "succes": True,
             "date": date,
-            "nom_medecin": utilisateur.nom if utilisateur else "Inconnu",
+            "nom_medecin": medecin.nom,
             "creneaux_disponibles": creneaux
         }
 
     # ==================== Fonctions de réservation ====================
 
+    def _patient_par_telephone(self, telephone: Optional[str]) -> Optional[Utilisateur]:
+        """Patient dont le numéro a la même forme canonique (index unique partiel)"""
+        canonique = telephones.normaliser(telephone)
+        if canonique is None:
+            return None
+        return self.db.query(Utilisateur).filter(
+            Utilisateur.telephone_normalise == canonique,
+            Utilisateur.role == RoleUtilisateur.PATIENT.value
+        ).first()
+
     def reserver_rendez_vous(
             self,
             medecin_id: int,
@@ -365,22 +351,26 @@ class ChatbotMedical:
                 "erreur": "Ce créneau est déjà réservé. Veuillez choisir un autre horaire."
             }
 
-        # Créer ou trouver le patient
-        patient = None
-        if telephone_patient:
-            patient = self.db.query(Utilisateur).filter(
-                Utilisateur.telephone == telephone_patient
-            ).first()
+        # Créer ou trouver le patient (identifié par son numéro canonique)
+        patient = self._patient_par_telephone(telephone_patient)
 
         if not patient:
             patient = Utilisateur(
                 nom=nom_patient,
-                telephone=telephone_patient or "0000000000",
+                telephone=telephone_patient or None,
                 role=RoleUtilisateur.PATIENT.value
             )
             self.db.add(patient)
-            self.db.commit()
-            self.db.refresh(patient)
+            try:
+                self.db.commit()
+            except IntegrityError:
+                # Le même numéro vient d'être enregistré par une réservation concurrente
+                self.db.rollback()
+                patient = self._patient_par_telephone(telephone_patient)
+                if not patient:
+                    raise
+            else:
+                self.db.refresh(patient)
 
         # Créer le rendez-vous
         nouveau_rdv = RendezVous(
@@ -394,12 +384,13 @@ class ChatbotMedical:
         self.db.add(nouveau_rdv)
         self.db.commit()
         self.db.refresh(nouveau_rdv)
+        audit.journal.enregistrer(
+            "creer_rendez_vous", self.acteur, "rendez_vous", nouveau_rdv.id,
+            patient_id=nouveau_rdv.patient_id, medecin_id=medecin_id, date_heure=date_heure_rdv
+        )
 
         # Obtenir les informations du médecin
-        medecin = self.db.query(Medecin, Utilisateur).join(
-            Utilisateur,
-            Medecin.utilisateur_id == Utilisateur.id
-        ).filter(Medecin.id == medecin_id).first()
+        medecin = annuaire.obtenir().medecin(medecin_id)
 
         return {
             "succes": True,
@@ -407,8 +398,8 @@ class ChatbotMedical:
             "message": "Votre rendez-vous a été confirmé !",
             "details": {
                 "Numéro": f"RDV-{nouveau_rdv.id:04d}",
-                "Médecin": medecin[1].nom if medecin else "Inconnu",
-                "Spécialité": medecin[0].specialite if medecin else "Inconnu",
+                "Médecin": medecin.nom if medecin else "Inconnu",
+                "Spécialité": medecin.specialite if medecin else "Inconnu",
                 "Date": date,
                 "Heure": heure,
                 "Patient": nom_patient
@@ -446,6 +437,7 @@ class ChatbotMedical:
         # Annuler le rendez-vous
         rdv.statut = StatutRendezVous.ANNULE.value
         self.db.commit()
+        audit.journal.enregistrer("annuler_rendez_vous", self.acteur, "rendez_vous", rendez_vous_id)
 
         return {
             "succes": True,
@@ -464,9 +456,7 @@ class ChatbotMedical:
         Returns:
             Dictionnaire avec la liste des rendez-vous
         """
-        patient = self.db.query(Utilisateur).filter(
-            Utilisateur.telephone == telephone_patient
-        ).first()
+        patient = self._patient_par_telephone(telephone_patient)
 
         if not patient:
             return {
@@ -483,6 +473,9 @@ class ChatbotMedical:
             RendezVous.patient_id == patient.id,
             RendezVous.date_heure >= datetime.now()
         ).all()
+        audit.journal.enregistrer(
+            "consulter_rendez_vous_patient", self.acteur, "patient", patient.id, nombre=len(rendez_vous)
+        )
 
         resultats = []
         for rdv, medecin, utilisateur_medecin in rendez_vous:
@@ -640,6 +633,33 @@ Voici ce que je peux faire :
 
 Comment puis-je vous aider ?"""
 
+    # ==================== Appels au LLM ====================
+
+    def _appeler_llm(self, **parametres):
+        """
+        Appelle l'API OpenAI en enregistrant la latence et les jetons consommés
+
+        Args:
+            parametres: Paramètres transmis à chat.completions.create
+
+        Returns:
+            Réponse de l'API
+        """
+        debut = time.perf_counter()
+        try:
+            reponse = client_openai.chat.completions.create(**parametres)
+        except Exception:
+            metriques.enregistrer_appel_llm(time.perf_counter() - debut, erreur=True)
+            raise
+
+        usage = getattr(reponse, "usage", None)
+        metriques.enregistrer_appel_llm(
+            time.perf_counter() - debut,
+            jetons_prompt=getattr(usage, "prompt_tokens", 0) or 0,
+            jetons_reponse=getattr(usage, "completion_tokens", 0) or 0
+        )
+        return reponse
+
     # ==================== Fonction principale de chat ====================
 
     async def discuter(
@@ -650,6 +670,9 @@ Comment puis-je vous aider ?"""
         """
         Fonction principale de conversation
 
+        Les appels au LLM et à la base sont bloquants : ils s'exécutent dans le
+        pool de threads pour ne pas bloquer la boucle d'événements.
+
         Args:
             message_utilisateur: Message de l'utilisateur
             historique: Historique de la conversation
@@ -657,17 +680,33 @@ Comment puis-je vous aider ?"""
         Returns:
             Tuple (réponse, nouvel_historique)
         """
+        return await fastapi.concurrency.run_in_threadpool(self.repondre, message_utilisateur, historique)
+
+    def discuter_en_simulation(
+            self,
+            message_utilisateur: str,
+            historique: List[dict] = None
+    ) -> Tuple[str, List[dict]]:
+        """Réponse par règles, sans LLM (mode simulation ou service dégradé)"""
+        reponse = self.obtenir_reponse_simulation(message_utilisateur)
+        nouvel_historique = (historique or []) + [
+            {"role": "user", "content": message_utilisateur},
+            {"role": "assistant", "content": reponse}
+        ]
+        return reponse, nouvel_historique
+
+    def repondre(
+            self,
+            message_utilisateur: str,
+            historique: List[dict] = None
+    ) -> Tuple[str, List[dict]]:
+        """Version synchrone de `discuter`"""
         if historique is None:
             historique = []
 
         # Mode simulation (sans API OpenAI)
         if MODE_SIMULATION:
-            reponse = self.obtenir_reponse_simulation(message_utilisateur)
-            nouvel_historique = historique + [
-                {"role": "user", "content": message_utilisateur},
-                {"role": "assistant", "content": reponse}
-            ]
-            return reponse, nouvel_historique
+            return self.discuter_en_simulation(message_utilisateur, historique)
 
         # Mode avec API OpenAI
         messages = [{"role": "system", "content": PROMPT_SYSTEME}]
@@ -676,7 +715,7 @@ Comment puis-je vous aider ?"""
 
         try:
             # Appel à l'API OpenAI
-            reponse_api = client_openai.chat.completions.create(
+            reponse_api = self._appeler_llm(
                 model="gpt-3.5-turbo",
                 messages=messages,
                 functions=FONCTIONS_CHATBOT,
@@ -694,6 +733,9 @@ Comment puis-je vous aider ?"""
                 # Exécuter la fonction
                 resultat_fonction = self.traiter_appel_fonction(nom_fonction, arguments)
 
+                # Terminer la transaction pour rendre la connexion pendant le second appel au LLM
+                self.db.commit()
+
                 # Ajouter le résultat à la conversation
                 messages.append({
                     "role": "assistant",
@@ -710,7 +752,7 @@ Comment puis-je vous aider ?"""
                 })
 
                 # Obtenir la réponse finale
-                reponse_finale = client_openai.chat.completions.create(
+                reponse_finale = self._appeler_llm(
                     model="gpt-3.5-turbo",
                     messages=messages,
                     temperature=0.7
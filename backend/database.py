@@ -3,7 +3,8 @@ Configuration et initialisation de la base de donn��es
 Inclut les données de démonstration
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 from models import (
     Base, Utilisateur, Medecin, HoraireMedecin,
@@ -11,30 +12,168 @@ from models import (
 )
 from datetime import datetime, timedelta
 import os
+from typing import Tuple
 from passlib.context import CryptContext
 from session_auth import hacher_mot_de_passe
+from migrations import appliquer_migrations
 
 # URL de la base de données (SQLite par défaut)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medical_appointments.db")
 
-# Création du moteur de base de données
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Nécessaire pour SQLite
-)
+# ==================== Profil SQLite ====================
+
+# "performance" : WAL, pragmas de production, moteur de lecture séparé, un seul écrivain
+# "standard" : moteur unique avec les réglages par défaut de SQLite
+SQLITE_PROFIL = os.getenv("SQLITE_PROFIL", "performance")
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # les lecteurs ne bloquent plus l'écrivain (et inversement)
+    "synchronous": "NORMAL",  # sûr en WAL, évite un fsync par transaction
+    "mmap_size": int(os.getenv("SQLITE_MMAP_OCTETS", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KO", "65536")),  # négatif : en Kio
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+SQLITE_CONNEXIONS_LECTURE = int(os.getenv("SQLITE_CONNEXIONS_LECTURE", "8"))
+SQLITE_ATTENTE_ECRITURE_S = float(os.getenv("SQLITE_ATTENTE_ECRITURE_S", "30"))
+
+
+def _sqlite_fichier(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def _appliquer_pragmas(moteur: Engine, lecture: bool):
+    @event.listens_for(moteur, "connect")
+    def _pragmas(connexion_dbapi, _):
+        curseur = connexion_dbapi.cursor()
+        for nom, valeur in SQLITE_PRAGMAS.items():
+            # Le mode de journal est persistant dans le fichier : fixé par l'écrivain
+            if lecture and nom == "journal_mode":
+                continue
+            curseur.execute(f"PRAGMA {nom}={valeur}")
+        if lecture:
+            curseur.execute("PRAGMA query_only=ON")
+        curseur.close()
+
+
+# ==================== Serveur de base de données (PostgreSQL) ====================
+
+# Réplique en lecture seule optionnelle pour les routes GET
+DATABASE_URL_LECTURE = os.getenv("DATABASE_URL_LECTURE", "")
+
+DB_POOL_TAILLE = int(os.getenv("DB_POOL_TAILLE", "10"))
+DB_POOL_DEBORDEMENT = int(os.getenv("DB_POOL_DEBORDEMENT", "20"))
+DB_POOL_RECYCLAGE_S = int(os.getenv("DB_POOL_RECYCLAGE_S", "1800"))
+DB_POOL_ATTENTE_S = float(os.getenv("DB_POOL_ATTENTE_S", "30"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+def _normaliser_url(url: str) -> str:
+    # Schéma "postgres://" des hébergeurs, refusé par SQLAlchemy 2
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _creer_moteur_serveur(url: str) -> Engine:
+    """Moteur poolé pour un serveur de base de données (plusieurs workers uvicorn)"""
+    connect_args = {}
+    if make_url(url).get_backend_name() == "postgresql":
+        connect_args = {
+            "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+            "application_name": "rendez-vous-medicaux",
+        }
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=DB_POOL_TAILLE,
+        max_overflow=DB_POOL_DEBORDEMENT,
+        pool_recycle=DB_POOL_RECYCLAGE_S,
+        pool_timeout=DB_POOL_ATTENTE_S,
+        pool_pre_ping=True,  # connexions coupées par le serveur ou un proxy
+    )
+
+
+def creer_moteurs(url: str, profil: str = SQLITE_PROFIL, url_lecture: str = DATABASE_URL_LECTURE) -> Tuple[Engine, Engine]:
+    """
+    Crée les moteurs d'écriture et de lecture
+
+    Returns:
+        (moteur d'écriture, moteur de lecture); identiques pour le profil
+        "standard", les bases SQLite en mémoire et un serveur sans réplique
+    """
+    url = _normaliser_url(url)
+    if make_url(url).get_backend_name() != "sqlite":
+        ecriture = _creer_moteur_serveur(url)
+        lecture = _creer_moteur_serveur(_normaliser_url(url_lecture)) if url_lecture else ecriture
+        return ecriture, lecture
 
-# Session factory
+    if not _sqlite_fichier(url) or profil != "performance":
+        moteur = create_engine(
+            url,
+            connect_args={"check_same_thread": False}  # Nécessaire pour SQLite
+        )
+        return moteur, moteur
+
+    # Un seul écrivain : les écritures concurrentes attendent une connexion
+    # dans le pool plutôt que d'échouer sur "database is locked"
+    ecriture = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=SQLITE_ATTENTE_ECRITURE_S,
+    )
+    _appliquer_pragmas(ecriture, lecture=False)
+
+    lecture = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=SQLITE_CONNEXIONS_LECTURE,
+        max_overflow=SQLITE_CONNEXIONS_LECTURE,
+    )
+    _appliquer_pragmas(lecture, lecture=True)
+    return ecriture, lecture
+
+
+# Création des moteurs de base de données
+engine, engine_lecture = creer_moteurs(DATABASE_URL)
+
+# Session factories (écriture et lecture seule)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLecture = sessionmaker(autocommit=False, autoflush=False, bind=engine_lecture)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+# Clé du verrou consultatif PostgreSQL de l'initialisation
+CLE_VERROU_INITIALISATION = 4815162342
+
+
 def initialiser_base_de_donnees():
     """
     Crée les tables et ajoute des données de démonstration
+    Avec plusieurs workers sur un même serveur PostgreSQL, un verrou consultatif
+    garantit qu'un seul worker crée le schéma et les données à la fois.
     """
+    if engine.dialect.name != "postgresql":
+        _initialiser_base_de_donnees()
+        return
+
+    with engine.connect() as connexion:
+        connexion.execute(text("SELECT pg_advisory_lock(:cle)"), {"cle": CLE_VERROU_INITIALISATION})
+        try:
+            _initialiser_base_de_donnees()
+        finally:
+            connexion.execute(text("SELECT pg_advisory_unlock(:cle)"), {"cle": CLE_VERROU_INITIALISATION})
+
+
+def _initialiser_base_de_donnees():
     # Créer toutes les tables
     Base.metadata.create_all(bind=engine)
+    # Modifications des bases existantes (index, colonnes)
+    appliquer_migrations(engine)
 
     db = SessionLocal()
 
@@ -209,6 +348,17 @@ def obtenir_session():
     Générateur de session pour l'injection de dépendances FastAPI
     """
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def obtenir_session_lecture():
+    """
+    Session en lecture seule pour les routes GET (moteur de lecture)
+    """
+    db = SessionLecture()
     try:
         yield db
     finally:
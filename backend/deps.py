@@ -3,14 +3,14 @@
 from fastapi import Depends, HTTPException, Cookie
 from sqlalchemy.orm import Session
 
-from database import obtenir_session
+from database import obtenir_session_lecture
 from models import Utilisateur
 from session_auth import decoder_session_token
 
 
 def get_current_user(
     session_token: str | None = Cookie(default=None, alias="session_token"),
-    db: Session = Depends(obtenir_session)
+    db: Session = Depends(obtenir_session_lecture)
 ) -> Utilisateur:
     if not session_token:
         raise HTTPException(status_code=401, detail="Session manquante")
@@ -0,0 +1,258 @@
+"""
+Générateur de données synthétiques pour les tests de charge
+Crée des médecins, horaires, patients, rendez-vous et messages de chatbot
+par insertions groupées (executemany par lots), à l'échelle voulue.
+La base cible est celle de DATABASE_URL; les comptes de démonstration
+(admin, secrétaire, médecins, patient) sont créés s'ils n'existent pas.
+
+Usage:
+    DATABASE_URL=sqlite:///./charge.db python generer_donnees.py --medecins 2000 --patients 1000000 --rendez-vous 3000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from database import engine, initialiser_base_de_donnees
+from models import (
+    Utilisateur, Medecin, HoraireMedecin, RendezVous, MessageChat,
+    RoleUtilisateur, StatutRendezVous
+)
+from session_auth import hacher_mot_de_passe
+
+SPECIALITES = (
+    ("Médecine Générale", 35, 20), ("Pédiatrie", 10, 25), ("Cardiologie", 8, 30),
+    ("Dermatologie", 8, 20), ("Dentiste", 10, 45), ("Gynécologie", 7, 30),
+    ("Ophtalmologie", 6, 20), ("ORL", 4, 20), ("Psychiatrie", 4, 45),
+    ("Rhumatologie", 3, 30), ("Neurologie", 3, 30), ("Kinésithérapie", 2, 30),
+)
+PRENOMS = (
+    "Jean", "Marie", "Pierre", "Sophie", "Luc", "Claire", "Paul", "Julie", "Louis", "Emma",
+    "Hugo", "Léa", "Nathan", "Chloé", "Lucas", "Manon", "Thomas", "Camille", "Nicolas", "Sarah",
+    "Karim", "Yasmine", "Mehdi", "Inès", "Antoine", "Alice", "Julien", "Laura", "Mathieu", "Zoé",
+)
+NOMS = (
+    "Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy",
+    "Moreau", "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "David", "Bertrand", "Roux",
+    "Vincent", "Fournier", "Morel", "Girard", "André", "Mercier", "Dupont", "Lambert", "Bonnet",
+    "Benali", "Haddad", "Mahrez",
+)
+PLAGES_HORAIRES = (("08:00", "12:00"), ("09:00", "17:00"), ("08:30", "18:30"), ("13:00", "19:00"))
+MOTIFS = (
+    "Consultation générale", "Contrôle annuel", "Renouvellement d'ordonnance", "Douleurs",
+    "Suivi de traitement", "Vaccination", "Bilan", None,
+)
+MESSAGES_PATIENT = (
+    "Bonjour, je voudrais prendre rendez-vous", "Quels médecins sont disponibles demain ?",
+    "Je cherche un cardiologue", "Quels sont vos horaires ?", "Je veux annuler mon rendez-vous",
+    "Avez-vous un créneau cette semaine ?",
+)
+MESSAGES_ASSISTANT = (
+    "Bien sûr, pour quelle spécialité ?", "Voici les médecins disponibles.",
+    "Quelle date vous conviendrait ?", "Votre rendez-vous est confirmé.",
+)
+
+
+def _minutes(heure: str) -> int:
+    heures, minutes = heure.split(":")
+    return int(heures) * 60 + int(minutes)
+
+
+def _inserer(connexion, table, lignes: list, compteur: dict):
+    if lignes:
+        connexion.execute(insert(table), lignes)
+        compteur[table.__tablename__] = compteur.get(table.__tablename__, 0) + len(lignes)
+
+
+def _prochain_id(connexion, colonne) -> int:
+    return (connexion.execute(select(func.max(colonne))).scalar() or 0) + 1
+
+
+def generer(
+    nb_medecins: int,
+    nb_patients: int,
+    nb_rendez_vous: int,
+    nb_messages: int,
+    jours_passe: int = 365,
+    jours_futur: int = 60,
+    taille_lot: int = 10000,
+    graine: int = 42,
+) -> dict:
+    """
+    Ajoute les données synthétiques à la base
+
+    Returns:
+        Nombre de lignes insérées par table
+    """
+    aleatoire = random.Random(graine)
+    maintenant = datetime.now().replace(second=0, microsecond=0)
+    compteur: dict = {}
+    # Un seul hachage bcrypt partagé par tous les comptes générés ("medecin123")
+    hash_personnel = hacher_mot_de_passe("medecin123")
+    specialites, poids, durees = zip(*SPECIALITES)
+    duree_par_specialite = dict(zip(specialites, durees))
+
+    with engine.begin() as connexion:
+        premier_utilisateur = _prochain_id(connexion, Utilisateur.id)
+        premier_medecin = _prochain_id(connexion, Medecin.id)
+
+        # ========== Médecins et leurs horaires ==========
+        medecins = []  # (id, durée, {jour: (début, fin) en minutes})
+        utilisateurs, lignes_medecins, horaires = [], [], []
+        for i in range(nb_medecins):
+            utilisateur_id = premier_utilisateur + i
+            medecin_id = premier_medecin + i
+            prenom, nom = aleatoire.choice(PRENOMS), aleatoire.choice(NOMS)
+            specialite = aleatoire.choices(specialites, weights=poids)[0]
+            utilisateurs.append({
+                "nom": f"Dr. {prenom} {nom}",
+                "email": f"{prenom.lower()}.{nom.lower()}.{utilisateur_id}@clinique.fr",
+                "telephone": f"07{utilisateur_id:08d}",
+                "role": RoleUtilisateur.MEDECIN.value,
+                "mot_de_passe_hash": hash_personnel,
+                "est_actif": True,
+                "date_creation": maintenant,
+            })
+            lignes_medecins.append({
+                "utilisateur_id": utilisateur_id,
+                "specialite": specialite,
+                "description": f"{specialite} - cabinet {1 + i % 50}",
+                "duree_consultation": duree_par_specialite[specialite],
+                "est_disponible": aleatoire.random() > 0.05,
+            })
+            jours = sorted(aleatoire.sample(range(6), aleatoire.choice((3, 4, 5, 5, 5))))
+            plages = {}
+            for jour in jours:
+                debut, fin = aleatoire.choice(PLAGES_HORAIRES)
+                plages[jour] = (_minutes(debut), _minutes(fin))
+                horaires.append({
+                    "medecin_id": medecin_id, "jour_semaine": jour,
+                    "heure_debut": debut, "heure_fin": fin, "est_actif": True,
+                })
+            medecins.append((medecin_id, duree_par_specialite[specialite], plages))
+
+            if len(utilisateurs) >= taille_lot:
+                _inserer(connexion, Utilisateur, utilisateurs, compteur)
+                _inserer(connexion, Medecin, lignes_medecins, compteur)
+                utilisateurs, lignes_medecins = [], []
+        _inserer(connexion, Utilisateur, utilisateurs, compteur)
+        _inserer(connexion, Medecin, lignes_medecins, compteur)
+        for debut in range(0, len(horaires), taille_lot):
+            _inserer(connexion, HoraireMedecin, horaires[debut:debut + taille_lot], compteur)
+        print(f"   👨‍⚕️ {nb_medecins} médecins, {len(horaires)} horaires")
+
+        # ========== Patients ==========
+        premier_patient = premier_utilisateur + nb_medecins
+        for debut in range(0, nb_patients, taille_lot):
+            _inserer(connexion, Utilisateur, [
+                {
+                    "nom": f"{aleatoire.choice(PRENOMS)} {aleatoire.choice(NOMS)}",
+                    "email": None,
+                    "telephone": f"06{premier_patient + i:08d}",
+                    "role": RoleUtilisateur.PATIENT.value,
+                    "mot_de_passe_hash": None,
+                    "est_actif": True,
+                    "date_creation": maintenant - timedelta(days=aleatoire.randint(0, jours_passe)),
+                }
+                for i in range(debut, min(debut + taille_lot, nb_patients))
+            ], compteur)
+        print(f"   🧑 {nb_patients} patients")
+
+        # ========== Rendez-vous (sans double réservation d'un créneau) ==========
+        medecins_actifs = [m for m in medecins if m[2]]
+        if medecins_actifs and nb_patients:
+            origine = (maintenant - timedelta(days=jours_passe)).replace(hour=0, minute=0)
+            nb_jours = jours_passe + jours_futur
+            # Au-delà de ~80% des créneaux existants, les tirages ne trouvent plus de place libre
+            capacite = int(0.8 * nb_jours / 7 * sum(
+                (fin - debut) // duree for _, duree, plages in medecins_actifs for debut, fin in plages.values()
+            ))
+            if nb_rendez_vous > capacite:
+                print(f"   ⚠️ {nb_rendez_vous} rendez-vous demandés, limité à {capacite} (créneaux disponibles)")
+                nb_rendez_vous = capacite
+            occupes = set()
+            lot = []
+            insere = 0
+            while insere + len(lot) < nb_rendez_vous:
+                medecin_id, duree, plages = aleatoire.choice(medecins_actifs)
+                jour = aleatoire.randrange(nb_jours)
+                date_jour = origine + timedelta(days=jour)
+                plage = plages.get(date_jour.weekday())
+                if plage is None:
+                    continue
+                creneau = aleatoire.randrange((plage[1] - plage[0]) // duree)
+                cle = (medecin_id * nb_jours + jour) * 1000 + creneau
+                if cle in occupes:
+                    continue
+                occupes.add(cle)
+
+                date_heure = date_jour + timedelta(minutes=plage[0] + creneau * duree)
+                tirage = aleatoire.random()
+                if date_heure < maintenant:
+                    statut = StatutRendezVous.TERMINE.value if tirage < 0.8 else StatutRendezVous.ANNULE.value
+                else:
+                    statut = StatutRendezVous.CONFIRME.value if tirage < 0.85 else (
+                        StatutRendezVous.EN_ATTENTE.value if tirage < 0.92 else StatutRendezVous.ANNULE.value
+                    )
+                lot.append({
+                    "patient_id": premier_patient + aleatoire.randrange(nb_patients),
+                    "medecin_id": medecin_id,
+                    "date_heure": date_heure,
+                    "statut": statut,
+                    "motif": aleatoire.choice(MOTIFS),
+                    "notes": None,
+                    "date_creation": date_heure - timedelta(hours=aleatoire.randint(1, 24 * 30)),
+                })
+                if len(lot) >= taille_lot:
+                    _inserer(connexion, RendezVous, lot, compteur)
+                    insere += len(lot)
+                    lot = []
+            _inserer(connexion, RendezVous, lot, compteur)
+        print(f"   📅 {compteur.get(RendezVous.__tablename__, 0)} rendez-vous")
+
+        # ========== Messages du chatbot ==========
+        lot = []
+        for i in range(nb_messages):
+            session = f"session-{graine}-{i // 6}"
+            patient = i % 2 == 0
+            lot.append({
+                "session_id": session,
+                "role": "user" if patient else "assistant",
+                "contenu": aleatoire.choice(MESSAGES_PATIENT if patient else MESSAGES_ASSISTANT),
+                "date_creation": maintenant - timedelta(minutes=aleatoire.randint(0, jours_passe * 1440)),
+            })
+            if len(lot) >= taille_lot:
+                _inserer(connexion, MessageChat, lot, compteur)
+                lot = []
+        _inserer(connexion, MessageChat, lot, compteur)
+        print(f"   💬 {nb_messages} messages de chatbot")
+
+    return compteur
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère des données synthétiques pour les tests de charge")
+    parser.add_argument("--medecins", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--rendez-vous", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--jours-passe", type=int, default=365)
+    parser.add_argument("--jours-futur", type=int, default=60)
+    parser.add_argument("--lot", type=int, default=10000)
+    parser.add_argument("--graine", type=int, default=42)
+    arguments = parser.parse_args()
+
+    initialiser_base_de_donnees()
+    print("🔄 Génération des données...")
+    debut_generation = time.perf_counter()
+    lignes = generer(
+        arguments.medecins, arguments.patients, arguments.rendez_vous, arguments.messages,
+        jours_passe=arguments.jours_passe, jours_futur=arguments.jours_futur,
+        taille_lot=arguments.lot, graine=arguments.graine,
+    )
+    duree_generation = time.perf_counter() - debut_generation
+    total = sum(lignes.values())
+    print(f"✅ {total} lignes en {duree_generation:.1f}s ({total / max(duree_generation, 1e-9):.0f} lignes/s)")
@@ -0,0 +1,138 @@
+"""
+Clés d'idempotence (en-tête Idempotency-Key)
+La première requête portant une clé est exécutée et son corps de réponse conservé
+(sérialisé) pendant IDEMPOTENCE_TTL_S; une répétition avec la même clé et le
+même contenu reçoit ce corps sans nouvelle exécution. Une répétition concurrente
+attend la fin de la requête en cours. La même clé avec un contenu différent est
+refusée (422).
+Le magasin est en mémoire, propre à chaque processus : derrière plusieurs
+workers, l'affinité de session du répartiteur doit garder un client sur le même.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import fastapi.concurrency
+from fastapi import HTTPException
+
+TTL_S = float(os.getenv("IDEMPOTENCE_TTL_S", "86400"))
+MAX_CLES = int(os.getenv("IDEMPOTENCE_MAX_CLES", "10000"))
+# Attente maximale d'une requête concurrente portant la même clé
+ATTENTE_S = float(os.getenv("IDEMPOTENCE_ATTENTE_S", "30"))
+LONGUEUR_MAX_CLE = 255
+
+ENTETE = "Idempotency-Key"
+ENTETE_REJOUE = "Idempotent-Replayed"
+
+
+class _Entree:
+    __slots__ = ("empreinte", "corps", "expiration", "termine")
+
+    def __init__(self, empreinte: str):
+        self.empreinte = empreinte
+        self.corps: Optional[bytes] = None
+        self.expiration = float("inf")
+        self.termine = threading.Event()
+
+
+class MagasinIdempotence:
+    """Clé -> corps de réponse, avec expiration et nombre de clés borné (LRU)"""
+
+    def __init__(self, ttl_s: float = TTL_S, max_cles: int = MAX_CLES):
+        self.ttl_s = ttl_s
+        self.max_cles = max_cles
+        self._entrees: "OrderedDict[str, _Entree]" = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def _purger(self, maintenant: float):
+        # Les entrées sont dans l'ordre d'insertion : les plus anciennes expirent en premier
+        while self._entrees:
+            cle, entree = next(iter(self._entrees.items()))
+            if entree.corps is not None and (entree.expiration <= maintenant or len(self._entrees) > self.max_cles):
+                del self._entrees[cle]
+            else:
+                break
+
+    def _reserver(self, cle: str, empreinte: str) -> Tuple[_Entree, bool]:
+        """(entrée, True si l'appelant doit exécuter la requête)"""
+        with self._verrou:
+            self._purger(time.monotonic())
+            entree = self._entrees.get(cle)
+            if entree is not None and entree.corps is not None and entree.expiration <= time.monotonic():
+                del self._entrees[cle]
+                entree = None
+            if entree is None:
+                entree = _Entree(empreinte)
+                self._entrees[cle] = entree
+                return entree, True
+        if entree.empreinte != empreinte:
+            raise HTTPException(
+                status_code=422,
+                detail="Clé d'idempotence déjà utilisée pour une requête différente"
+            )
+        return entree, False
+
+    def _abandonner(self, cle: str, entree: _Entree):
+        with self._verrou:
+            if self._entrees.get(cle) is entree:
+                del self._entrees[cle]
+        entree.termine.set()
+
+    async def executer(self, cle: str, empreinte: str, fonction: Callable[[], bytes]) -> Tuple[bytes, bool]:
+        """
+        Exécute `fonction` (synchrone, dans le pool de threads) une seule fois par clé
+
+        Returns:
+            (corps de la réponse, True si le corps est rejoué depuis le magasin)
+        """
+        while True:
+            entree, proprietaire = self._reserver(cle, empreinte)
+            if proprietaire:
+                try:
+                    corps = await fastapi.concurrency.run_in_threadpool(fonction)
+                except BaseException:
+                    # Échec : la clé est libérée et une nouvelle tentative pourra s'exécuter
+                    self._abandonner(cle, entree)
+                    raise
+                entree.corps = corps
+                entree.expiration = time.monotonic() + self.ttl_s
+                entree.termine.set()
+                return corps, False
+
+            if entree.corps is not None:
+                return entree.corps, True
+            if not await fastapi.concurrency.run_in_threadpool(entree.termine.wait, ATTENTE_S):
+                raise HTTPException(
+                    status_code=409,
+                    detail="Une requête avec cette clé d'idempotence est déjà en cours",
+                    headers={"Retry-After": "1"}
+                )
+            # Terminée (réponse disponible) ou abandonnée (nouvelle réservation de la clé)
+
+
+def valider_cle(cle: Optional[str]) -> Optional[str]:
+    """Clé de l'en-tête, ou None si absente; 400 si elle est trop longue"""
+    if cle is None:
+        return None
+    cle = cle.strip()
+    if not cle:
+        return None
+    if len(cle) > LONGUEUR_MAX_CLE:
+        raise HTTPException(status_code=400, detail=f"{ENTETE} trop longue ({LONGUEUR_MAX_CLE} caractères maximum)")
+    return cle
+
+
+def empreinte(*parties: bytes) -> str:
+    """Empreinte du contenu de la requête (route, corps canonique)"""
+    hachage = hashlib.sha256()
+    for partie in parties:
+        hachage.update(partie)
+        hachage.update(b"\0")
+    return hachage.hexdigest()
+
+
+magasin = MagasinIdempotence()
@@ -0,0 +1,421 @@
+"""
+Import en masse des patients, médecins et horaires (ouverture d'une clinique)
+Le fichier (CSV avec en-tête ou NDJSON, un objet par ligne) est lu en flux : les
+lignes sont validées par lots de IMPORT_TAILLE_LOT puis insérées par executemany,
+une transaction par lot. Une ligne invalide ou en conflit (téléphone de patient
+ou email déjà connu, horaire déjà défini) est rejetée avec son numéro et son
+motif, sans interrompre l'import. La mémoire utilisée ne dépend que de la taille
+des lots.
+
+Colonnes :
+    patients : nom, telephone, email
+    medecins : nom, email, specialite, telephone, description, duree_consultation,
+               est_disponible, mot_de_passe
+    horaires : medecin_id ou medecin_email, jour_semaine (0=Lundi), heure_debut, heure_fin
+
+Usage:
+    python import_masse.py patients patients.csv
+    python import_masse.py horaires horaires.ndjson --format ndjson
+"""
+
+import argparse
+import codecs
+import csv
+import os
+import re
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+import annuaire
+import telephones
+from models import Utilisateur, Medecin, HoraireMedecin, RoleUtilisateur
+from session_auth import hacher_mot_de_passe
+
+TAILLE_LOT = int(os.getenv("IMPORT_TAILLE_LOT", "5000"))
+# Erreurs détaillées dans le rapport (les suivantes sont seulement comptées)
+ERREURS_MAX = int(os.getenv("IMPORT_ERREURS_MAX", "1000"))
+
+FORMATS = ("csv", "ndjson")
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_HEURE = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+_VRAI = {"1", "true", "vrai", "oui", "yes"}
+_FAUX = {"0", "false", "faux", "non", "no"}
+
+
+# ==================== Lecture ====================
+
+def format_depuis_type_contenu(type_contenu: Optional[str]) -> str:
+    """Format déduit de l'en-tête Content-Type (CSV par défaut)"""
+    return "ndjson" if type_contenu and "json" in type_contenu else "csv"
+
+
+def lire_lignes(flux: BinaryIO, format: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(numéro de ligne, valeurs, erreur de lecture) pour chaque enregistrement du flux"""
+    if format == "ndjson":
+        for numero, ligne in enumerate(flux, 1):
+            if not ligne.strip():
+                continue
+            try:
+                valeurs = orjson.loads(ligne)
+            except orjson.JSONDecodeError:
+                yield numero, None, "JSON invalide"
+                continue
+            if isinstance(valeurs, dict):
+                yield numero, valeurs, None
+            else:
+                yield numero, None, "Objet JSON attendu"
+        return
+
+    texte = codecs.getreader("utf-8-sig")(flux, errors="replace")
+    lecteur = csv.DictReader(texte)
+    for valeurs in lecteur:
+        if None in valeurs:
+            yield lecteur.line_num, None, "Trop de colonnes"
+        else:
+            yield lecteur.line_num, valeurs, None
+
+
+def _texte(valeurs: dict, cle: str, obligatoire: bool = False, longueur: int = 100) -> Optional[str]:
+    valeur = valeurs.get(cle)
+    valeur = str(valeur).strip() if valeur is not None else ""
+    if not valeur:
+        if obligatoire:
+            raise ValueError(f"{cle} manquant")
+        return None
+    if len(valeur) > longueur:
+        raise ValueError(f"{cle} trop long ({longueur} caractères maximum)")
+    return valeur
+
+
+def _email(valeurs: dict, obligatoire: bool = False) -> Optional[str]:
+    email = _texte(valeurs, "email", obligatoire)
+    if email is None:
+        return None
+    if not _EMAIL.match(email):
+        raise ValueError("email invalide")
+    return email.lower()
+
+
+def _telephone(valeurs: dict) -> Tuple[Optional[str], Optional[str]]:
+    """(numéro saisi, forme canonique)"""
+    telephone = _texte(valeurs, "telephone", longueur=20)
+    if telephone is None:
+        return None, None
+    canonique = telephones.normaliser(telephone)
+    if canonique is None:
+        raise ValueError("telephone invalide")
+    return telephone, canonique
+
+
+def _entier(valeurs: dict, cle: str, minimum: int, maximum: int, defaut: Optional[int] = None) -> int:
+    valeur = valeurs.get(cle)
+    if valeur is None or str(valeur).strip() == "":
+        if defaut is None:
+            raise ValueError(f"{cle} manquant")
+        return defaut
+    try:
+        entier = int(str(valeur).strip())
+    except ValueError:
+        raise ValueError(f"{cle} doit être un entier")
+    if not minimum <= entier <= maximum:
+        raise ValueError(f"{cle} doit être compris entre {minimum} et {maximum}")
+    return entier
+
+
+def _booleen(valeurs: dict, cle: str, defaut: bool) -> bool:
+    valeur = valeurs.get(cle)
+    if isinstance(valeur, bool):
+        return valeur
+    texte = str(valeur).strip().lower() if valeur is not None else ""
+    if not texte:
+        return defaut
+    if texte in _VRAI:
+        return True
+    if texte in _FAUX:
+        return False
+    raise ValueError(f"{cle} doit être vrai ou faux")
+
+
+# ==================== Types d'import ====================
+
+class _Import:
+    """Validation d'une ligne et insertion d'un lot de lignes validées"""
+
+    def preparer(self, connexion: Connection):
+        """Charge le contexte nécessaire à la validation (appelé une fois)"""
+
+    def valider(self, valeurs: dict) -> dict:
+        """Ligne prête à insérer; lève ValueError avec le motif du rejet"""
+        raise NotImplementedError
+
+    def conflits(self, connexion: Connection, lot: List[Tuple[int, dict]]) -> Dict[int, str]:
+        """{numéro de ligne: motif} des lignes en conflit avec la base ou le lot"""
+        return {}
+
+    def inserer(self, connexion: Connection, lignes: List[dict]):
+        raise NotImplementedError
+
+    def apres_insertion(self, lignes: List[dict]):
+        """Met à jour le contexte de validation avec les lignes insérées"""
+
+
+class _ImportPatients(_Import):
+    def valider(self, valeurs: dict) -> dict:
+        telephone, canonique = _telephone(valeurs)
+        return {
+            "nom": _texte(valeurs, "nom", obligatoire=True),
+            "email": _email(valeurs),
+            "telephone": telephone,
+            "telephone_normalise": canonique,
+            "role": RoleUtilisateur.PATIENT.value,
+            "est_actif": True,
+            "date_creation": datetime.utcnow(),
+        }
+
+    def conflits(self, connexion: Connection, lot: List[Tuple[int, dict]]) -> Dict[int, str]:
+        return _conflits_utilisateurs(connexion, lot, telephone_patient=True)
+
+    def inserer(self, connexion: Connection, lignes: List[dict]):
+        connexion.execute(insert(Utilisateur.__table__), lignes)
+
+
+class _ImportMedecins(_Import):
+    def valider(self, valeurs: dict) -> dict:
+        telephone, canonique = _telephone(valeurs)
+        mot_de_passe = _texte(valeurs, "mot_de_passe", longueur=128)
+        return {
+            "nom": _texte(valeurs, "nom", obligatoire=True),
+            "email": _email(valeurs, obligatoire=True),
+            "telephone": telephone,
+            "telephone_normalise": canonique,
+            "mot_de_passe_hash": hacher_mot_de_passe(mot_de_passe) if mot_de_passe else None,
+            "role": RoleUtilisateur.MEDECIN.value,
+            "est_actif": True,
+            "date_creation": datetime.utcnow(),
+            "specialite": _texte(valeurs, "specialite", obligatoire=True),
+            "description": _texte(valeurs, "description", longueur=500),
+            "duree_consultation": _entier(valeurs, "duree_consultation", 5, 240, defaut=30),
+            "est_disponible": _booleen(valeurs, "est_disponible", True),
+        }
+
+    def conflits(self, connexion: Connection, lot: List[Tuple[int, dict]]) -> Dict[int, str]:
+        return _conflits_utilisateurs(connexion, lot, telephone_patient=False)
+
+    def inserer(self, connexion: Connection, lignes: List[dict]):
+        colonnes_medecin = ("specialite", "description", "duree_consultation", "est_disponible")
+        utilisateurs = Utilisateur.__table__
+        ids = connexion.execute(
+            insert(utilisateurs).returning(utilisateurs.c.id, sort_by_parameter_order=True),
+            [{cle: valeur for cle, valeur in ligne.items() if cle not in colonnes_medecin} for ligne in lignes]
+        ).scalars().all()
+        connexion.execute(insert(Medecin.__table__), [
+            {"utilisateur_id": identifiant, **{cle: ligne[cle] for cle in colonnes_medecin}}
+            for identifiant, ligne in zip(ids, lignes)
+        ])
+
+
+class _ImportHoraires(_Import):
+    def __init__(self):
+        self._medecins: Set[int] = set()
+        self._par_email: Dict[str, int] = {}
+        self._existants: Set[Tuple[int, int]] = set()
+
+    def preparer(self, connexion: Connection):
+        for identifiant, email in connexion.execute(
+            select(Medecin.id, Utilisateur.email).join(Utilisateur, Medecin.utilisateur_id == Utilisateur.id,
+                                                       isouter=True)
+        ):
+            self._medecins.add(identifiant)
+            if email:
+                self._par_email[email.lower()] = identifiant
+        self._existants = set(connexion.execute(
+            select(HoraireMedecin.medecin_id, HoraireMedecin.jour_semaine).where(HoraireMedecin.est_actif == True)
+        ).tuples())
+
+    def valider(self, valeurs: dict) -> dict:
+        if str(valeurs.get("medecin_id") or "").strip():
+            medecin_id = _entier(valeurs, "medecin_id", 1, 2 ** 31)
+            if medecin_id not in self._medecins:
+                raise ValueError("medecin_id inconnu")
+        else:
+            email = _email({"email": valeurs.get("medecin_email")})
+            if email is None:
+                raise ValueError("medecin_id ou medecin_email manquant")
+            medecin_id = self._par_email.get(email)
+            if medecin_id is None:
+                raise ValueError("medecin_email inconnu")
+        heure_debut = _texte(valeurs, "heure_debut", obligatoire=True)
+        heure_fin = _texte(valeurs, "heure_fin", obligatoire=True)
+        if not _HEURE.match(heure_debut) or not _HEURE.match(heure_fin):
+            raise ValueError("heures au format HH:MM attendues")
+        if heure_debut >= heure_fin:
+            raise ValueError("heure_debut doit précéder heure_fin")
+        return {
+            "medecin_id": medecin_id,
+            "jour_semaine": _entier(valeurs, "jour_semaine", 0, 6),
+            "heure_debut": heure_debut,
+            "heure_fin": heure_fin,
+            "est_actif": True,
+        }
+
+    def conflits(self, connexion: Connection, lot: List[Tuple[int, dict]]) -> Dict[int, str]:
+        rejets = {}
+        vus = set()
+        for numero, ligne in lot:
+            cle = (ligne["medecin_id"], ligne["jour_semaine"])
+            if cle in self._existants or cle in vus:
+                rejets[numero] = "horaire déjà défini pour ce médecin et ce jour"
+            vus.add(cle)
+        return rejets
+
+    def inserer(self, connexion: Connection, lignes: List[dict]):
+        connexion.execute(insert(HoraireMedecin.__table__), lignes)
+
+    def apres_insertion(self, lignes: List[dict]):
+        self._existants.update((ligne["medecin_id"], ligne["jour_semaine"]) for ligne in lignes)
+
+
+def _conflits_utilisateurs(connexion: Connection, lot: List[Tuple[int, dict]],
+                           telephone_patient: bool) -> Dict[int, str]:
+    """Emails déjà utilisés; numéros déjà attribués à un patient (une requête par critère)"""
+    emails = {ligne["email"] for _, ligne in lot if ligne["email"]}
+    emails_connus = set(connexion.scalars(
+        select(Utilisateur.email).where(Utilisateur.email.in_(emails))
+    )) if emails else set()
+    numeros_connus = set()
+    if telephone_patient:
+        numeros = {ligne["telephone_normalise"] for _, ligne in lot if ligne["telephone_normalise"]}
+        if numeros:
+            numeros_connus = set(connexion.scalars(select(Utilisateur.telephone_normalise).where(
+                Utilisateur.role == RoleUtilisateur.PATIENT.value,
+                Utilisateur.telephone_normalise.in_(numeros)
+            )))
+
+    rejets = {}
+    for numero, ligne in lot:
+        if ligne["email"]:
+            if ligne["email"] in emails_connus:
+                rejets[numero] = "email déjà utilisé"
+                continue
+            emails_connus.add(ligne["email"])
+        if telephone_patient and ligne["telephone_normalise"]:
+            if ligne["telephone_normalise"] in numeros_connus:
+                rejets[numero] = "telephone déjà attribué à un patient"
+                continue
+            numeros_connus.add(ligne["telephone_normalise"])
+    return rejets
+
+
+TYPES = {
+    "patients": _ImportPatients,
+    "medecins": _ImportMedecins,
+    "horaires": _ImportHoraires,
+}
+
+
+# ==================== Import ====================
+
+def importer(moteur: Engine, type_import: str, flux: BinaryIO, format: str = "csv",
+             taille_lot: int = TAILLE_LOT) -> dict:
+    """
+    Importe le flux et retourne le rapport
+
+    Returns:
+        {"type", "lues", "inserees", "rejetees", "erreurs": [{"ligne", "erreur"}], "duree_s"}
+    """
+    if type_import not in TYPES:
+        raise ValueError(f"Type d'import inconnu : {type_import}")
+    if format not in FORMATS:
+        raise ValueError(f"Format inconnu : {format}")
+
+    debut = time.perf_counter()
+    traitement = TYPES[type_import]()
+    rapport = {"type": type_import, "lues": 0, "inserees": 0, "rejetees": 0, "erreurs": []}
+
+    def rejeter(numero: int, motif: str):
+        rapport["rejetees"] += 1
+        if len(rapport["erreurs"]) < ERREURS_MAX:
+            rapport["erreurs"].append({"ligne": numero, "erreur": motif})
+
+    def ecrire(lot: List[Tuple[int, dict]]):
+        rejets: Dict[int, str] = {}
+        valides: List[Tuple[int, dict]] = []
+        try:
+            with moteur.begin() as connexion:
+                rejets = traitement.conflits(connexion, lot)
+                valides = [(numero, ligne) for numero, ligne in lot if numero not in rejets]
+                if valides:
+                    traitement.inserer(connexion, [ligne for _, ligne in valides])
+            inseres = valides
+        except IntegrityError:
+            # Conflit apparu depuis la vérification (écriture concurrente) : le lot
+            # est annulé puis repris ligne à ligne
+            inseres = []
+            for numero, ligne in valides:
+                try:
+                    with moteur.begin() as connexion:
+                        traitement.inserer(connexion, [ligne])
+                    inseres.append((numero, ligne))
+                except IntegrityError:
+                    rejets[numero] = "conflit avec une donnée existante"
+        for numero, motif in sorted(rejets.items()):
+            rejeter(numero, motif)
+        traitement.apres_insertion([ligne for _, ligne in inseres])
+        rapport["inserees"] += len(inseres)
+
+    with moteur.connect() as connexion:
+        traitement.preparer(connexion)
+
+    lot: List[Tuple[int, dict]] = []
+    try:
+        for numero, valeurs, erreur in lire_lignes(flux, format):
+            rapport["lues"] += 1
+            if erreur is None:
+                try:
+                    lot.append((numero, traitement.valider(valeurs)))
+                except ValueError as e:
+                    erreur = str(e)
+            if erreur is not None:
+                rejeter(numero, erreur)
+            if len(lot) >= taille_lot:
+                ecrire(lot)
+                lot = []
+        if lot:
+            ecrire(lot)
+    finally:
+        # Insertions hors ORM : l'instantané des médecins est reconstruit au prochain accès
+        if type_import != "patients" and rapport["inserees"]:
+            annuaire.invalider()
+
+    rapport["erreurs"].sort(key=lambda erreur: erreur["ligne"])
+    rapport["duree_s"] = round(time.perf_counter() - debut, 3)
+    return rapport
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Import en masse (CSV ou NDJSON)")
+    parser.add_argument("type", choices=sorted(TYPES), help="Données importées")
+    parser.add_argument("fichier", help="Fichier CSV (avec en-tête) ou NDJSON")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="Format du fichier (déduit de l'extension par défaut)")
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT, help="Lignes par transaction")
+    arguments = parser.parse_args()
+
+    format_fichier = arguments.format or ("ndjson" if arguments.fichier.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(arguments.fichier, "rb") as fichier_import:
+        resultat = importer(engine, arguments.type, fichier_import, format_fichier, arguments.lot)
+    for erreur_ligne in resultat["erreurs"][:20]:
+        print(f"   ⚠️ ligne {erreur_ligne['ligne']} : {erreur_ligne['erreur']}")
+    print(f"✅ {resultat['inserees']} ligne(s) importée(s), {resultat['rejetees']} rejetée(s) "
+          f"sur {resultat['lues']} en {resultat['duree_s']} s")
@@ -4,12 +4,17 @@ Système de Gestion des Rendez-vous Médicaux avec Chatbot IA
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, Response
+import asyncio
+import csv
+import io
+import tempfile
+import fastapi.concurrency
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, aliased
+from typing import Callable, Dict, List, Optional
 import os
 
 # Charger les variables d'environnement
@@ -17,20 +22,42 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Imports locaux
-from database import obtenir_session, initialiser_base_de_donnees
-from models import Medecin, Utilisateur
+from database import (
+    obtenir_session, obtenir_session_lecture, initialiser_base_de_donnees,
+    SessionLocal, SessionLecture, engine, engine_lecture
+)
+from models import Medecin, Utilisateur, RoleUtilisateur, StatutRendezVous, PrevisionDemande
 from schemas import (
     MedecinReponse, RendezVousCreer,
     MessageChatRequete, MessageChatReponse,
     LoginRequete, UtilisateurAuthReponse,
     UtilisateurAdminReponse, RendezVousAdminReponse, RendezVousUpdateRequete,
     NotificationCreateRequete, NotificationReponse,
-    MLPlaceholderRequete, MLPlaceholderReponse
+    NotificationMasseRequete, TacheNotificationReponse,
+    MLPlaceholderRequete, MLPlaceholderReponse,
+    PrevisionDemandeReponse, RechercheReponse, ImportReponse, TableauDeBordReponse
 )
 from chatbot import ChatbotMedical
 from session_auth import verifier_mot_de_passe, creer_session_token
 from deps import get_current_user, require_roles
 from models import RendezVous, Notification
+import notifications_masse
+from recommandation import moteur as moteur_recommandation
+import risque_annulation
+import prevision_demande
+import ressources_statiques
+import reponses_rapides
+import annuaire
+import specialites
+import recherche
+import idempotence
+import admission
+import archivage
+import audit
+import import_masse
+import metriques
+import profilage
+import requetes_lentes
 from datetime import datetime
 
 # ==================== Création de l'application ====================
@@ -39,10 +66,27 @@ from datetime import datetime
 async def lifespan(app: FastAPI):
     """Initialise la base de données au démarrage"""
     initialiser_base_de_donnees()
+    if risque_annulation.charger_modele():
+        print("🧠 Modèle de risque d'annulation chargé")
+    db = SessionLocal()
+    try:
+        if db.query(PrevisionDemande.id).first() is None:
+            prevision_demande.rafraichir_previsions(db)
+    finally:
+        db.close()
+    tache_previsions = asyncio.create_task(prevision_demande.boucle_nocturne())
+    tache_archivage = asyncio.create_task(archivage.boucle_nocturne()) if archivage.ARCHIVAGE_JOURS > 0 else None
+    audit.journal.demarrer()
     print("🚀 Serveur démarré avec succès!")
     print("📖 Documentation: http://localhost:8000/docs")
     print("💬 Application: http://localhost:8000/app")
     yield
+    tache_previsions.cancel()
+    if tache_archivage is not None:
+        tache_archivage.cancel()
+    ecrits = audit.journal.arreter()
+    if ecrits:
+        print(f"🧾 {ecrits} événement(s) d'audit écrits à l'arrêt")
 
 
 app = FastAPI(
@@ -73,6 +117,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==================== Métriques ====================
+
+app.add_middleware(metriques.MiddlewareMetriques)
+for moteur in {engine, engine_lecture}:
+    metriques.instrumenter_moteur(moteur)
+    requetes_lentes.instrumenter_moteur(moteur)
+
+# Profilage à la demande (PROFILAGE_ACTIF=1), déclenché par un administrateur
+if profilage.ACTIF:
+    profilage.installer(app)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def exporter_metriques():
+    """Métriques au format texte Prometheus"""
+    return PlainTextResponse(metriques.exporter(), media_type="text/plain; version=0.0.4")
+
 
 # ==================== Routes API ====================
 
@@ -90,59 +151,57 @@ async def racine():
 
 # ==================== Routes Médecins ====================
 
-@app.get("/api/medecins", response_model=List[MedecinReponse], tags=["Médecins"])
-async def liste_medecins(
-        specialite: Optional[str] = None,
-        db: Session = Depends(obtenir_session)
-):
-    """
-    Récupère la liste des médecins disponibles
+# Les navigateurs revalident via If-None-Match; une copie périmée reste servie
+# pendant la revalidation en arrière-plan
+CACHE_CONTROL_MEDECINS = (
+    f"public, max-age={int(os.getenv('MEDECINS_MAX_AGE_S', '30'))}, "
+    f"stale-while-revalidate={int(os.getenv('MEDECINS_STALE_S', '300'))}"
+)
+_rendus_medecins = reponses_rapides.CacheRendus()
 
-    - **specialite**: Filtre optionnel par spécialité
-    """
-    requete = db.query(Medecin, Utilisateur).join(
-        Utilisateur,
-        Medecin.utilisateur_id == Utilisateur.id
+
+def _rendu_medecins(instantane: annuaire.Instantane, specialite: Optional[str] = None):
+    """(corps JSON, corps gzip) de la liste des médecins, conservés jusqu'au changement de l'annuaire"""
+    return _rendus_medecins.obtenir(
+        specialites.terme_recherche(specialite),
+        instantane.etiquette,
+        lambda: reponses_rapides.rendre_liste(
+            [fiche.en_dict() for fiche in instantane.rechercher(specialite)], MedecinReponse
+        )
     )
 
-    if specialite:
-        requete = requete.filter(Medecin.specialite.ilike(f"%{specialite}%"))
 
-    medecins = requete.filter(Medecin.est_disponible == True).all()
+@app.get("/api/medecins", response_model=List[MedecinReponse], tags=["Médecins"])
+async def liste_medecins(request: Request, specialite: Optional[str] = None):
+    """
+    Récupère la liste des médecins disponibles (annuaire en mémoire)
 
-    return [
-        MedecinReponse(
-            id=medecin.id,
-            nom=utilisateur.nom,
-            specialite=medecin.specialite,
-            description=medecin.description,
-            duree_consultation=medecin.duree_consultation
-        )
-        for medecin, utilisateur in medecins
-    ]
+    - **specialite**: Filtre optionnel par spécialité (préfixe, sans accents, synonymes : "cardio", "dentaire"...)
+    """
+    instantane = annuaire.obtenir()
+    if reponses_rapides.etag_correspond(request, instantane.etiquette):
+        return reponses_rapides.reponse_non_modifiee(instantane.etiquette, CACHE_CONTROL_MEDECINS)
+
+    corps, corps_gzip = _rendu_medecins(instantane, specialite)
+    return reponses_rapides.reponse_json(
+        request, corps, etag=instantane.etiquette, cache_control=CACHE_CONTROL_MEDECINS, corps_gzip=corps_gzip
+    )
 
 
 @app.get("/api/medecins/{medecin_id}", response_model=MedecinReponse, tags=["Médecins"])
-async def detail_medecin(
-        medecin_id: int,
-        db: Session = Depends(obtenir_session)
-):
+async def detail_medecin(request: Request, medecin_id: int):
     """Récupère les détails d'un médecin spécifique"""
-    resultat = db.query(Medecin, Utilisateur).join(
-        Utilisateur,
-        Medecin.utilisateur_id == Utilisateur.id
-    ).filter(Medecin.id == medecin_id).first()
-
-    if not resultat:
+    instantane = annuaire.obtenir()
+    fiche = instantane.medecin(medecin_id)
+    if fiche is None:
         raise HTTPException(status_code=404, detail="Médecin non trouvé")
-
-    medecin, utilisateur = resultat
-    return MedecinReponse(
-        id=medecin.id,
-        nom=utilisateur.nom,
-        specialite=medecin.specialite,
-        description=medecin.description,
-        duree_consultation=medecin.duree_consultation
+    if reponses_rapides.etag_correspond(request, instantane.etiquette):
+        return reponses_rapides.reponse_non_modifiee(instantane.etiquette, CACHE_CONTROL_MEDECINS)
+    return reponses_rapides.reponse_json(
+        request,
+        reponses_rapides.serialiser(MedecinReponse(**fiche.en_dict()).model_dump()),
+        etag=instantane.etiquette,
+        cache_control=CACHE_CONTROL_MEDECINS
     )
 
 
@@ -152,7 +211,7 @@ async def detail_medecin(
 async def disponibilites_medecin(
         medecin_id: int,
         date: str,
-        db: Session = Depends(obtenir_session)
+        db: Session = Depends(obtenir_session_lecture)
 ):
     """
     Récupère les créneaux disponibles pour un médecin
@@ -168,8 +227,10 @@ async def disponibilites_medecin(
 
 @app.post("/api/rendez-vous", tags=["Rendez-vous"])
 async def creer_rendez_vous(
+        request: Request,
         rdv: RendezVousCreer,
-        db: Session = Depends(obtenir_session)
+        db: Session = Depends(obtenir_session),
+        cle_idempotence: Optional[str] = Header(None, alias=idempotence.ENTETE)
 ):
     """
     Crée un nouveau rendez-vous
@@ -180,37 +241,57 @@ async def creer_rendez_vous(
     - **telephone_patient**: Numéro de téléphone
     - **date**: Date au format YYYY-MM-DD
     - **heure**: Heure au format HH:MM
+
+    En-tête optionnel **Idempotency-Key** : une nouvelle tentative avec la même clé
+    renvoie la réponse d'origine sans créer de second rendez-vous.
     """
-    chatbot = ChatbotMedical(db)
-    return chatbot.reserver_rendez_vous(
-        medecin_id=rdv.medecin_id,
-        nom_patient=rdv.nom_patient,
-        telephone_patient=rdv.telephone_patient,
-        date=rdv.date,
-        heure=rdv.heure,
-        motif=rdv.motif
+    def reserver() -> dict:
+        chatbot = ChatbotMedical(db, acteur=audit.acteur(request))
+        return chatbot.reserver_rendez_vous(
+            medecin_id=rdv.medecin_id,
+            nom_patient=rdv.nom_patient,
+            telephone_patient=rdv.telephone_patient,
+            date=rdv.date,
+            heure=rdv.heure,
+            motif=rdv.motif
+        )
+
+    cle = idempotence.valider_cle(cle_idempotence)
+    if cle is None:
+        return reserver()
+
+    corps, rejoue = await idempotence.magasin.executer(
+        cle,
+        idempotence.empreinte(b"POST /api/rendez-vous", reponses_rapides.serialiser(rdv.model_dump())),
+        lambda: reponses_rapides.serialiser(reserver())
     )
+    reponse = reponses_rapides.reponse_json(request, corps)
+    if rejoue:
+        reponse.headers[idempotence.ENTETE_REJOUE] = "true"
+    return reponse
 
 
 @app.get("/api/rendez-vous", tags=["Rendez-vous"])
 async def mes_rendez_vous(
+        request: Request,
         telephone: str,
-        db: Session = Depends(obtenir_session)
+        db: Session = Depends(obtenir_session_lecture)
 ):
     """
     Récupère les rendez-vous d'un patient par son numéro de téléphone
     """
-    chatbot = ChatbotMedical(db)
+    chatbot = ChatbotMedical(db, acteur=audit.acteur(request))
     return chatbot.consulter_mes_rendez_vous(telephone)
 
 
 @app.delete("/api/rendez-vous/{rdv_id}", tags=["Rendez-vous"])
 async def annuler_rdv(
+        request: Request,
         rdv_id: int,
         db: Session = Depends(obtenir_session)
 ):
     """Annule un rendez-vous existant"""
-    chatbot = ChatbotMedical(db)
+    chatbot = ChatbotMedical(db, acteur=audit.acteur(request))
     return chatbot.annuler_rendez_vous(rdv_id)
 
 
@@ -218,6 +299,7 @@ async def annuler_rdv(
 
 @app.post("/api/chat", response_model=MessageChatReponse, tags=["Chatbot"])
 async def converser(
+        request: Request,
         requete: MessageChatRequete,
         db: Session = Depends(obtenir_session)
 ):
@@ -226,13 +308,33 @@ async def converser(
 
     - **message**: Message de l'utilisateur
     - **historique_conversation**: Historique des messages précédents
-    """
-    chatbot = ChatbotMedical(db)
 
-    reponse, nouvel_historique = await chatbot.discuter(
-        requete.message,
-        requete.historique_conversation
-    )
+    Soumis au contrôle d'admission (voir admission.py) : 429 au-delà du débit
+    par client; en cas de saturation, réponse en mode simulation ou 503.
+    """
+    client = admission.identifier(request)
+    chatbot = ChatbotMedical(db, acteur=client.cle)
+
+    try:
+        admission.debit_chat.consommer(client.cle)
+        async with admission.concurrence_chat.place(client.prioritaire):
+            metriques.enregistrer_admission_chat("admis")
+            reponse, nouvel_historique = await chatbot.discuter(
+                requete.message,
+                requete.historique_conversation
+            )
+    except admission.Sature as refus:
+        if admission.DEGRADATION != "simulation":
+            metriques.enregistrer_admission_chat("sature")
+            raise HTTPException(status_code=refus.statut, detail=refus.detail, headers=refus.entetes())
+        metriques.enregistrer_admission_chat("degrade")
+        reponse, nouvel_historique = chatbot.discuter_en_simulation(
+            requete.message,
+            requete.historique_conversation
+        )
+    except admission.Refus as refus:
+        metriques.enregistrer_admission_chat("limite_debit")
+        raise HTTPException(status_code=refus.statut, detail=refus.detail, headers=refus.entetes())
 
     return MessageChatReponse(
         reponse=reponse,
@@ -246,106 +348,49 @@ async def converser(
 chemin_frontend = os.path.join(os.path.dirname(__file__), "..", "frontend")
 chemin_frontend = os.path.abspath(chemin_frontend)
 
+# Pages HTML servies sous un chemin explicite
+PAGES_FRONTEND = {
+    "/app": "index.html",
+    "/login.html": "login.html",
+    "/dashboard-admin.html": "dashboard-admin.html",
+    "/dashboard-secretaire.html": "dashboard-secretaire.html",
+    "/dashboard-medecin.html": "dashboard-medecin.html",
+    "/dashboard-patient.html": "dashboard-patient.html",
+}
+
+
+def _route_ressource(ressource: ressources_statiques.Ressource):
+    async def servir_ressource(request: Request):
+        return ressources_statiques.servir(ressource, request)
+    return servir_ressource
+
+
 # Vérifier si le dossier frontend existe
 if os.path.exists(chemin_frontend):
-    @app.get("/app", response_class=HTMLResponse, tags=["Application"])
-    async def application_web():
-        """Sert l'application web frontend"""
-        fichier_index = os.path.join(chemin_frontend, "index.html")
-        if os.path.exists(fichier_index):
-            return FileResponse(fichier_index)
-        raise HTTPException(status_code=404, detail="Frontend non trouvé")
-
-    @app.get("/login.html", response_class=HTMLResponse, tags=["Application"])
-    async def login_page():
-        """Sert la page de connexion"""
-        fichier = os.path.join(chemin_frontend, "login.html")
-        if os.path.exists(fichier):
-            return FileResponse(fichier)
-        raise HTTPException(status_code=404, detail="Page non trouvée")
-
-    @app.get("/dashboard-admin.html", response_class=HTMLResponse, tags=["Application"])
-    async def dashboard_admin():
-        """Sert le dashboard admin"""
-        fichier = os.path.join(chemin_frontend, "dashboard-admin.html")
-        if os.path.exists(fichier):
-            return FileResponse(fichier)
-        raise HTTPException(status_code=404, detail="Page non trouvée")
-
-    @app.get("/dashboard-secretaire.html", response_class=HTMLResponse, tags=["Application"])
-    async def dashboard_secretaire():
-        """Sert le dashboard secrétaire"""
-        fichier = os.path.join(chemin_frontend, "dashboard-secretaire.html")
-        if os.path.exists(fichier):
-            return FileResponse(fichier)
-        raise HTTPException(status_code=404, detail="Page non trouvée")
-
-    @app.get("/dashboard-medecin.html", response_class=HTMLResponse, tags=["Application"])
-    async def dashboard_medecin():
-        """Sert le dashboard médecin"""
-        fichier = os.path.join(chemin_frontend, "dashboard-medecin.html")
-        if os.path.exists(fichier):
-            return FileResponse(fichier)
-        raise HTTPException(status_code=404, detail="Page non trouvée")
-
-    @app.get("/dashboard-patient.html", response_class=HTMLResponse, tags=["Application"])
-    async def dashboard_patient():
-        """Sert le dashboard patient"""
-        fichier = os.path.join(chemin_frontend, "dashboard-patient.html")
-        if os.path.exists(fichier):
-            return FileResponse(fichier)
-        raise HTTPException(status_code=404, detail="Page non trouvée")
-
-    @app.get("/style.css", tags=["Application"])
-    async def get_css():
-        """Sert le fichier CSS"""
-        fichier_css = os.path.join(chemin_frontend, "style.css")
-        if os.path.exists(fichier_css):
-            return FileResponse(fichier_css, media_type="text/css")
-        raise HTTPException(status_code=404, detail="CSS non trouvé")
-
-    @app.get("/dashboard.css", tags=["Application"])
-    async def get_dashboard_css():
-        """Sert le fichier CSS du dashboard"""
-        fichier_css = os.path.join(chemin_frontend, "dashboard.css")
-        if os.path.exists(fichier_css):
-            return FileResponse(fichier_css, media_type="text/css")
-        raise HTTPException(status_code=404, detail="CSS non trouvé")
-
-    @app.get("/app.js", tags=["Application"])
-    async def get_js():
-        """Sert le fichier JavaScript"""
-        fichier_js = os.path.join(chemin_frontend, "app.js")
-        if os.path.exists(fichier_js):
-            return FileResponse(fichier_js, media_type="application/javascript")
-        raise HTTPException(status_code=404, detail="JS non trouvé")
-
-    @app.get("/dashboard.js", tags=["Application"])
-    async def get_dashboard_js():
-        """Sert le fichier JavaScript du dashboard"""
-        fichier_js = os.path.join(chemin_frontend, "dashboard.js")
-        if os.path.exists(fichier_js):
-            return FileResponse(fichier_js, media_type="application/javascript")
-        raise HTTPException(status_code=404, detail="JS non trouvé")
-
-    @app.get("/auth.js", tags=["Application"])
-    async def get_auth_js():
-        """Sert le fichier JavaScript d'authentification"""
-        fichier_js = os.path.join(chemin_frontend, "auth.js")
-        if os.path.exists(fichier_js):
-            return FileResponse(fichier_js, media_type="application/javascript")
-        raise HTTPException(status_code=404, detail="JS non trouvé")
-
-    @app.get("/auth.css", tags=["Application"])
-    async def get_auth_css():
-        """Sert la feuille de style d'authentification"""
-        fichier_css = os.path.join(chemin_frontend, "auth.css")
-        if os.path.exists(fichier_css):
-            return FileResponse(fichier_css, media_type="text/css")
-        raise HTTPException(status_code=404, detail="CSS non trouvé")
-
-    # Servir les fichiers statiques
-    app.mount("/static", StaticFiles(directory=chemin_frontend), name="static")
+    # Ressources chargées en mémoire une seule fois : noms empreintés, gzip/brotli, ETag
+    ressources_frontend = ressources_statiques.construire_ressources(chemin_frontend)
+
+    for chemin_page, nom_page in PAGES_FRONTEND.items():
+        if nom_page in ressources_frontend:
+            app.add_api_route(
+                chemin_page,
+                _route_ressource(ressources_frontend[nom_page]),
+                methods=["GET"],
+                response_class=HTMLResponse,
+                tags=["Application"]
+            )
+
+    for nom_ressource, ressource in ressources_frontend.items():
+        if nom_ressource.endswith(".html"):
+            continue
+        # Servies à la racine (références des pages) et sous /static (compatibilité)
+        for chemin_ressource in (f"/{nom_ressource}", f"/static/{nom_ressource}"):
+            app.add_api_route(
+                chemin_ressource,
+                _route_ressource(ressource),
+                methods=["GET"],
+                include_in_schema=False
+            )
 
 
 # ==================== Auth ====================
@@ -395,97 +440,316 @@ async def me(utilisateur: Utilisateur = Depends(get_current_user)):
         est_actif=utilisateur.est_actif
     )
 
+# ==================== Tableau de bord ====================
+
+def _rendu_avec_session(construire: Callable[[Session], bytes]) -> bytes:
+    """Exécute une partie du tableau de bord avec sa propre session de lecture"""
+    db = SessionLecture()
+    try:
+        return construire(db)
+    finally:
+        db.close()
+
+
+@app.get("/api/dashboard/bootstrap", response_model=TableauDeBordReponse, tags=["Tableau de bord"])
+async def dashboard_bootstrap(
+    request: Request,
+    utilisateur: Utilisateur = Depends(get_current_user)
+):
+    """
+    Toutes les données d'ouverture du tableau de bord du rôle, en un seul appel
+
+    - admin : utilisateurs, rendez-vous, prévisions à 7 jours, médecins
+    - secrétaire : rendez-vous, médecins
+    - médecin : ses rendez-vous, médecins
+    - patient : médecins
+
+    La session est authentifiée une fois; les listes sont lues en parallèle,
+    chacune dans le pool de threads avec sa propre session.
+    """
+    acteur = audit.acteur(request, utilisateur)
+    parties: Dict[str, Callable[[Session], bytes]] = {}
+
+    if utilisateur.role == RoleUtilisateur.ADMIN.value:
+        def utilisateurs(db: Session) -> bytes:
+            lignes = _utilisateurs_admin(db)
+            audit.journal.enregistrer("lister_utilisateurs", acteur, nombre=len(lignes))
+            return reponses_rapides.rendre_liste(lignes, UtilisateurAdminReponse)
+
+        def previsions(db: Session) -> bytes:
+            return reponses_rapides.serialiser([
+                PrevisionDemandeReponse.model_validate(prevision).model_dump()
+                for prevision in prevision_demande.lire_previsions(db, jours=7)
+            ])
+
+        parties["utilisateurs"] = utilisateurs
+        parties["previsions"] = previsions
+
+    if utilisateur.role in (RoleUtilisateur.ADMIN.value, RoleUtilisateur.SECRETAIRE.value):
+        def rendez_vous(db: Session) -> bytes:
+            lignes = _rendez_vous_admin(db)
+            audit.journal.enregistrer("lister_rendez_vous", acteur, nombre=len(lignes))
+            return reponses_rapides.rendre_liste(lignes, RendezVousAdminReponse)
+
+        parties["rendez_vous"] = rendez_vous
+    elif utilisateur.role == RoleUtilisateur.MEDECIN.value:
+        def rendez_vous(db: Session) -> bytes:
+            medecin_id, lignes = _rendez_vous_medecin(db, utilisateur.id)
+            if medecin_id is not None:
+                audit.journal.enregistrer("lister_rendez_vous", acteur, "medecin", medecin_id, nombre=len(lignes))
+            return reponses_rapides.rendre_liste(lignes, RendezVousAdminReponse)
+
+        parties["rendez_vous"] = rendez_vous
+
+    corps = await asyncio.gather(*(
+        fastapi.concurrency.run_in_threadpool(_rendu_avec_session, construire)
+        for construire in parties.values()
+    ))
+    profil = UtilisateurAuthReponse(
+        id=utilisateur.id,
+        nom=utilisateur.nom,
+        email=utilisateur.email,
+        role=utilisateur.role,
+        est_actif=utilisateur.est_actif
+    )
+    medecins, _ = _rendu_medecins(annuaire.obtenir())
+    return reponses_rapides.reponse_json(request, reponses_rapides.assembler({
+        "utilisateur": reponses_rapides.serialiser(profil.model_dump()),
+        "medecins": medecins,
+        **dict(zip(parties, corps)),
+    }))
+
+
 # ==================== Admin / Personnel ====================
 
+def _utilisateurs_admin(db: Session) -> list:
+    return db.execute(select(
+        Utilisateur.id,
+        Utilisateur.nom,
+        Utilisateur.email,
+        Utilisateur.telephone,
+        Utilisateur.role,
+        Utilisateur.est_actif,
+        Utilisateur.date_creation
+    ).order_by(Utilisateur.id.asc())).mappings().all()
+
+
 @app.get("/api/admin/users", response_model=List[UtilisateurAdminReponse], tags=["Admin"])
 async def lister_utilisateurs(
-    db: Session = Depends(obtenir_session),
-    _: Utilisateur = Depends(require_roles("admin"))
+    request: Request,
+    db: Session = Depends(obtenir_session_lecture),
+    utilisateur: Utilisateur = Depends(require_roles("admin"))
 ):
-    utilisateurs = db.query(Utilisateur).order_by(Utilisateur.id.asc()).all()
-    return [
-        UtilisateurAdminReponse(
-            id=u.id,
-            nom=u.nom,
-            email=u.email,
-            telephone=u.telephone,
-            role=u.role,
-            est_actif=u.est_actif,
-            date_creation=u.date_creation
-        )
-        for u in utilisateurs
+    lignes = _utilisateurs_admin(db)
+    audit.journal.enregistrer("lister_utilisateurs", audit.acteur(request, utilisateur), nombre=len(lignes))
+    return reponses_rapides.reponse_liste(request, lignes, UtilisateurAdminReponse)
+
+
+def _requete_rendez_vous_admin(externe: bool = False, rdv=RendezVous):
+    """
+    Rendez-vous avec noms du patient et du médecin, en une seule requête
+
+    Args:
+        externe: Conserve les rendez-vous dont le patient ou le médecin n'existe plus
+        rdv: Entité interrogée (`archivage.historique_complet()` pour inclure l'archive)
+    """
+    patient = aliased(Utilisateur)
+    utilisateur_medecin = aliased(Utilisateur)
+    return select(
+        rdv.id,
+        rdv.patient_id,
+        patient.nom.label("patient_nom"),
+        patient.telephone.label("patient_telephone"),
+        func.coalesce(Medecin.id, 0).label("medecin_id"),
+        func.coalesce(utilisateur_medecin.nom, "Inconnu").label("medecin_nom"),
+        rdv.date_heure,
+        rdv.statut,
+        rdv.motif,
+        rdv.notes
+    ).join(
+        patient, rdv.patient_id == patient.id, isouter=externe
+    ).join(
+        Medecin, rdv.medecin_id == Medecin.id, isouter=externe
+    ).outerjoin(
+        utilisateur_medecin, Medecin.utilisateur_id == utilisateur_medecin.id
+    )
+
+
+def _rendez_vous_admin(db: Session) -> List[dict]:
+    """Tous les rendez-vous de la table vivante, avec leur risque d'annulation si le modèle est chargé"""
+    requete = _requete_rendez_vous_admin().add_columns(RendezVous.date_creation)
+    resultats = [
+        dict(ligne)
+        for ligne in db.execute(requete.order_by(RendezVous.date_heure.asc())).mappings()
     ]
 
+    if risque_annulation.modele_disponible() and resultats:
+        # Les annulations antérieures comptent aussi celles de l'archive
+        historique = archivage.historique_complet()
+        annulations = dict(db.query(historique.patient_id, func.count(historique.id)).filter(
+            historique.statut == StatutRendezVous.ANNULE.value
+        ).group_by(historique.patient_id).all())
+        risques = risque_annulation.scorer([
+            {
+                "date_heure": ligne["date_heure"],
+                "date_creation": ligne["date_creation"],
+                "medecin_id": ligne["medecin_id"],
+                "annulations_anterieures": annulations.get(ligne["patient_id"], 0)
+                - (ligne["statut"] == StatutRendezVous.ANNULE.value)
+            }
+            for ligne in resultats
+        ])
+        for ligne, risque in zip(resultats, risques):
+            ligne["risque_annulation"] = round(float(risque), 4)
+
+    for ligne in resultats:
+        del ligne["date_creation"]
+    return resultats
+
 
 @app.get("/api/admin/rendez-vous", response_model=List[RendezVousAdminReponse], tags=["Admin"])
 async def lister_rendez_vous_admin(
-    db: Session = Depends(obtenir_session),
-    _: Utilisateur = Depends(require_roles("admin", "secretaire"))
+    request: Request,
+    db: Session = Depends(obtenir_session_lecture),
+    utilisateur: Utilisateur = Depends(require_roles("admin", "secretaire"))
 ):
-    rendez_vous = db.query(RendezVous, Utilisateur, Medecin).join(
-        Utilisateur, RendezVous.patient_id == Utilisateur.id
-    ).join(
-        Medecin, RendezVous.medecin_id == Medecin.id
-    ).order_by(RendezVous.date_heure.asc()).all()
-
-    resultats = []
-    for rdv, patient, medecin in rendez_vous:
-        medecin_user = db.query(Utilisateur).filter(Utilisateur.id == medecin.utilisateur_id).first()
-        resultats.append(RendezVousAdminReponse(
-            id=rdv.id,
-            patient_id=patient.id,
-            patient_nom=patient.nom,
-            patient_telephone=patient.telephone,
-            medecin_id=medecin.id,
-            medecin_nom=medecin_user.nom if medecin_user else "Inconnu",
-            date_heure=rdv.date_heure,
-            statut=rdv.statut,
-            motif=rdv.motif,
-            notes=rdv.notes
-        ))
+    resultats = _rendez_vous_admin(db)
+    audit.journal.enregistrer("lister_rendez_vous", audit.acteur(request, utilisateur), nombre=len(resultats))
+    return reponses_rapides.reponse_liste(request, resultats, RendezVousAdminReponse)
+
+
+@app.get("/api/admin/recherche", response_model=RechercheReponse, tags=["Admin"])
+async def rechercher_admin(
+    request: Request,
+    q: str,
+    type: str = "patients",
+    page: int = 1,
+    taille: int = 20,
+    db: Session = Depends(obtenir_session_lecture),
+    utilisateur: Utilisateur = Depends(require_roles("admin", "secretaire"))
+):
+    """
+    Recherche plein texte, classée par pertinence et paginée
 
-    return resultats
+    - **q**: Mots recherchés (préfixes, sans accents)
+    - **type**: "patients" (nom, email, téléphone) ou "rendez_vous" (motif, notes)
+    """
+    if type not in ("patients", "rendez_vous"):
+        raise HTTPException(status_code=400, detail="Type de recherche invalide")
+    page = max(1, page)
+    taille = max(1, min(taille, 100))
+    decalage = (page - 1) * taille
+
+    if type == "patients":
+        ids = recherche.ids_patients(db, q, decalage, taille + 1)
+        requete = select(
+            Utilisateur.id,
+            Utilisateur.nom,
+            Utilisateur.email,
+            Utilisateur.telephone,
+            Utilisateur.role,
+            Utilisateur.est_actif,
+            Utilisateur.date_creation
+        ).where(Utilisateur.id.in_(ids[:taille]))
+    else:
+        ids = recherche.ids_rendez_vous(db, q, decalage, taille + 1)
+        requete = _requete_rendez_vous_admin(externe=True).where(RendezVous.id.in_(ids[:taille]))
+
+    lignes = db.execute(requete).mappings().all() if ids else []
+    audit.journal.enregistrer(
+        "rechercher", audit.acteur(request, utilisateur), type=type, q=q, page=page, nombre=len(lignes)
+    )
+    return {
+        "type": type,
+        "page": page,
+        "taille": taille,
+        "suivant": len(ids) > taille,
+        "resultats": recherche.ordonner(lignes, ids[:taille]),
+    }
+
+
+def _rendez_vous_medecin(db: Session, utilisateur_id: int):
+    """(id du médecin, ses rendez-vous), ou (None, []) si le compte n'est lié à aucun médecin"""
+    medecin_id = db.scalar(select(Medecin.id).where(Medecin.utilisateur_id == utilisateur_id))
+    if medecin_id is None:
+        return None, []
+    lignes = db.execute(_requete_rendez_vous_admin().where(
+        RendezVous.medecin_id == medecin_id
+    ).order_by(RendezVous.date_heure.asc())).mappings().all()
+    return medecin_id, lignes
 
 
 @app.get("/api/medecin/rendez-vous", response_model=List[RendezVousAdminReponse], tags=["Médecin"])
 async def lister_rendez_vous_medecin(
-    db: Session = Depends(obtenir_session),
+    request: Request,
+    db: Session = Depends(obtenir_session_lecture),
     utilisateur: Utilisateur = Depends(require_roles("medecin"))
 ):
-    medecin = db.query(Medecin).filter(Medecin.utilisateur_id == utilisateur.id).first()
-    if not medecin:
+    medecin_id, lignes = _rendez_vous_medecin(db, utilisateur.id)
+    if medecin_id is None:
         raise HTTPException(status_code=404, detail="Médecin non trouvé")
+    audit.journal.enregistrer(
+        "lister_rendez_vous", audit.acteur(request, utilisateur), "medecin", medecin_id, nombre=len(lignes)
+    )
+    return reponses_rapides.reponse_liste(request, lignes, RendezVousAdminReponse)
 
-    rendez_vous = db.query(RendezVous, Utilisateur).join(
-        Utilisateur, RendezVous.patient_id == Utilisateur.id
-    ).filter(
-        RendezVous.medecin_id == medecin.id
-    ).order_by(RendezVous.date_heure.asc()).all()
-
-    resultats = []
-    for rdv, patient in rendez_vous:
-        resultats.append(RendezVousAdminReponse(
-            id=rdv.id,
-            patient_id=patient.id,
-            patient_nom=patient.nom,
-            patient_telephone=patient.telephone,
-            medecin_id=medecin.id,
-            medecin_nom=utilisateur.nom,
-            date_heure=rdv.date_heure,
-            statut=rdv.statut,
-            motif=rdv.motif,
-            notes=rdv.notes
-        ))
 
-    return resultats
+# Lignes lues par lot depuis le curseur côté serveur pendant l'export
+TAILLE_LOT_EXPORT = 2000
+COLONNES_EXPORT = (
+    "id", "patient_id", "patient_nom", "patient_telephone", "medecin_id",
+    "medecin_nom", "date_heure", "statut", "motif", "notes"
+)
+
+
+def _export_rendez_vous_csv():
+    """
+    Produit le CSV par lots : curseur côté serveur sur PostgreSQL (stream_results),
+    lecture incrémentale sur SQLite. La session est propre au générateur car
+    celle des dépendances est fermée avant l'envoi du corps.
+    """
+    db = SessionLecture()
+    try:
+        tampon = io.StringIO()
+        ecrivain = csv.writer(tampon)
+        ecrivain.writerow(COLONNES_EXPORT)
+        historique = archivage.historique_complet()
+        resultat = db.execute(
+            _requete_rendez_vous_admin(externe=True, rdv=historique)
+            .order_by(historique.id.asc())
+            .execution_options(stream_results=True, yield_per=TAILLE_LOT_EXPORT)
+        )
+        for lot in resultat.partitions():
+            ecrivain.writerows(lot)
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+        yield tampon.getvalue()
+    finally:
+        db.close()
+
+
+@app.get("/api/admin/rendez-vous/export", tags=["Admin"])
+async def exporter_rendez_vous(
+    request: Request,
+    utilisateur: Utilisateur = Depends(require_roles("admin", "secretaire"))
+):
+    """Export CSV de tous les rendez-vous (archive comprise), diffusé sans tout charger en mémoire"""
+    audit.journal.enregistrer("exporter_rendez_vous", audit.acteur(request, utilisateur))
+    return StreamingResponse(
+        _export_rendez_vous_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="rendez-vous.csv"'}
+    )
 
 
 @app.patch("/api/admin/rendez-vous/{rdv_id}", response_model=RendezVousAdminReponse, tags=["Admin"])
 async def modifier_rendez_vous(
+    request: Request,
     rdv_id: int,
     requete: RendezVousUpdateRequete,
     db: Session = Depends(obtenir_session),
-    _: Utilisateur = Depends(require_roles("admin", "secretaire"))
+    utilisateur: Utilisateur = Depends(require_roles("admin", "secretaire"))
 ):
     rdv = db.query(RendezVous).filter(RendezVous.id == rdv_id).first()
     if not rdv:
@@ -506,23 +770,22 @@ async def modifier_rendez_vous(
         rdv.notes = requete.notes
 
     db.commit()
-    db.refresh(rdv)
+    audit.journal.enregistrer(
+        "modifier_rendez_vous", audit.acteur(request, utilisateur), "rendez_vous", rdv_id,
+        **requete.model_dump(exclude_none=True)
+    )
 
-    patient = db.query(Utilisateur).filter(Utilisateur.id == rdv.patient_id).first()
-    medecin = db.query(Medecin).filter(Medecin.id == rdv.medecin_id).first()
-    medecin_user = db.query(Utilisateur).filter(Utilisateur.id == medecin.utilisateur_id).first() if medecin else None
+    # Relecture en une seule requête (patient et médecin éventuellement absents)
+    ligne = db.execute(_requete_rendez_vous_admin(externe=True).where(
+        RendezVous.id == rdv_id
+    )).mappings().one()
 
     return RendezVousAdminReponse(
-        id=rdv.id,
-        patient_id=patient.id if patient else 0,
-        patient_nom=patient.nom if patient else "Inconnu",
-        patient_telephone=patient.telephone if patient else None,
-        medecin_id=medecin.id if medecin else 0,
-        medecin_nom=medecin_user.nom if medecin_user else "Inconnu",
-        date_heure=rdv.date_heure,
-        statut=rdv.statut,
-        motif=rdv.motif,
-        notes=rdv.notes
+        **{
+            **ligne,
+            "patient_id": ligne["patient_id"] if ligne["patient_nom"] is not None else 0,
+            "patient_nom": ligne["patient_nom"] or "Inconnu",
+        }
     )
 
 
@@ -555,20 +818,151 @@ async def creer_notification(
     )
 
 
+@app.post(
+    "/api/admin/notifications/masse",
+    response_model=TacheNotificationReponse,
+    status_code=202,
+    tags=["Admin"]
+)
+async def creer_notifications_masse(
+    requete: NotificationMasseRequete,
+    background_tasks: BackgroundTasks,
+    _: Utilisateur = Depends(require_roles("admin", "secretaire"))
+):
+    """
+    Diffuse une notification à tous les utilisateurs correspondant au filtre
+
+    - **role**: Rôle ciblé (patient, medecin, ...)
+    - **medecin_id**: Patients ayant un rendez-vous avec ce médecin
+    - **date_debut** / **date_fin**: Patients ayant un rendez-vous dans cette période (YYYY-MM-DD)
+
+    L'insertion s'exécute en arrière-plan; la progression se consulte avec
+    `GET /api/admin/notifications/masse/{tache_id}`.
+    """
+    try:
+        conditions = notifications_masse.construire_filtre(
+            role=requete.role,
+            medecin_id=requete.medecin_id,
+            date_debut=requete.date_debut,
+            date_fin=requete.date_fin
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format de date invalide")
+
+    tache = notifications_masse.creer_tache()
+    background_tasks.add_task(
+        notifications_masse.executer_tache,
+        tache["tache_id"],
+        conditions,
+        requete.sujet,
+        requete.message,
+        requete.canal or "placeholder"
+    )
+    return TacheNotificationReponse(**tache)
+
+
+@app.get(
+    "/api/admin/notifications/masse/{tache_id}",
+    response_model=TacheNotificationReponse,
+    tags=["Admin"]
+)
+async def progression_notifications_masse(
+    tache_id: str,
+    _: Utilisateur = Depends(require_roles("admin", "secretaire"))
+):
+    tache = notifications_masse.obtenir_tache(tache_id)
+    if not tache:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    return TacheNotificationReponse(**tache)
+
+
+# Au-delà, le fichier importé est reçu sur disque plutôt qu'en mémoire
+TAMPON_IMPORT_OCTETS = 8 * 1024 * 1024
+
+
+@app.post("/api/admin/import/{type_import}", response_model=ImportReponse, tags=["Admin"])
+async def importer_masse(
+    request: Request,
+    type_import: str,
+    format: Optional[str] = None,
+    utilisateur: Utilisateur = Depends(require_roles("admin"))
+):
+    """
+    Import en masse de patients, médecins ou horaires (voir import_masse.py)
+
+    - **type_import**: "patients", "medecins" ou "horaires"
+    - **format**: "csv" (avec en-tête) ou "ndjson"; déduit du Content-Type par défaut
+
+    Le corps de la requête est le fichier lui-même. Il est reçu en flux dans un
+    fichier temporaire, puis importé par lots; les lignes rejetées sont listées
+    avec leur numéro et leur motif.
+    """
+    if type_import not in import_masse.TYPES:
+        raise HTTPException(status_code=404, detail="Type d'import inconnu")
+    format = format or import_masse.format_depuis_type_contenu(request.headers.get("content-type"))
+    if format not in import_masse.FORMATS:
+        raise HTTPException(status_code=400, detail="Format d'import invalide")
+
+    with tempfile.SpooledTemporaryFile(max_size=TAMPON_IMPORT_OCTETS) as fichier:
+        async for morceau in request.stream():
+            fichier.write(morceau)
+        fichier.seek(0)
+        rapport = await fastapi.concurrency.run_in_threadpool(
+            import_masse.importer, engine, type_import, fichier, format
+        )
+    audit.journal.enregistrer(
+        f"importer_{type_import}", audit.acteur(request, utilisateur),
+        inserees=rapport["inserees"], rejetees=rapport["rejetees"]
+    )
+    return rapport
+
+
 @app.post("/api/admin/ml/placeholder", response_model=MLPlaceholderReponse, tags=["Admin"])
 async def ml_placeholder(
     requete: MLPlaceholderRequete,
+    db: Session = Depends(obtenir_session),
     _: Utilisateur = Depends(require_roles("admin", "secretaire"))
 ):
-    suggestions = []
-    if requete.specialite:
-        suggestions.append({"specialite": requete.specialite, "score": 0.5})
+    """
+    Suggère les meilleures combinaisons médecin + créneau
+
+    - **specialite**: Filtre optionnel par spécialité
+    - **date**: Date préférée au format YYYY-MM-DD (demain par défaut)
+    - **patient_id**: Patient pour personnaliser le classement (médecins déjà consultés, heures habituelles)
+    """
+    try:
+        suggestions = moteur_recommandation.recommander(
+            db,
+            specialite=requete.specialite,
+            date=requete.date,
+            patient_id=requete.patient_id,
+            jours=requete.jours,
+            limite=requete.limite
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format de date invalide")
+
     return MLPlaceholderReponse(
         succes=True,
         suggestions=suggestions,
-        message="Placeholder ML: suggestions basées sur les entrées disponibles."
+        message=f"{len(suggestions)} créneau(x) suggéré(s)." if suggestions else "Aucun créneau disponible."
     )
 
+@app.get("/api/admin/previsions", response_model=List[PrevisionDemandeReponse], tags=["Admin"])
+async def lister_previsions(
+    specialite: Optional[str] = None,
+    jours: int = 7,
+    db: Session = Depends(obtenir_session_lecture),
+    _: Utilisateur = Depends(require_roles("admin", "secretaire"))
+):
+    """
+    Réservations attendues par spécialité, jour et heure (recalculées chaque nuit)
+
+    - **specialite**: Filtre optionnel par spécialité exacte
+    - **jours**: Nombre de jours à venir (7 par défaut)
+    """
+    return prevision_demande.lire_previsions(db, specialite=specialite, jours=jours)
+
 # ==================== Point d'entrée ====================
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+"""
+Métriques de performance exportées au format texte Prometheus
+- latence par route (middleware ASGI)
+- nombre de requêtes SQL et temps passé en base par requête HTTP (événements SQLAlchemy)
+- latence et jetons des appels au LLM du chatbot
+Les histogrammes ont des bornes fixes et des compteurs préalloués.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bornes des histogrammes (secondes pour les durées, nombre pour les requêtes SQL)
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_DUREE_LLM = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+BORNES_NOMBRE_SQL = (1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class Histogramme:
+    """Histogramme cumulatif à bornes fixes"""
+
+    __slots__ = ("bornes", "compteurs", "somme", "nombre")
+
+    def __init__(self, bornes: tuple):
+        self.bornes = bornes
+        self.compteurs = [0] * (len(bornes) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur: float):
+        self.compteurs[bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+    def exporter(self, nom: str, etiquettes: str) -> list:
+        lignes = []
+        cumul = 0
+        prefixe = etiquettes + "," if etiquettes else ""
+        suffixe = "{" + etiquettes + "}" if etiquettes else ""
+        for borne, compteur in zip(self.bornes, self.compteurs):
+            cumul += compteur
+            lignes.append(f'{nom}_bucket{{{prefixe}le="{borne}"}} {cumul}')
+        lignes.append(f'{nom}_bucket{{{prefixe}le="+Inf"}} {self.nombre}')
+        lignes.append(f"{nom}_sum{suffixe} {self.somme:.6f}")
+        lignes.append(f"{nom}_count{suffixe} {self.nombre}")
+        return lignes
+
+
+class MetriquesRoute:
+    """Histogrammes d'une route (méthode + chemin déclaré)"""
+
+    __slots__ = ("duree", "duree_sql", "nombre_sql", "statuts")
+
+    def __init__(self):
+        self.duree = Histogramme(BORNES_DUREE)
+        self.duree_sql = Histogramme(BORNES_DUREE)
+        self.nombre_sql = Histogramme(BORNES_NOMBRE_SQL)
+        self.statuts = {}
+
+
+class ContexteRequete:
+    """Compteurs SQL de la requête HTTP en cours"""
+
+    __slots__ = ("nombre_sql", "duree_sql", "scope")
+
+    def __init__(self, scope: dict):
+        self.nombre_sql = 0
+        self.duree_sql = 0.0
+        self.scope = scope
+
+
+_contexte: ContextVar[Optional[ContexteRequete]] = ContextVar("contexte_requete", default=None)
+_verrou = threading.Lock()
+_routes: dict = {}
+_llm = {
+    "duree": Histogramme(BORNES_DUREE_LLM),
+    "jetons_prompt": 0,
+    "jetons_reponse": 0,
+    "erreurs": 0,
+}
+_sql_hors_requete = {"nombre": 0, "duree": 0.0}
+_admissions_chat: dict = {}
+_audit: dict = {}
+_chemins: dict = {}
+
+
+def contexte_courant() -> Optional[ContexteRequete]:
+    """Contexte de la requête HTTP en cours (None hors requête)"""
+    return _contexte.get()
+
+
+def chemin_route(scope: dict) -> str:
+    """Chemin déclaré de la route ayant traité la requête (ex: /api/medecins/{medecin_id})"""
+    global _chemins
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "non_trouvee"
+    if endpoint not in _chemins:
+        _chemins = {
+            getattr(route, "endpoint", None): route.path
+            for route in scope["app"].routes
+            if hasattr(route, "path")
+        }
+    return _chemins.get(endpoint, "inconnue")
+
+
+def route_courante() -> Optional[str]:
+    """Méthode et route de la requête HTTP en cours (None hors requête)"""
+    contexte = _contexte.get()
+    if contexte is None:
+        return None
+    return f"{contexte.scope['method']} {chemin_route(contexte.scope)}"
+
+
+# ==================== SQLAlchemy ====================
+
+def instrumenter_moteur(moteur: Engine):
+    """Compte les requêtes SQL et leur durée pour chaque requête HTTP"""
+
+    @event.listens_for(moteur, "before_cursor_execute")
+    def _avant(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("debuts_requete", []).append(time.perf_counter())
+
+    @event.listens_for(moteur, "after_cursor_execute")
+    def _apres(conn, cursor, statement, parameters, context, executemany):
+        duree = time.perf_counter() - conn.info["debuts_requete"].pop()
+        contexte = _contexte.get()
+        if contexte is not None:
+            contexte.nombre_sql += 1
+            contexte.duree_sql += duree
+        else:
+            with _verrou:
+                _sql_hors_requete["nombre"] += 1
+                _sql_hors_requete["duree"] += duree
+
+
+# ==================== LLM ====================
+
+def enregistrer_appel_llm(duree: float, jetons_prompt: int = 0, jetons_reponse: int = 0, erreur: bool = False):
+    """Enregistre la latence et la consommation de jetons d'un appel au LLM"""
+    with _verrou:
+        _llm["duree"].observer(duree)
+        _llm["jetons_prompt"] += jetons_prompt
+        _llm["jetons_reponse"] += jetons_reponse
+        if erreur:
+            _llm["erreurs"] += 1
+
+
+def enregistrer_admission_chat(issue: str):
+    """Compte l'issue du contrôle d'admission du chatbot (admis, limite_debit, degrade, sature)"""
+    with _verrou:
+        _admissions_chat[issue] = _admissions_chat.get(issue, 0) + 1
+
+
+def enregistrer_audit(issue: str, nombre: int):
+    """Compte les événements du journal d'audit (ecrit, perdu, echec)"""
+    with _verrou:
+        _audit[issue] = _audit.get(issue, 0) + nombre
+
+
+# ==================== Middleware ASGI ====================
+
+class MiddlewareMetriques:
+    """Mesure la latence de chaque requête HTTP et l'attribue à sa route déclarée"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        contexte = ContexteRequete(scope)
+        jeton = _contexte.set(contexte)
+        statut = [500]
+
+        async def envoyer(message):
+            if message["type"] == "http.response.start":
+                statut[0] = message["status"]
+            await send(message)
+
+        debut = time.perf_counter()
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            duree = time.perf_counter() - debut
+            _contexte.reset(jeton)
+            cle = (scope["method"], chemin_route(scope))
+            with _verrou:
+                metriques = _routes.get(cle)
+                if metriques is None:
+                    metriques = _routes[cle] = MetriquesRoute()
+                metriques.duree.observer(duree)
+                metriques.duree_sql.observer(contexte.duree_sql)
+                metriques.nombre_sql.observer(contexte.nombre_sql)
+                metriques.statuts[statut[0]] = metriques.statuts.get(statut[0], 0) + 1
+
+
+# ==================== Export ====================
+
+def _echapper(valeur: str) -> str:
+    return valeur.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def exporter() -> str:
+    """Retourne toutes les métriques au format texte Prometheus"""
+    lignes = []
+    with _verrou:
+        routes = sorted(_routes.items())
+
+        lignes.append("# HELP http_requete_duree_secondes Latence des requêtes HTTP par route")
+        lignes.append("# TYPE http_requete_duree_secondes histogram")
+        for (methode, route), metriques in routes:
+            etiquettes = f'methode="{methode}",route="{_echapper(route)}"'
+            lignes.extend(metriques.duree.exporter("http_requete_duree_secondes", etiquettes))
+
+        lignes.append("# HELP http_requete_sql_duree_secondes Temps passé en base par requête HTTP")
+        lignes.append("# TYPE http_requete_sql_duree_secondes histogram")
+        for (methode, route), metriques in routes:
+            etiquettes = f'methode="{methode}",route="{_echapper(route)}"'
+            lignes.extend(metriques.duree_sql.exporter("http_requete_sql_duree_secondes", etiquettes))
+
+        lignes.append("# HELP http_requete_sql_requetes Nombre de requêtes SQL par requête HTTP")
+        lignes.append("# TYPE http_requete_sql_requetes histogram")
+        for (methode, route), metriques in routes:
+            etiquettes = f'methode="{methode}",route="{_echapper(route)}"'
+            lignes.extend(metriques.nombre_sql.exporter("http_requete_sql_requetes", etiquettes))
+
+        lignes.append("# HELP http_requetes_total Requêtes HTTP par route et statut")
+        lignes.append("# TYPE http_requetes_total counter")
+        for (methode, route), metriques in routes:
+            for statut, nombre in sorted(metriques.statuts.items()):
+                lignes.append(
+                    f'http_requetes_total{{methode="{methode}",route="{_echapper(route)}",statut="{statut}"}} {nombre}'
+                )
+
+        lignes.append("# HELP sql_hors_requete_total Requêtes SQL exécutées hors requête HTTP")
+        lignes.append("# TYPE sql_hors_requete_total counter")
+        lignes.append(f"sql_hors_requete_total {_sql_hors_requete['nombre']}")
+        lignes.append("# TYPE sql_hors_requete_duree_secondes_total counter")
+        lignes.append(f"sql_hors_requete_duree_secondes_total {_sql_hors_requete['duree']:.6f}")
+
+        lignes.append("# HELP llm_appel_duree_secondes Latence des appels au LLM du chatbot")
+        lignes.append("# TYPE llm_appel_duree_secondes histogram")
+        lignes.extend(_llm["duree"].exporter("llm_appel_duree_secondes", ""))
+        lignes.append("# HELP llm_jetons_total Jetons consommés par le chatbot")
+        lignes.append("# TYPE llm_jetons_total counter")
+        lignes.append(f'llm_jetons_total{{type="prompt"}} {_llm["jetons_prompt"]}')
+        lignes.append(f'llm_jetons_total{{type="reponse"}} {_llm["jetons_reponse"]}')
+        lignes.append("# TYPE llm_erreurs_total counter")
+        lignes.append(f"llm_erreurs_total {_llm['erreurs']}")
+
+        lignes.append("# HELP chat_admission_total Issues du contrôle d'admission du chatbot")
+        lignes.append("# TYPE chat_admission_total counter")
+        for issue, nombre in sorted(_admissions_chat.items()):
+            lignes.append(f'chat_admission_total{{issue="{issue}"}} {nombre}')
+
+        lignes.append("# HELP audit_evenements_total Événements du journal d'audit par issue")
+        lignes.append("# TYPE audit_evenements_total counter")
+        for issue, nombre in sorted(_audit.items()):
+            lignes.append(f'audit_evenements_total{{issue="{issue}"}} {nombre}')
+
+    return "\n".join(lignes) + "\n"
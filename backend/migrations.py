@@ -0,0 +1,242 @@
+"""
+Migrations versionnées du schéma
+`create_all` crée les tables manquantes mais ne modifie pas une base existante
+(index, colonnes). Chaque migration est appliquée une seule fois, dans sa propre
+transaction, et enregistrée dans la table `schema_version`.
+Sur une base neuve, `create_all` a déjà créé le schéma final : chaque migration
+doit donc être idempotente (IF NOT EXISTS, vérification préalable des colonnes).
+
+Usage:
+    python migrations.py                  # applique les migrations en attente
+    python migrations.py --etat           # versions appliquées / en attente
+    python migrations.py --verifier-plans # les requêtes fréquentes utilisent-elles un index ?
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text, select, inspect
+from sqlalchemy.engine import Connection, Engine
+
+from models import Utilisateur, Medecin, HoraireMedecin, RendezVous, StatutRendezVous
+import recherche
+import specialites
+import telephones
+
+
+# ==================== Migrations ====================
+
+def _index_requetes_frequentes(connexion: Connection):
+    """Index des filtres les plus fréquents (disponibilités, patients, horaires)"""
+    for instruction in (
+        "CREATE INDEX IF NOT EXISTS ix_rendez_vous_medecin_date_statut "
+        "ON rendez_vous (medecin_id, date_heure, statut)",
+        "CREATE INDEX IF NOT EXISTS ix_rendez_vous_patient_date ON rendez_vous (patient_id, date_heure)",
+        "CREATE INDEX IF NOT EXISTS ix_utilisateurs_telephone ON utilisateurs (telephone)",
+        "CREATE INDEX IF NOT EXISTS ix_horaires_medecin_jour ON horaires_medecins (medecin_id, jour_semaine)",
+    ):
+        connexion.execute(text(instruction))
+
+
+def _colonnes(connexion: Connection, table: str) -> set:
+    return {colonne["name"] for colonne in inspect(connexion).get_columns(table)}
+
+
+def _specialite_normalisee(connexion: Connection):
+    """Colonne repliée et indexée des spécialités, remplie pour les médecins existants"""
+    if "specialite_normalisee" not in _colonnes(connexion, "medecins"):
+        connexion.execute(text("ALTER TABLE medecins ADD COLUMN specialite_normalisee VARCHAR(100)"))
+    lignes = connexion.execute(text("SELECT id, specialite FROM medecins")).all()
+    if lignes:
+        connexion.execute(
+            text("UPDATE medecins SET specialite_normalisee = :normalisee WHERE id = :id"),
+            [{"id": ligne.id, "normalisee": specialites.normaliser(ligne.specialite)} for ligne in lignes]
+        )
+    connexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medecins_specialite_normalisee ON medecins (specialite_normalisee)"
+    ))
+
+
+def _recherche_plein_texte(connexion: Connection):
+    """Index FTS5 des patients et des rendez-vous (SQLite; ILIKE ailleurs)"""
+    if connexion.dialect.name == "sqlite":
+        recherche.creer_index(connexion)
+
+
+def _telephone_normalise(connexion: Connection):
+    """Numéro canonique unique par patient : fusion des doublons puis index unique partiel"""
+    if "telephone_normalise" not in _colonnes(connexion, "utilisateurs"):
+        connexion.execute(text("ALTER TABLE utilisateurs ADD COLUMN telephone_normalise VARCHAR(20)"))
+    telephones.dedoublonner_patients(connexion)
+    telephones.remplir_forme_canonique(connexion)
+    connexion.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_utilisateurs_telephone_patient "
+        "ON utilisateurs (telephone_normalise) WHERE role = 'patient'"
+    ))
+
+
+# (version, nom, fonction) dans l'ordre d'application; ne jamais renuméroter
+def _journal_audit_ajout_seul(connexion: Connection):
+    """Le journal d'audit refuse toute modification ou suppression (SQLite)"""
+    if connexion.dialect.name != "sqlite":
+        return
+    for operation in ("UPDATE", "DELETE"):
+        connexion.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS journal_audit_sans_{operation.lower()} "
+            f"BEFORE {operation} ON journal_audit "
+            f"BEGIN SELECT RAISE(ABORT, 'journal_audit est en ajout seul'); END"
+        ))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "index_requetes_frequentes", _index_requetes_frequentes),
+    (2, "specialite_normalisee", _specialite_normalisee),
+    (3, "recherche_plein_texte", _recherche_plein_texte),
+    (4, "telephone_normalise", _telephone_normalise),
+    (5, "journal_audit_ajout_seul", _journal_audit_ajout_seul),
+]
+
+
+# ==================== Exécution ====================
+
+def _creer_table_version(moteur: Engine):
+    with moteur.begin() as connexion:
+        connexion.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, nom VARCHAR(100) NOT NULL, date_application TIMESTAMP NOT NULL)"
+        ))
+
+
+def versions_appliquees(moteur: Engine) -> set:
+    _creer_table_version(moteur)
+    with moteur.connect() as connexion:
+        return {ligne[0] for ligne in connexion.execute(text("SELECT version FROM schema_version"))}
+
+
+def appliquer_migrations(moteur: Engine) -> List[str]:
+    """
+    Applique les migrations en attente
+
+    Returns:
+        Noms des migrations appliquées
+    """
+    deja_appliquees = versions_appliquees(moteur)
+    appliquees = []
+    for version, nom, migration in MIGRATIONS:
+        if version in deja_appliquees:
+            continue
+        with moteur.begin() as connexion:
+            migration(connexion)
+            connexion.execute(
+                text("INSERT INTO schema_version (version, nom, date_application) VALUES (:version, :nom, :date)"),
+                {"version": version, "nom": nom, "date": datetime.utcnow()}
+            )
+        appliquees.append(f"{version:04d}_{nom}")
+    return appliquees
+
+
+# ==================== Vérification des plans ====================
+
+def requetes_frequentes() -> list:
+    """(description, requête, index attendu) pour les filtres les plus fréquents"""
+    debut = datetime(2025, 1, 6)
+    actifs = [StatutRendezVous.EN_ATTENTE.value, StatutRendezVous.CONFIRME.value]
+    return [
+        (
+            "créneaux occupés d'un médecin sur une journée",
+            select(RendezVous).where(
+                RendezVous.medecin_id == 1,
+                RendezVous.date_heure >= debut,
+                RendezVous.date_heure < debut + timedelta(days=1),
+                RendezVous.statut.in_(actifs),
+            ),
+            "ix_rendez_vous_medecin_date_statut",
+        ),
+        (
+            "conflit de réservation",
+            select(RendezVous).where(
+                RendezVous.medecin_id == 1, RendezVous.date_heure == debut, RendezVous.statut.in_(actifs)
+            ).limit(1),
+            "ix_rendez_vous_medecin_date_statut",
+        ),
+        (
+            "rendez-vous d'un médecin",
+            select(RendezVous).where(RendezVous.medecin_id == 1).order_by(RendezVous.date_heure),
+            "ix_rendez_vous_medecin_date_statut",
+        ),
+        (
+            "rendez-vous d'un patient",
+            select(RendezVous).where(RendezVous.patient_id == 7).order_by(RendezVous.date_heure),
+            "ix_rendez_vous_patient_date",
+        ),
+        (
+            "patient par téléphone",
+            select(Utilisateur).where(
+                Utilisateur.telephone_normalise == "+33698765432", Utilisateur.role == "patient"
+            ).limit(1),
+            "ux_utilisateurs_telephone_patient",
+        ),
+        (
+            "horaire d'un médecin pour un jour",
+            select(HoraireMedecin).where(
+                HoraireMedecin.medecin_id == 1, HoraireMedecin.jour_semaine == 0, HoraireMedecin.est_actif.is_(True)
+            ),
+            "ix_horaires_medecin_jour",
+        ),
+        (
+            "médecins par spécialité (préfixe)",
+            select(Medecin.id).where(specialites.filtre_sql(Medecin.specialite_normalisee, "cardio")),
+            "ix_medecins_specialite_normalisee",
+        ),
+    ]
+
+
+def verifier_plans(moteur: Engine) -> List[str]:
+    """Retourne les requêtes fréquentes dont le plan n'utilise pas l'index attendu"""
+    import requetes_lentes
+
+    echecs = []
+    with moteur.connect() as connexion:
+        for description, requete, index in requetes_frequentes():
+            compilee = requete.compile(dialect=moteur.dialect, compile_kwargs={"render_postcompile": True})
+            if compilee.positiontup is not None:
+                parametres = tuple(compilee.params[nom] for nom in compilee.positiontup)
+            else:
+                parametres = compilee.params
+            lignes = requetes_lentes.plan(
+                connexion.connection.dbapi_connection, moteur.dialect.name, str(compilee), parametres
+            )
+            plan_texte = " / ".join(lignes)
+            if index not in plan_texte:
+                echecs.append(f"{description} : {index} non utilisé ({plan_texte})")
+            else:
+                print(f"   ✅ {description} : {index}")
+    return echecs
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Migrations du schéma")
+    parser.add_argument("--etat", action="store_true", help="Affiche les versions appliquées et en attente")
+    parser.add_argument("--verifier-plans", action="store_true",
+                        help="Vérifie que les requêtes fréquentes utilisent leur index (SQLite)")
+    arguments = parser.parse_args()
+
+    if arguments.etat:
+        versions = versions_appliquees(engine)
+        for numero, nom_migration, _ in MIGRATIONS:
+            print(f"   {'✅' if numero in versions else '⏳'} {numero:04d}_{nom_migration}")
+    elif arguments.verifier_plans:
+        appliquer_migrations(engine)
+        resultat_echecs = verifier_plans(engine)
+        for echec in resultat_echecs:
+            print(f"   ❌ {echec}")
+        sys.exit(1 if resultat_echecs else 0)
+    else:
+        noms = appliquer_migrations(engine)
+        print(f"✅ {len(noms)} migration(s) appliquée(s)")
+        for nom_migration in noms:
+            print(f"   - {nom_migration}")
@@ -3,12 +3,15 @@ Modèles de base de données SQLAlchemy
 Définit la structure des tables pour le système de rendez-vous médicaux
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, ForeignKey, Text, Float, Index, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 import enum
 
+from specialites import normaliser as normaliser_specialite
+from telephones import normaliser as normaliser_telephone
+
 # Base pour tous les modèles
 Base = declarative_base()
 
@@ -34,11 +37,23 @@ class Utilisateur(Base):
     Table des utilisateurs (patients, médecins, secrétaires)
     """
     __tablename__ = "utilisateurs"
+    __table_args__ = (
+        # Un numéro canonique identifie au plus un patient
+        Index(
+            "ux_utilisateurs_telephone_patient", "telephone_normalise", unique=True,
+            sqlite_where=text("role = 'patient'"), postgresql_where=text("role = 'patient'")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, index=True)
-    telephone = Column(String(20))
+    telephone = Column(String(20), index=True)
+    # Forme E.164 (NULL si absent ou factice); le défaut couvre les insert() groupés
+    telephone_normalise = Column(
+        String(20),
+        default=lambda contexte: normaliser_telephone(contexte.get_current_parameters().get("telephone"))
+    )
     mot_de_passe_hash = Column(String(255))
     role = Column(String(20), default=RoleUtilisateur.PATIENT.value)
     est_actif = Column(Boolean, default=True)
@@ -52,6 +67,11 @@ class Utilisateur(Base):
     )
     notifications = relationship("Notification", back_populates="utilisateur")
 
+    @validates("telephone")
+    def _normaliser_telephone(self, cle, valeur):
+        self.telephone_normalise = normaliser_telephone(valeur)
+        return valeur
+
 
 class Medecin(Base):
     """
@@ -62,6 +82,12 @@ class Medecin(Base):
     id = Column(Integer, primary_key=True, index=True)
     utilisateur_id = Column(Integer, ForeignKey("utilisateurs.id"))
     specialite = Column(String(100), nullable=False)
+    # Forme repliée (sans accents ni majuscules) pour la recherche par préfixe;
+    # le défaut couvre les insertions hors ORM (insert() groupés)
+    specialite_normalisee = Column(
+        String(100), index=True,
+        default=lambda contexte: normaliser_specialite(contexte.get_current_parameters().get("specialite"))
+    )
     description = Column(String(500))
     duree_consultation = Column(Integer, default=30)  # en minutes
     est_disponible = Column(Boolean, default=True)
@@ -70,12 +96,20 @@ class Medecin(Base):
     rendez_vous = relationship("RendezVous", back_populates="medecin")
     horaires = relationship("HoraireMedecin", back_populates="medecin")
 
+    @validates("specialite")
+    def _normaliser_specialite(self, cle, valeur):
+        self.specialite_normalisee = normaliser_specialite(valeur)
+        return valeur
+
 
 class HoraireMedecin(Base):
     """
     Table des horaires de travail des médecins
     """
     __tablename__ = "horaires_medecins"
+    __table_args__ = (
+        Index("ix_horaires_medecin_jour", "medecin_id", "jour_semaine"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     medecin_id = Column(Integer, ForeignKey("medecins.id"))
@@ -93,6 +127,12 @@ class RendezVous(Base):
     Table des rendez-vous médicaux
     """
     __tablename__ = "rendez_vous"
+    __table_args__ = (
+        # Créneaux occupés d'un médecin (disponibilités, réservation, tableau de bord)
+        Index("ix_rendez_vous_medecin_date_statut", "medecin_id", "date_heure", "statut"),
+        # Rendez-vous d'un patient
+        Index("ix_rendez_vous_patient_date", "patient_id", "date_heure"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("utilisateurs.id"))
@@ -108,6 +148,28 @@ class RendezVous(Base):
     medecin = relationship("Medecin", back_populates="rendez_vous")
 
 
+class RendezVousArchive(Base):
+    """
+    Rendez-vous terminés ou annulés déplacés hors de la table vivante (voir archivage.py)
+    Mêmes colonnes que `rendez_vous`, identifiants conservés.
+    """
+    __tablename__ = "rendez_vous_archive"
+    __table_args__ = (
+        Index("ix_rendez_vous_archive_patient_date", "patient_id", "date_heure"),
+        Index("ix_rendez_vous_archive_medecin_date", "medecin_id", "date_heure"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    patient_id = Column(Integer)
+    medecin_id = Column(Integer)
+    date_heure = Column(DateTime, nullable=False, index=True)
+    statut = Column(String(20))
+    motif = Column(String(500))
+    notes = Column(Text)
+    date_creation = Column(DateTime)
+    date_archivage = Column(DateTime, default=datetime.utcnow)
+
+
 class MessageChat(Base):
     """
     Table pour stocker l'historique des conversations du chatbot
@@ -136,3 +198,37 @@ class Notification(Base):
 
     utilisateur = relationship("Utilisateur", back_populates="notifications")
 
+
+class PrevisionDemande(Base):
+    """
+    Table des prévisions de réservations par spécialité, jour et heure
+    Recalculée chaque nuit à partir de l'historique des rendez-vous
+    """
+    __tablename__ = "previsions_demande"
+
+    id = Column(Integer, primary_key=True, index=True)
+    specialite = Column(String(100), nullable=False, index=True)
+    date = Column(Date, nullable=False, index=True)
+    jour_semaine = Column(Integer)  # 0=Lundi, 6=Dimanche
+    heure = Column(Integer)  # 0-23
+    valeur = Column(Float, nullable=False)  # réservations attendues
+    date_calcul = Column(DateTime, default=datetime.utcnow)
+
+
+class EvenementAudit(Base):
+    """
+    Journal d'audit, en ajout seul (voir audit.py) : qui a créé, modifié, annulé
+    un rendez-vous ou consulté des données de patients
+    """
+    __tablename__ = "journal_audit"
+    __table_args__ = (
+        Index("ix_journal_audit_cible", "cible_type", "cible_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    horodatage = Column(DateTime, nullable=False, index=True)
+    acteur = Column(String(100), nullable=False, index=True)  # "utilisateur:12" ou "ip:1.2.3.4"
+    action = Column(String(50), nullable=False)
+    cible_type = Column(String(30))
+    cible_id = Column(Integer)
+    details = Column(Text)  # JSON
@@ -0,0 +1,172 @@
+"""
+Diffusion de notifications en masse
+Insère les notifications de façon ensembliste (INSERT ... SELECT) par lots,
+dans une seule transaction, avec un suivi de progression par tâche
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, insert, func, literal, DateTime
+
+from database import SessionLocal
+from models import Utilisateur, RendezVous, Notification
+
+# Nombre de destinataires insérés par instruction INSERT ... SELECT
+TAILLE_LOT = int(os.getenv("NOTIFICATIONS_TAILLE_LOT", "5000"))
+
+# Nombre de tâches conservées en mémoire pour la consultation de la progression
+TACHES_CONSERVEES = 200
+
+_taches: "OrderedDict[str, dict]" = OrderedDict()
+_verrou = threading.Lock()
+
+
+def construire_filtre(
+        role: Optional[str] = None,
+        medecin_id: Optional[int] = None,
+        date_debut: Optional[str] = None,
+        date_fin: Optional[str] = None
+) -> list:
+    """
+    Construit les conditions SQL sélectionnant les destinataires
+
+    Args:
+        role: Rôle des utilisateurs ciblés
+        medecin_id: Ne cibler que les patients de ce médecin
+        date_debut: Ne cibler que les patients ayant un rendez-vous à partir de cette date (YYYY-MM-DD)
+        date_fin: Ne cibler que les patients ayant un rendez-vous jusqu'à cette date incluse (YYYY-MM-DD)
+
+    Returns:
+        Liste de conditions à appliquer sur la table des utilisateurs
+
+    Raises:
+        ValueError: si une date n'est pas au format YYYY-MM-DD
+    """
+    conditions = [Utilisateur.est_actif == True]
+    if role:
+        conditions.append(Utilisateur.role == role)
+
+    conditions_rdv = []
+    if medecin_id is not None:
+        conditions_rdv.append(RendezVous.medecin_id == medecin_id)
+    if date_debut:
+        conditions_rdv.append(RendezVous.date_heure >= datetime.strptime(date_debut, "%Y-%m-%d"))
+    if date_fin:
+        fin = datetime.strptime(date_fin, "%Y-%m-%d") + timedelta(days=1)
+        conditions_rdv.append(RendezVous.date_heure < fin)
+
+    if conditions_rdv:
+        conditions.append(Utilisateur.id.in_(
+            select(RendezVous.patient_id).where(*conditions_rdv)
+        ))
+
+    return conditions
+
+
+def creer_tache() -> dict:
+    """Enregistre une nouvelle tâche de diffusion et retourne son état initial"""
+    tache = {
+        "tache_id": uuid.uuid4().hex,
+        "statut": "en_attente",
+        "total": 0,
+        "inseres": 0,
+        "progression": 0.0,
+        "erreur": None,
+        "date_creation": datetime.utcnow(),
+        "date_fin": None
+    }
+    with _verrou:
+        _taches[tache["tache_id"]] = tache
+        while len(_taches) > TACHES_CONSERVEES:
+            _taches.popitem(last=False)
+    return dict(tache)
+
+
+def obtenir_tache(tache_id: str) -> Optional[dict]:
+    """Retourne une copie de l'état d'une tâche, ou None si elle est inconnue"""
+    with _verrou:
+        tache = _taches.get(tache_id)
+        return dict(tache) if tache else None
+
+
+def _mettre_a_jour(tache_id: str, **valeurs):
+    with _verrou:
+        tache = _taches.get(tache_id)
+        if not tache:
+            return
+        tache.update(valeurs)
+        if tache["total"]:
+            tache["progression"] = round(tache["inseres"] / tache["total"], 4)
+
+
+def executer_tache(tache_id: str, conditions: list, sujet: str, message: str, canal: str):
+    """
+    Insère les notifications de tous les destinataires d'une tâche
+
+    Les destinataires sont parcourus par plages d'identifiants (pagination par clé)
+    et chaque plage est insérée en une seule instruction INSERT ... SELECT.
+    Le tout est validé en une seule transaction : soit tous les destinataires
+    reçoivent la notification, soit aucun.
+    """
+    db = SessionLocal()
+    try:
+        total = db.scalar(
+            select(func.count()).select_from(Utilisateur).where(*conditions)
+        )
+        _mettre_a_jour(tache_id, statut="en_cours", total=total)
+
+        maintenant = datetime.utcnow()
+        colonnes = ["utilisateur_id", "canal", "sujet", "message", "statut", "date_creation"]
+        dernier_id = 0
+        inseres = 0
+
+        while True:
+            # Identifiant du dernier destinataire de la plage courante
+            borne = db.scalar(
+                select(Utilisateur.id)
+                .where(*conditions, Utilisateur.id > dernier_id)
+                .order_by(Utilisateur.id.asc())
+                .offset(TAILLE_LOT - 1)
+                .limit(1)
+            )
+
+            plage = [Utilisateur.id > dernier_id]
+            if borne is not None:
+                plage.append(Utilisateur.id <= borne)
+
+            source = select(
+                Utilisateur.id,
+                literal(canal),
+                literal(sujet),
+                literal(message),
+                literal("en_attente"),
+                literal(maintenant, DateTime)
+            ).where(*conditions, *plage)
+
+            resultat = db.execute(insert(Notification).from_select(colonnes, source))
+            inseres += resultat.rowcount
+            _mettre_a_jour(tache_id, inseres=inseres)
+
+            if borne is None:
+                break
+            dernier_id = borne
+
+        db.commit()
+        _mettre_a_jour(
+            tache_id,
+            statut="terminee",
+            total=inseres,
+            inseres=inseres,
+            progression=1.0,
+            date_fin=datetime.utcnow()
+        )
+    except Exception as e:
+        db.rollback()
+        _mettre_a_jour(tache_id, statut="echec", erreur=str(e), date_fin=datetime.utcnow())
+    finally:
+        db.close()
@@ -0,0 +1,191 @@
+"""
+Prévision de la demande par spécialité, jour de semaine et heure
+Agrège l'historique des rendez-vous en SQL, ajuste des profils saisonniers
+hebdomadaires avec NumPy et stocke les prévisions dans une table précalculée
+
+Usage:
+    python prevision_demande.py
+"""
+
+import asyncio
+import os
+from datetime import datetime, date, timedelta
+from typing import Optional, List
+
+import numpy as np
+from sqlalchemy import select, func, extract, delete, insert
+from sqlalchemy.orm import Session
+
+from models import Medecin, PrevisionDemande
+import archivage
+
+# Nombre de semaines d'historique prises en compte
+SEMAINES_HISTORIQUE = int(os.getenv("PREVISION_SEMAINES_HISTORIQUE", "52"))
+
+# Nombre de semaines prévues à l'avance
+HORIZON_SEMAINES = int(os.getenv("PREVISION_HORIZON_SEMAINES", "4"))
+
+# Heure locale du recalcul nocturne
+HEURE_RAFRAICHISSEMENT = int(os.getenv("PREVISION_HEURE_RAFRAICHISSEMENT", "2"))
+
+# Lissage exponentiel entre semaines : poids de la semaine la plus récente
+ALPHA = 0.3
+
+
+def agreger_historique(db: Session, debut: date, fin: date) -> dict:
+    """
+    Compte les réservations par spécialité, jour et heure
+
+    L'agrégation est faite par la base (GROUP BY); seules les cellules non vides
+    remontent.
+
+    Returns:
+        {specialite: tableau (semaines, 7, 24) des réservations}
+    """
+    borne_debut = datetime.combine(debut, datetime.min.time())
+    # L'archive n'est lue que si la période remonte jusqu'à elle
+    rdv = archivage.rendez_vous_pour_periode(db, borne_debut)
+    jour = func.date(rdv.date_heure)
+    heure = extract("hour", rdv.date_heure)
+    requete = select(
+        Medecin.specialite,
+        jour,
+        heure,
+        func.count(rdv.id)
+    ).join(
+        Medecin, rdv.medecin_id == Medecin.id
+    ).where(
+        rdv.date_heure >= borne_debut,
+        rdv.date_heure < datetime.combine(fin, datetime.min.time())
+    ).group_by(Medecin.specialite, jour, heure)
+
+    semaines = (fin - debut).days // 7
+    cellules = {}
+    for specialite, jour_rdv, heure_rdv, nombre in db.execute(requete):
+        if isinstance(jour_rdv, str):
+            jour_rdv = date.fromisoformat(jour_rdv)
+        elif isinstance(jour_rdv, datetime):
+            jour_rdv = jour_rdv.date()
+        ecart = (jour_rdv - debut).days
+        cellules.setdefault(specialite, []).append((ecart // 7, ecart % 7, int(heure_rdv), nombre))
+
+    historique = {}
+    for specialite, lignes in cellules.items():
+        valeurs = np.array(lignes, dtype=np.int64)
+        tableau = np.zeros((semaines, 7, 24), dtype=np.float64)
+        np.add.at(tableau, (valeurs[:, 0], valeurs[:, 1], valeurs[:, 2]), valeurs[:, 3])
+        historique[specialite] = tableau
+    return historique
+
+
+def ajuster_profil(tableau: np.ndarray) -> np.ndarray:
+    """
+    Calcule le profil saisonnier (7, 24) par lissage exponentiel des semaines
+
+    Les semaines antérieures à la première réservation de la spécialité sont ignorées,
+    pour ne pas tirer la prévision vers zéro.
+    """
+    totaux = tableau.sum(axis=(1, 2))
+    actives = np.nonzero(totaux)[0]
+    if not len(actives):
+        return np.zeros((7, 24))
+    tableau = tableau[actives[0]:]
+
+    n = len(tableau)
+    poids = ALPHA * (1 - ALPHA) ** np.arange(n - 1, -1, -1)
+    poids /= poids.sum()
+    return np.tensordot(poids, tableau, axes=1)
+
+
+def calculer_previsions(db: Session, aujourd_hui: Optional[date] = None) -> List[dict]:
+    """Calcule les prévisions des HORIZON_SEMAINES prochaines semaines"""
+    aujourd_hui = aujourd_hui or date.today()
+    # Début aligné sur un lundi pour que l'indice de jour soit le jour de la semaine
+    fin = aujourd_hui - timedelta(days=aujourd_hui.weekday())
+    debut = fin - timedelta(weeks=SEMAINES_HISTORIQUE)
+
+    date_calcul = datetime.utcnow()
+    previsions = []
+    for specialite, tableau in agreger_historique(db, debut, fin).items():
+        profil = ajuster_profil(tableau)
+        jours, heures = np.nonzero(profil)
+        for decalage in range(1, HORIZON_SEMAINES * 7 + 1):
+            jour_prevu = aujourd_hui + timedelta(days=decalage)
+            jour_semaine = jour_prevu.weekday()
+            for heure in heures[jours == jour_semaine]:
+                previsions.append({
+                    "specialite": specialite,
+                    "date": jour_prevu,
+                    "jour_semaine": jour_semaine,
+                    "heure": int(heure),
+                    "valeur": round(float(profil[jour_semaine, heure]), 3),
+                    "date_calcul": date_calcul,
+                })
+    return previsions
+
+
+def rafraichir_previsions(db: Session) -> int:
+    """
+    Remplace le contenu de la table des prévisions dans une seule transaction
+
+    Returns:
+        Nombre de prévisions enregistrées
+    """
+    previsions = calculer_previsions(db)
+    db.execute(delete(PrevisionDemande))
+    if previsions:
+        db.execute(insert(PrevisionDemande), previsions)
+    db.commit()
+    return len(previsions)
+
+
+def lire_previsions(
+        db: Session,
+        specialite: Optional[str] = None,
+        jours: int = 7
+) -> List[PrevisionDemande]:
+    """Lit les prévisions précalculées pour les prochains jours"""
+    aujourd_hui = date.today()
+    requete = db.query(PrevisionDemande).filter(
+        PrevisionDemande.date > aujourd_hui,
+        PrevisionDemande.date <= aujourd_hui + timedelta(days=jours)
+    )
+    if specialite:
+        requete = requete.filter(PrevisionDemande.specialite == specialite)
+    return requete.order_by(
+        PrevisionDemande.date.asc(),
+        PrevisionDemande.specialite.asc(),
+        PrevisionDemande.heure.asc()
+    ).all()
+
+
+def _rafraichir_avec_session():
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return rafraichir_previsions(db)
+    finally:
+        db.close()
+
+
+async def boucle_nocturne():
+    """Recalcule les prévisions chaque nuit à HEURE_RAFRAICHISSEMENT"""
+    while True:
+        maintenant = datetime.now()
+        prochaine = maintenant.replace(hour=HEURE_RAFRAICHISSEMENT, minute=0, second=0, microsecond=0)
+        if prochaine <= maintenant:
+            prochaine += timedelta(days=1)
+        await asyncio.sleep((prochaine - maintenant).total_seconds())
+        try:
+            nombre = await asyncio.to_thread(_rafraichir_avec_session)
+            print(f"📈 Prévisions de demande recalculées ({nombre} lignes)")
+        except Exception as e:
+            print(f"⚠️ Échec du recalcul des prévisions : {e}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    print(f"✅ {_rafraichir_avec_session()} prévisions enregistrées")
@@ -0,0 +1,241 @@
+"""
+Profilage à la demande d'une requête HTTP (cProfile)
+Activé par PROFILAGE_ACTIF=1 puis déclenché, pour un administrateur connecté,
+par l'en-tête `X-Profilage: 1` ou le paramètre `?profilage=1`.
+Le profil est enregistré au format pstats dans PROFILAGE_DOSSIER et la répartition
+ORM / Pydantic / bcrypt / chatbot est renvoyée dans l'en-tête Server-Timing.
+
+Sans PROFILAGE_ACTIF, rien n'est installé. Une fois installé, une requête non
+déclenchée ne coûte qu'une lecture d'en-tête et d'une ContextVar.
+
+Usage:
+    python profilage.py profils/<fichier>.pstats --lignes 30
+"""
+
+import argparse
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from session_auth import COOKIE_NAME, decoder_session_token
+
+ACTIF = os.getenv("PROFILAGE_ACTIF", "0") == "1"
+DOSSIER = os.getenv("PROFILAGE_DOSSIER", "profils")
+
+# Catégories de temps : fragments de chemin de fichier ou de nom de fonction native
+CATEGORIES = (
+    ("orm", ("/sqlalchemy/", "sqlite3", "/psycopg2/")),
+    ("pydantic", ("/pydantic/", "pydantic_core")),
+    ("bcrypt", ("/passlib/", "bcrypt")),
+    ("chatbot", ("chatbot.py", "/openai/")),
+)
+AUTRE = "autre"
+
+# Profilage de la requête en cours (liste des profileurs, un par thread utilisé)
+_profileurs_courants: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar(
+    "profileurs_courants", default=None
+)
+# cProfile ne supporte qu'un profileur actif par thread : une requête profilée à la fois
+_verrou = threading.Lock()
+
+
+# ==================== Threads de travail ====================
+
+def _executer_profile(profileurs: List[cProfile.Profile], fonction, *args):
+    profileur = cProfile.Profile()
+    profileur.enable()
+    try:
+        return fonction(*args)
+    finally:
+        profileur.disable()
+        profileurs.append(profileur)
+
+
+def _intercepter_threadpool():
+    """
+    Les routes et dépendances synchrones s'exécutent dans le pool de threads de
+    Starlette, hors du thread de la boucle : on enveloppe `run_in_threadpool` pour
+    y démarrer un profileur quand la requête en cours est profilée.
+    """
+    import fastapi.concurrency
+    import fastapi.dependencies.utils
+    import fastapi.routing
+    import starlette.concurrency
+
+    original = starlette.concurrency.run_in_threadpool
+
+    @functools.wraps(original)
+    async def run_in_threadpool(fonction, *args, **kwargs):
+        profileurs = _profileurs_courants.get()
+        if profileurs is None:
+            return await original(fonction, *args, **kwargs)
+        if kwargs:
+            fonction = functools.partial(fonction, **kwargs)
+        return await original(_executer_profile, profileurs, fonction, *args)
+
+    for module in (fastapi.concurrency, fastapi.dependencies.utils, fastapi.routing):
+        module.run_in_threadpool = run_in_threadpool
+
+
+# ==================== Analyse ====================
+
+def _categorie_directe(fonction: tuple) -> Optional[str]:
+    fichier, _, nom = fonction
+    cible = f"{fichier.replace(os.sep, '/')}:{nom}"
+    for categorie, fragments in CATEGORIES:
+        if any(fragment in cible for fragment in fragments):
+            return categorie
+    return None
+
+
+def repartition(statistiques: pstats.Stats) -> Dict[str, float]:
+    """
+    Temps propre (secondes) de chaque fonction, attribué à une catégorie.
+    Une fonction hors catégorie hérite de celle de son appelant principal, pour
+    que le code natif ou les dépendances (sqlite3 sous SQLAlchemy, httpx sous
+    openai...) soient comptés avec la bibliothèque qui les appelle.
+    """
+    donnees = statistiques.stats
+    memo: Dict[tuple, str] = {}
+
+    def categorie(fonction: tuple) -> str:
+        chaine = []
+        courante = fonction
+        resultat = AUTRE
+        while courante is not None and courante not in memo and courante not in chaine:
+            directe = _categorie_directe(courante)
+            if directe is not None:
+                resultat = directe
+                break
+            chaine.append(courante)
+            appelants = donnees.get(courante, (0, 0, 0.0, 0.0, {}))[4]
+            courante = max(appelants, key=lambda a: appelants[a][3]) if appelants else None
+        else:
+            if courante in memo:
+                resultat = memo[courante]
+        for element in chaine:
+            memo[element] = resultat
+        return resultat
+
+    temps = {nom: 0.0 for nom, _ in CATEGORIES}
+    temps[AUTRE] = 0.0
+    for fonction, (_, _, temps_propre, _, _) in donnees.items():
+        temps[categorie(fonction)] += temps_propre
+    return temps
+
+
+def _server_timing(temps: Dict[str, float], duree: float) -> str:
+    elements = [f"{nom};dur={valeur * 1000:.1f}" for nom, valeur in temps.items()]
+    elements.append(f"total;dur={duree * 1000:.1f}")
+    return ", ".join(elements)
+
+
+def _enregistrer(statistiques: pstats.Stats, methode: str, chemin: str) -> str:
+    identifiant = uuid.uuid4().hex[:12]
+    nom_chemin = chemin.strip("/").replace("/", "_") or "racine"
+    nom = f"{time.strftime('%Y%m%d-%H%M%S')}-{methode}-{nom_chemin}-{identifiant}.pstats"
+    os.makedirs(DOSSIER, exist_ok=True)
+    statistiques.dump_stats(os.path.join(DOSSIER, nom))
+    return nom
+
+
+# ==================== Middleware ASGI ====================
+
+def _declenche(scope) -> bool:
+    """Demande de profilage par un administrateur (rôle lu dans le cookie signé, sans base)"""
+    entetes = dict(scope.get("headers") or [])
+    demande = entetes.get(b"x-profilage") == b"1" or \
+        parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profilage") == ["1"]
+    if not demande or b"cookie" not in entetes:
+        return False
+    cookie = SimpleCookie()
+    cookie.load(entetes[b"cookie"].decode("latin-1"))
+    if COOKIE_NAME not in cookie:
+        return False
+    session = decoder_session_token(cookie[COOKIE_NAME].value)
+    return bool(session) and session.get("role") == "admin"
+
+
+class MiddlewareProfilage:
+    """Profile les requêtes déclenchées et ajoute le résultat aux en-têtes de réponse"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _declenche(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _verrou.acquire(blocking=False):
+            async def envoyer_occupe(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profilage", b"occupe")]
+                await send(message)
+
+            await self.app(scope, receive, envoyer_occupe)
+            return
+
+        profileurs: List[cProfile.Profile] = []
+        principal = cProfile.Profile()
+        jeton = _profileurs_courants.set(profileurs)
+        termine = [False]
+        debut = time.perf_counter()
+
+        def terminer() -> list:
+            principal.disable()
+            termine[0] = True
+            duree = time.perf_counter() - debut
+            try:
+                statistiques = pstats.Stats(principal)
+                for profileur in profileurs:
+                    statistiques.add(profileur)
+                nom = _enregistrer(statistiques, scope["method"], scope["path"])
+                return [
+                    (b"server-timing", _server_timing(repartition(statistiques), duree).encode()),
+                    (b"x-profilage", nom.encode()),
+                ]
+            finally:
+                _verrou.release()
+
+        async def envoyer(message):
+            if message["type"] == "http.response.start" and not termine[0]:
+                message["headers"] = list(message.get("headers", [])) + terminer()
+            await send(message)
+
+        principal.enable()
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            _profileurs_courants.reset(jeton)
+            if not termine[0]:
+                terminer()
+
+
+def installer(app):
+    """Installe le middleware de profilage (à appeler seulement si ACTIF)"""
+    _intercepter_threadpool()
+    app.add_middleware(MiddlewareProfilage)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Affiche un profil enregistré")
+    parser.add_argument("fichier")
+    parser.add_argument("--lignes", type=int, default=30)
+    parser.add_argument("--tri", default="cumulative")
+    arguments = parser.parse_args()
+
+    stats = pstats.Stats(arguments.fichier)
+    print("⏱️ Répartition (ms):")
+    for nom_categorie, valeur in repartition(stats).items():
+        print(f"   - {nom_categorie}: {valeur * 1000:.1f}")
+    print()
+    stats.sort_stats(arguments.tri).print_stats(arguments.lignes)
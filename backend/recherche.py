@@ -0,0 +1,118 @@
+"""
+Recherche plein texte des patients et des rendez-vous
+Sur SQLite, deux index FTS5 à contenu externe (`recherche_utilisateurs` : nom,
+email, téléphone; `recherche_rendez_vous` : motif, notes) sont tenus à jour par
+des déclencheurs, y compris pour les insertions groupées hors ORM. Les résultats
+sont classés par pertinence (bm25) et paginés.
+Sur les autres moteurs, repli sur ILIKE (sans classement).
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models import Utilisateur, RendezVous, RoleUtilisateur
+import telephones
+
+# Préfixes indexés : une saisie de 2 ou 3 caractères reste une recherche indexée
+TOKENISEUR = "unicode61 remove_diacritics 2"
+PREFIXES = "2 3"
+
+# table FTS -> (table de contenu, colonnes indexées)
+INDEX_PLEIN_TEXTE = {
+    "recherche_utilisateurs": ("utilisateurs", ("nom", "email", "telephone")),
+    "recherche_rendez_vous": ("rendez_vous", ("motif", "notes")),
+}
+
+_MOTS = re.compile(r"\w+", re.UNICODE)
+
+
+# ==================== Schéma (migration) ====================
+
+def creer_index(connexion: Connection):
+    """Tables FTS5, déclencheurs de synchronisation et remplissage initial (SQLite)"""
+    for table_fts, (table, colonnes) in INDEX_PLEIN_TEXTE.items():
+        liste = ", ".join(colonnes)
+        nouvelles = ", ".join(f"new.{colonne}" for colonne in colonnes)
+        anciennes = ", ".join(f"old.{colonne}" for colonne in colonnes)
+        suppression = (
+            f"INSERT INTO {table_fts}({table_fts}, rowid, {liste}) VALUES ('delete', old.id, {anciennes});"
+        )
+        insertion = f"INSERT INTO {table_fts}(rowid, {liste}) VALUES (new.id, {nouvelles});"
+        for instruction in (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table_fts} USING fts5("
+            f"{liste}, content='{table}', content_rowid='id', "
+            f"tokenize='{TOKENISEUR}', prefix='{PREFIXES}')",
+            f"CREATE TRIGGER IF NOT EXISTS {table_fts}_insertion AFTER INSERT ON {table} BEGIN {insertion} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table_fts}_suppression AFTER DELETE ON {table} BEGIN {suppression} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table_fts}_modification AFTER UPDATE OF {liste} ON {table} "
+            f"BEGIN {suppression} {insertion} END",
+            f"INSERT INTO {table_fts}({table_fts}) VALUES ('rebuild')",
+        ):
+            connexion.execute(text(instruction))
+
+
+# ==================== Requêtes ====================
+
+def expression_fts(saisie: str) -> str:
+    """
+    Expression MATCH FTS5 : chaque mot de la saisie devient un préfixe entre
+    guillemets (aucun opérateur FTS5 ne peut être injecté)
+    """
+    return " ".join(f'"{mot}"*' for mot in _MOTS.findall(saisie))
+
+
+def _ids_fts(db: Session, table_fts: str, saisie: str, filtre: str, decalage: int, limite: int) -> List[int]:
+    lignes = db.execute(text(
+        f"SELECT {table_fts}.rowid FROM {table_fts} {filtre} "
+        f"WHERE {table_fts} MATCH :expression ORDER BY {table_fts}.rank LIMIT :limite OFFSET :decalage"
+    ), {"expression": expression_fts(saisie), "limite": limite, "decalage": decalage})
+    return [ligne[0] for ligne in lignes]
+
+
+def ids_patients(db: Session, saisie: str, decalage: int, limite: int) -> List[int]:
+    """Identifiants des patients correspondant à la saisie, du plus pertinent au moins pertinent"""
+    if not expression_fts(saisie):
+        return []
+    # Un numéro de téléphone complet est cherché sous sa forme canonique
+    canonique = telephones.normaliser(saisie)
+    if canonique is not None:
+        return list(db.scalars(select(Utilisateur.id).where(
+            Utilisateur.telephone_normalise == canonique, Utilisateur.role == RoleUtilisateur.PATIENT.value
+        ).offset(decalage).limit(limite)))
+    if db.get_bind().dialect.name == "sqlite":
+        return _ids_fts(
+            db, "recherche_utilisateurs", saisie,
+            f"JOIN utilisateurs ON utilisateurs.id = recherche_utilisateurs.rowid "
+            f"AND utilisateurs.role = '{RoleUtilisateur.PATIENT.value}'",
+            decalage, limite
+        )
+    motif = f"%{saisie.strip()}%"
+    return list(db.scalars(
+        select(Utilisateur.id).where(
+            Utilisateur.role == RoleUtilisateur.PATIENT.value,
+            or_(Utilisateur.nom.ilike(motif), Utilisateur.email.ilike(motif), Utilisateur.telephone.ilike(motif))
+        ).order_by(Utilisateur.id.desc()).offset(decalage).limit(limite)
+    ))
+
+
+def ids_rendez_vous(db: Session, saisie: str, decalage: int, limite: int) -> List[int]:
+    """Identifiants des rendez-vous dont le motif ou les notes correspondent à la saisie"""
+    if not expression_fts(saisie):
+        return []
+    if db.get_bind().dialect.name == "sqlite":
+        return _ids_fts(db, "recherche_rendez_vous", saisie, "", decalage, limite)
+    motif = f"%{saisie.strip()}%"
+    return list(db.scalars(
+        select(RendezVous.id).where(or_(RendezVous.motif.ilike(motif), RendezVous.notes.ilike(motif)))
+        .order_by(RendezVous.date_heure.desc()).offset(decalage).limit(limite)
+    ))
+
+
+def ordonner(lignes: list, ids: List[int]) -> list:
+    """Remet les lignes chargées par `id IN (...)` dans l'ordre de pertinence"""
+    rang = {identifiant: position for position, identifiant in enumerate(ids)}
+    return sorted(lignes, key=lambda ligne: rang[ligne["id"]])
@@ -0,0 +1,332 @@
+"""
+Moteur de recommandation de créneaux
+Classe les combinaisons médecin + créneau pour une demande (spécialité, date, patient)
+à partir de caractéristiques précalculées sous forme de tableaux NumPy
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+import numpy as np
+from sqlalchemy import select, extract
+from sqlalchemy.orm import Session
+
+import annuaire
+import archivage
+from models import RendezVous, StatutRendezVous
+
+# Délai minimal entre deux rafraîchissements incrémentaux (secondes)
+INTERVALLE_RAFRAICHISSEMENT = float(os.getenv("RECOMMANDATION_INTERVALLE", "5"))
+
+# Les changements de statut (annulations) ne sont pas visibles par le filigrane
+# d'identifiant : l'historique est donc reconstruit entièrement à cette fréquence
+INTERVALLE_RECONSTRUCTION = float(os.getenv("RECOMMANDATION_RECONSTRUCTION", "600"))
+
+TAILLE_LOT = 10000
+
+# Poids des caractéristiques dans le score final
+POIDS = {
+    "charge": 0.25,
+    "annulation": 0.15,
+    "fidelite": 0.25,
+    "preference_horaire": 0.20,
+    "proximite": 0.15,
+}
+
+STATUTS_ACTIFS = [StatutRendezVous.EN_ATTENTE.value, StatutRendezVous.CONFIRME.value]
+
+
+def _minutes(heure: str) -> int:
+    heures, minutes = map(int, heure.split(":"))
+    return heures * 60 + minutes
+
+
+class MoteurRecommandation:
+    """
+    Caractéristiques précalculées pour le classement des créneaux
+
+    L'historique des rendez-vous est conservé en colonnes (patient, position du
+    médecin, heure, annulé) et complété de façon incrémentale à partir du dernier
+    identifiant lu. Les agrégats par médecin sont recalculés avec np.bincount.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._dernier_rafraichissement = 0.0
+        self._derniere_reconstruction = 0.0
+        self._dernier_id = 0
+
+        # Annuaire des médecins
+        self.medecin_ids = np.zeros(0, dtype=np.int64)
+        self.medecins: List[dict] = []
+        self.horaires: dict = {}
+        self._positions: dict = {}
+        self._version_annuaire = -1
+
+        # Historique en colonnes
+        self.hist_patient = np.zeros(0, dtype=np.int64)
+        self.hist_medecin = np.zeros(0, dtype=np.int32)
+        self.hist_heure = np.zeros(0, dtype=np.int8)
+        self.hist_annule = np.zeros(0, dtype=bool)
+
+        # Agrégats par médecin
+        self.taux_annulation = np.zeros(0, dtype=np.float64)
+
+    # ==================== Rafraîchissement ====================
+
+    def rafraichir(self, db: Session, forcer: bool = False):
+        """
+        Met à jour les tableaux de caractéristiques
+
+        Args:
+            db: Session SQLAlchemy
+            forcer: Ignore l'intervalle minimal entre deux rafraîchissements
+        """
+        maintenant = time.monotonic()
+        if not forcer and maintenant - self._dernier_rafraichissement < INTERVALLE_RAFRAICHISSEMENT:
+            return
+
+        with self._verrou:
+            reconstruire = forcer or maintenant - self._derniere_reconstruction >= INTERVALLE_RECONSTRUCTION
+            self._charger_medecins(db)
+            if reconstruire:
+                self._dernier_id = 0
+                self.hist_patient = np.zeros(0, dtype=np.int64)
+                self.hist_medecin = np.zeros(0, dtype=np.int32)
+                self.hist_heure = np.zeros(0, dtype=np.int8)
+                self.hist_annule = np.zeros(0, dtype=bool)
+                self._derniere_reconstruction = maintenant
+            self._charger_historique(db)
+            self._calculer_agregats()
+            self._dernier_rafraichissement = maintenant
+
+    def _charger_medecins(self, db: Session):
+        instantane = annuaire.obtenir()
+        if instantane.version == self._version_annuaire:
+            return
+        self._version_annuaire = instantane.version
+
+        anciennes_positions = self._positions
+        self.medecins = [
+            {
+                "id": fiche.id,
+                "nom": fiche.nom,
+                "specialite": fiche.specialite,
+                "duree_consultation": fiche.duree_consultation,
+            }
+            for fiche in instantane.disponibles
+        ]
+        self.medecin_ids = np.array([m["id"] for m in self.medecins], dtype=np.int64)
+        self._positions = {m["id"]: i for i, m in enumerate(self.medecins)}
+
+        # Si l'annuaire a changé, les positions de l'historique ne sont plus valides
+        if anciennes_positions and anciennes_positions != self._positions:
+            self._derniere_reconstruction = 0.0
+            self._dernier_id = 0
+            self.hist_patient = np.zeros(0, dtype=np.int64)
+            self.hist_medecin = np.zeros(0, dtype=np.int32)
+            self.hist_heure = np.zeros(0, dtype=np.int8)
+            self.hist_annule = np.zeros(0, dtype=bool)
+
+        self.horaires = {
+            (fiche.id, jour): (_minutes(horaire[0]), _minutes(horaire[1]))
+            for fiche in instantane.disponibles
+            for jour, horaire in enumerate(fiche.horaires) if horaire is not None
+        }
+
+    def _charger_historique(self, db: Session):
+        # La reconstruction complète relit aussi l'archive; les ajouts ne touchent que la table vivante
+        rdv = archivage.historique_complet() if self._dernier_id == 0 else RendezVous
+        requete = select(
+            rdv.id,
+            rdv.patient_id,
+            rdv.medecin_id,
+            extract("hour", rdv.date_heure),
+            rdv.statut,
+        ).where(rdv.id > self._dernier_id).order_by(rdv.id.asc())
+
+        patients, medecins, heures, annules = [], [], [], []
+        for lot in db.execute(requete).yield_per(TAILLE_LOT).partitions():
+            colonnes = np.array(
+                [
+                    (
+                        patient_id or 0,
+                        self._positions.get(medecin_id, -1),
+                        heure or 0,
+                        statut == StatutRendezVous.ANNULE.value,
+                    )
+                    for _, patient_id, medecin_id, heure, statut in lot
+                ],
+                dtype=np.int64,
+            )
+            self._dernier_id = lot[-1][0]
+            # Les rendez-vous de médecins indisponibles sont ignorés
+            colonnes = colonnes[colonnes[:, 1] >= 0]
+            patients.append(colonnes[:, 0])
+            medecins.append(colonnes[:, 1].astype(np.int32))
+            heures.append(colonnes[:, 2].astype(np.int8))
+            annules.append(colonnes[:, 3].astype(bool))
+
+        if patients:
+            self.hist_patient = np.concatenate([self.hist_patient] + patients)
+            self.hist_medecin = np.concatenate([self.hist_medecin] + medecins)
+            self.hist_heure = np.concatenate([self.hist_heure] + heures)
+            self.hist_annule = np.concatenate([self.hist_annule] + annules)
+
+    def _calculer_agregats(self):
+        nombre = len(self.medecins)
+        total = np.bincount(self.hist_medecin, minlength=nombre).astype(np.float64)
+        annules = np.bincount(
+            self.hist_medecin, weights=self.hist_annule, minlength=nombre
+        )
+        # Lissage de Laplace pour les médecins sans historique
+        self.taux_annulation = (annules + 1.0) / (total + 2.0)
+
+    # ==================== Classement ====================
+
+    def _profil_patient(self, patient_id: Optional[int]):
+        """Retourne (visites par médecin, préférence horaire sur 24h) d'un patient"""
+        nombre = len(self.medecins)
+        if patient_id is None or not len(self.hist_patient):
+            return np.zeros(nombre), np.full(24, 1.0 / 24)
+
+        masque = (self.hist_patient == patient_id) & ~self.hist_annule
+        visites = np.bincount(self.hist_medecin[masque], minlength=nombre).astype(np.float64)
+        heures = np.bincount(self.hist_heure[masque].astype(np.int64), minlength=24).astype(np.float64)
+        if heures.sum() == 0:
+            return visites, np.full(24, 1.0 / 24)
+        return visites, heures / heures.sum()
+
+    def recommander(
+            self,
+            db: Session,
+            specialite: Optional[str] = None,
+            date: Optional[str] = None,
+            patient_id: Optional[int] = None,
+            jours: int = 7,
+            limite: int = 10
+    ) -> List[dict]:
+        """
+        Propose les meilleures combinaisons médecin + créneau
+
+        Args:
+            db: Session SQLAlchemy
+            specialite: Filtre optionnel par spécialité
+            date: Date préférée au format YYYY-MM-DD (demain par défaut)
+            patient_id: Patient pour lequel personnaliser le classement
+            jours: Nombre de jours explorés à partir de la date préférée
+            limite: Nombre maximal de suggestions
+
+        Returns:
+            Liste de suggestions triées par score décroissant
+
+        Raises:
+            ValueError: si la date n'est pas au format YYYY-MM-DD
+        """
+        self.rafraichir(db)
+
+        maintenant = datetime.now()
+        if date:
+            debut = datetime.strptime(date, "%Y-%m-%d")
+        else:
+            debut = (maintenant + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        jours = max(1, min(jours, 31))
+
+        if specialite:
+            ids_specialite = {fiche.id for fiche in annuaire.obtenir().rechercher(specialite)}
+            positions = [i for i, m in enumerate(self.medecins) if m["id"] in ids_specialite]
+        else:
+            positions = list(range(len(self.medecins)))
+        if not positions:
+            return []
+
+        # ===== Génération des créneaux candidats (minutes depuis le début de la fenêtre) =====
+        cand_medecin, cand_minute = [], []
+        capacite = np.zeros(len(self.medecins))
+        for jour in range(jours):
+            date_jour = debut + timedelta(days=jour)
+            for position in positions:
+                medecin = self.medecins[position]
+                horaire = self.horaires.get((medecin["id"], date_jour.weekday()))
+                if not horaire:
+                    continue
+                duree = medecin["duree_consultation"]
+                minutes = np.arange(horaire[0], horaire[1] - duree + 1, duree, dtype=np.int64)
+                capacite[position] += len(minutes)
+                cand_minute.append(minutes + jour * 1440)
+                cand_medecin.append(np.full(len(minutes), position, dtype=np.int64))
+
+        if not cand_minute:
+            return []
+        cand_minute = np.concatenate(cand_minute)
+        cand_medecin = np.concatenate(cand_medecin)
+
+        # ===== Créneaux déjà réservés dans la fenêtre =====
+        ids_candidats = [self.medecins[p]["id"] for p in positions]
+        reserves = db.query(RendezVous.medecin_id, RendezVous.date_heure).filter(
+            RendezVous.medecin_id.in_(ids_candidats),
+            RendezVous.date_heure >= debut,
+            RendezVous.date_heure < debut + timedelta(days=jours),
+            RendezVous.statut.in_(STATUTS_ACTIFS)
+        ).all()
+
+        res_medecin = np.array([self._positions[m] for m, _ in reserves], dtype=np.int64)
+        res_minute = np.array(
+            [int((d - debut).total_seconds() // 60) for _, d in reserves], dtype=np.int64
+        )
+        cle_candidats = cand_medecin * (jours * 1440) + cand_minute
+        cle_reserves = res_medecin * (jours * 1440) + res_minute
+
+        limite_passe = int((maintenant - debut).total_seconds() // 60)
+        libres = ~np.isin(cle_candidats, cle_reserves) & (cand_minute > limite_passe)
+        cand_medecin = cand_medecin[libres]
+        cand_minute = cand_minute[libres]
+        if not len(cand_minute):
+            return []
+
+        # ===== Caractéristiques vectorisées =====
+        reservations = np.bincount(res_medecin, minlength=len(self.medecins)).astype(np.float64)
+        charge = np.divide(reservations, capacite, out=np.zeros_like(capacite), where=capacite > 0)
+
+        visites, preference = self._profil_patient(patient_id)
+        fidelite = np.log1p(visites) / np.log1p(visites.max()) if visites.max() > 0 else visites
+
+        heures = (cand_minute % 1440) // 60
+        caracteristiques = {
+            "charge": 1.0 - charge[cand_medecin],
+            "annulation": 1.0 - self.taux_annulation[cand_medecin],
+            "fidelite": fidelite[cand_medecin],
+            "preference_horaire": preference[heures] / preference.max(),
+            "proximite": 1.0 / (1.0 + cand_minute // 1440),
+        }
+        scores = sum(POIDS[nom] * valeurs for nom, valeurs in caracteristiques.items())
+
+        # ===== Sélection des meilleurs candidats =====
+        limite = max(1, min(limite, len(scores)))
+        meilleurs = np.argpartition(-scores, limite - 1)[:limite]
+        meilleurs = meilleurs[np.lexsort((cand_minute[meilleurs], -scores[meilleurs]))]
+
+        suggestions = []
+        for indice in meilleurs:
+            medecin = self.medecins[cand_medecin[indice]]
+            date_heure = debut + timedelta(minutes=int(cand_minute[indice]))
+            suggestions.append({
+                "medecin_id": medecin["id"],
+                "nom_medecin": medecin["nom"],
+                "specialite": medecin["specialite"],
+                "date": date_heure.strftime("%Y-%m-%d"),
+                "heure": date_heure.strftime("%H:%M"),
+                "score": round(float(scores[indice]), 4),
+                "details": {
+                    nom: round(float(valeurs[indice]), 4)
+                    for nom, valeurs in caracteristiques.items()
+                },
+            })
+        return suggestions
+
+
+# Instance partagée par l'API
+moteur = MoteurRecommandation()
@@ -0,0 +1,168 @@
+"""
+Chemin de réponse rapide pour les listes volumineuses
+Les lignes sont construites directement depuis les résultats SQL, validées en une
+seule passe avec un TypeAdapter (ou pas du tout pour les données internes de confiance),
+sérialisées avec orjson si disponible et compressées en gzip au-delà d'un seuil.
+Les réponses peuvent porter un ETag (304 sur If-None-Match) et être conservées
+déjà rendues dans un petit cache LRU.
+"""
+
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Taille minimale (octets) à partir de laquelle le corps est compressé
+TAILLE_MIN_GZIP = int(os.getenv("REPONSES_TAILLE_MIN_GZIP", "1024"))
+NIVEAU_GZIP = 5
+
+# Validation des lignes par le schéma de réponse; désactivable pour les données
+# construites par le serveur lui-même (REPONSES_VALIDATION=0)
+VALIDATION = os.getenv("REPONSES_VALIDATION", "1") != "0"
+
+
+@lru_cache(maxsize=None)
+def adaptateur_liste(schema: type) -> TypeAdapter:
+    """TypeAdapter List[schema], construit une seule fois par schéma"""
+    return TypeAdapter(List[schema])
+
+
+def serialiser(donnees: Any) -> bytes:
+    """Sérialise en JSON (orjson si disponible, sinon json de la bibliothèque standard)"""
+    if orjson is not None:
+        return orjson.dumps(donnees, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(donnees), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepte_gzip(request: Request) -> bool:
+    for element in request.headers.get("accept-encoding", "").split(","):
+        codage, _, parametres = element.strip().partition(";")
+        if codage.strip().lower() in ("gzip", "*"):
+            return parametres.strip().replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def compresser(corps: bytes) -> Optional[bytes]:
+    """Version gzip du corps s'il dépasse le seuil, sinon None"""
+    if len(corps) < TAILLE_MIN_GZIP:
+        return None
+    return gzip.compress(corps, compresslevel=NIVEAU_GZIP)
+
+
+def reponse_json(request: Request, corps: bytes, status_code: int = 200, etag: Optional[str] = None,
+                 cache_control: Optional[str] = None, corps_gzip: Optional[bytes] = None) -> Response:
+    """
+    Réponse JSON compressée en gzip si le client l'accepte et si le corps est assez gros
+
+    Args:
+        etag: Valeur opaque (sans guillemets) de l'ETag fort de la représentation
+        cache_control: En-tête Cache-Control éventuel
+        corps_gzip: Version déjà compressée du corps (voir CacheRendus)
+    """
+    entetes = {"Vary": "Accept-Encoding"}
+    if cache_control:
+        entetes["Cache-Control"] = cache_control
+    if len(corps) >= TAILLE_MIN_GZIP and accepte_gzip(request):
+        corps = corps_gzip or gzip.compress(corps, compresslevel=NIVEAU_GZIP)
+        entetes["Content-Encoding"] = "gzip"
+        if etag:
+            # Un ETag fort désigne une représentation : la version gzip a le sien
+            etag = f"{etag}-gzip"
+    if etag:
+        entetes["ETag"] = f'"{etag}"'
+    return Response(content=corps, status_code=status_code, media_type="application/json", headers=entetes)
+
+
+# ==================== Requêtes conditionnelles ====================
+
+def etag_correspond(request: Request, etag: str) -> bool:
+    """If-None-Match désigne-t-il la représentation courante (comparaison faible, RFC 9110) ?"""
+    entete = request.headers.get("if-none-match")
+    if not entete:
+        return False
+    for valeur in entete.split(","):
+        valeur = valeur.strip()
+        if valeur == "*":
+            return True
+        if valeur.startswith("W/"):
+            valeur = valeur[2:]
+        valeur = valeur.strip('"')
+        if valeur == etag or valeur == f"{etag}-gzip":
+            return True
+    return False
+
+
+def reponse_non_modifiee(etag: str, cache_control: Optional[str] = None) -> Response:
+    """304 sans corps, avec les mêmes en-têtes de cache que la réponse complète"""
+    entetes = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding"}
+    if cache_control:
+        entetes["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=entetes)
+
+
+class CacheRendus:
+    """
+    Corps JSON déjà rendus (et compressés) par clé, pour une version de données
+
+    Une entrée n'est servie que si sa version est la version courante; le nombre
+    de clés est borné (LRU) car elles peuvent venir de paramètres de requête.
+    """
+
+    def __init__(self, taille_max: int = 256):
+        self.taille_max = taille_max
+        self._entrees: "OrderedDict[Hashable, Tuple[Hashable, bytes, Optional[bytes]]]" = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle: Hashable, version: Hashable,
+                construire: Callable[[], bytes]) -> Tuple[bytes, Optional[bytes]]:
+        """(corps, corps_gzip) pour la clé, construits par `construire()` si absents ou périmés"""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[0] == version:
+                self._entrees.move_to_end(cle)
+                return entree[1], entree[2]
+        corps = construire()
+        corps_gzip = compresser(corps)
+        with self._verrou:
+            self._entrees[cle] = (version, corps, corps_gzip)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+        return corps, corps_gzip
+
+
+def reponse_liste(request: Request, lignes: List[dict], schema: type) -> Response:
+    """
+    Construit la réponse d'une liste de lignes issues de `Result.mappings()`
+
+    Args:
+        request: Requête en cours (pour la négociation gzip)
+        lignes: Dictionnaires ayant les champs du schéma
+        schema: Modèle Pydantic d'une ligne (celui du `response_model` de la route)
+    """
+    return reponse_json(request, rendre_liste(lignes, schema))
+
+
+def rendre_liste(lignes: List[dict], schema: type) -> bytes:
+    """Corps JSON d'une liste de lignes (validées par le schéma si VALIDATION)"""
+    if VALIDATION:
+        adaptateur = adaptateur_liste(schema)
+        return adaptateur.dump_json(adaptateur.validate_python(lignes))
+    return serialiser([dict(ligne) for ligne in lignes])
+
+
+def assembler(parties: "OrderedDict[str, bytes] | dict") -> bytes:
+    """Objet JSON dont chaque valeur est un corps déjà rendu (sans nouvelle sérialisation)"""
+    return b"{" + b",".join(serialiser(cle) + b":" + corps for cle, corps in parties.items()) + b"}"
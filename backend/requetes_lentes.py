@@ -0,0 +1,144 @@
+"""
+Journal des requêtes SQL lentes
+Toute instruction plus lente que REQUETES_LENTES_SEUIL_MS est journalisée avec ses
+paramètres, la route HTTP d'origine et le plan d'exécution de la base
+(EXPLAIN QUERY PLAN sur SQLite, EXPLAIN sur PostgreSQL). Le plan est calculé
+une seule fois par forme d'instruction puis mis en cache.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metriques
+
+# Seuil en millisecondes (négatif : journal désactivé)
+SEUIL_MS = float(os.getenv("REQUETES_LENTES_SEUIL_MS", "100"))
+# Fichier de journal optionnel (sinon sortie d'erreur)
+FICHIER = os.getenv("REQUETES_LENTES_FICHIER", "")
+TAILLE_CACHE_PLANS = 500
+LONGUEUR_MAX_PARAMETRE = 200
+
+# Seules ces instructions ont un plan d'exécution
+INSTRUCTIONS_EXPLICABLES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+journal = logging.getLogger("requetes_lentes")
+
+_plans: "OrderedDict[str, List[str]]" = OrderedDict()
+_verrou = threading.Lock()
+
+
+def _configurer_journal():
+    if journal.handlers:
+        return
+    gestionnaire = logging.FileHandler(FICHIER, encoding="utf-8") if FICHIER else logging.StreamHandler()
+    gestionnaire.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    journal.addHandler(gestionnaire)
+    journal.setLevel(logging.INFO)
+    journal.propagate = False
+
+
+def _forme(instruction: str) -> str:
+    return " ".join(instruction.split())
+
+
+def _abreger(parametres) -> str:
+    if isinstance(parametres, (list, tuple)) and parametres and isinstance(parametres[0], (list, tuple, dict)):
+        return f"{_abreger(parametres[0])} (+{len(parametres) - 1} lots)"
+    texte = repr(parametres)
+    return texte if len(texte) <= LONGUEUR_MAX_PARAMETRE else texte[:LONGUEUR_MAX_PARAMETRE] + "..."
+
+
+def _expliquer(connexion_dbapi, dialecte: str, instruction: str, parametres) -> List[str]:
+    """Plan d'exécution via un curseur DBAPI brut (hors événements SQLAlchemy)"""
+    if isinstance(parametres, list):  # executemany : un seul jeu de paramètres suffit
+        parametres = parametres[0] if parametres else ()
+    curseur = connexion_dbapi.cursor()
+    try:
+        if dialecte == "sqlite":
+            curseur.execute(f"EXPLAIN QUERY PLAN {instruction}", parametres or ())
+            return [ligne[-1] for ligne in curseur.fetchall()]
+        if dialecte == "postgresql":
+            # Un EXPLAIN en erreur ne doit pas interrompre la transaction en cours
+            curseur.execute("SAVEPOINT explication_requete_lente")
+            try:
+                curseur.execute(f"EXPLAIN {instruction}", parametres or None)
+                return [ligne[0] for ligne in curseur.fetchall()]
+            finally:
+                curseur.execute("ROLLBACK TO SAVEPOINT explication_requete_lente")
+        return []
+    finally:
+        curseur.close()
+
+
+def plan(connexion_dbapi, dialecte: str, instruction: str, parametres) -> List[str]:
+    """Plan d'exécution d'une forme d'instruction (calculé une fois, mis en cache)"""
+    forme = _forme(instruction)
+    with _verrou:
+        if forme in _plans:
+            _plans.move_to_end(forme)
+            return _plans[forme]
+
+    if not forme.upper().startswith(INSTRUCTIONS_EXPLICABLES):
+        lignes = []
+    else:
+        try:
+            lignes = _expliquer(connexion_dbapi, dialecte, instruction, parametres)
+        except Exception as erreur:
+            lignes = [f"plan indisponible : {erreur}"]
+
+    with _verrou:
+        _plans[forme] = lignes
+        if len(_plans) > TAILLE_CACHE_PLANS:
+            _plans.popitem(last=False)
+    return lignes
+
+
+def parcours_complets(lignes_plan: List[str]) -> List[str]:
+    """Tables lues intégralement d'après le plan (SCAN sans index / Seq Scan)"""
+    tables = []
+    for ligne in lignes_plan:
+        mots = ligne.strip().lstrip("->").split()
+        if mots[:2] == ["SCAN", "TABLE"]:  # anciennes versions de SQLite
+            del mots[1]
+        if len(mots) >= 2 and mots[0] == "SCAN" and "INDEX" not in mots:
+            tables.append(mots[1])
+        elif "Seq Scan on" in ligne:
+            tables.append(ligne.split("Seq Scan on", 1)[1].split()[0])
+    return tables
+
+
+def instrumenter_moteur(moteur: Engine, seuil_ms: Optional[float] = None):
+    """Journalise les instructions du moteur plus lentes que le seuil"""
+    seuil = (SEUIL_MS if seuil_ms is None else seuil_ms) / 1000
+    if seuil < 0:
+        return
+    _configurer_journal()
+    dialecte = moteur.dialect.name
+
+    @event.listens_for(moteur, "before_cursor_execute")
+    def _avant(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("debuts_requete_lente", []).append(time.perf_counter())
+
+    @event.listens_for(moteur, "after_cursor_execute")
+    def _apres(conn, cursor, statement, parameters, context, executemany):
+        duree = time.perf_counter() - conn.info["debuts_requete_lente"].pop()
+        if duree < seuil:
+            return
+        lignes_plan = plan(conn.connection.dbapi_connection, dialecte, statement, parameters)
+        scans = parcours_complets(lignes_plan)
+        journal.warning(
+            "requete lente %.1f ms | route=%s | sql=%s | parametres=%s | plan=%s%s",
+            duree * 1000,
+            metriques.route_courante() or "hors_requete",
+            _forme(statement),
+            _abreger(parameters),
+            " / ".join(lignes_plan) or "-",
+            f" | parcours_complets={','.join(scans)}" if scans else "",
+        )
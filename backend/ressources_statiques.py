@@ -0,0 +1,141 @@
+"""
+Pipeline des ressources statiques du frontend
+Au démarrage : nommage par empreinte de contenu, précompression gzip/brotli
+et réécriture des pages HTML vers les noms empreintés.
+Les ressources sont ensuite servies depuis la mémoire avec des ETag forts.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Ressources empreintées : leur contenu ne change jamais pour un nom donné
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+# Pages HTML et noms d'origine : revalidation systématique via l'ETag
+CACHE_REVALIDATION = "no-cache"
+
+TYPES_COMPRESSIBLES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+TAILLE_MIN_COMPRESSION = 256
+
+# Références locales dans les attributs href/src des pages (ex: href="/style.css")
+MOTIF_REFERENCE = re.compile(r'(?P<attribut>href|src)="/(?:static/)?(?P<nom>[^"?#/]+)"')
+
+
+class Ressource:
+    """Contenu d'un fichier en mémoire avec ses variantes compressées"""
+
+    __slots__ = ("contenu", "variantes", "etag", "media_type", "cache_control")
+
+    def __init__(self, contenu: bytes, media_type: str, cache_control: str):
+        self.contenu = contenu
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = f'"{hashlib.sha256(contenu).hexdigest()[:32]}"'
+        self.variantes: Dict[str, bytes] = {}
+
+        if len(contenu) >= TAILLE_MIN_COMPRESSION and media_type.startswith(TYPES_COMPRESSIBLES):
+            compresse = gzip.compress(contenu, compresslevel=9, mtime=0)
+            if len(compresse) < len(contenu):
+                self.variantes["gzip"] = compresse
+            if brotli is not None:
+                compresse = brotli.compress(contenu, quality=11)
+                if len(compresse) < len(contenu):
+                    self.variantes["br"] = compresse
+
+
+def _type_media(nom: str) -> str:
+    if nom.endswith(".js"):
+        return "application/javascript"
+    return mimetypes.guess_type(nom)[0] or "application/octet-stream"
+
+
+def _nom_empreinte(nom: str, contenu: bytes) -> str:
+    base, extension = os.path.splitext(nom)
+    return f"{base}.{hashlib.sha256(contenu).hexdigest()[:10]}{extension}"
+
+
+def construire_ressources(chemin_frontend: str) -> Dict[str, Ressource]:
+    """
+    Charge le dossier frontend en mémoire
+
+    Returns:
+        Dictionnaire {nom servi: Ressource}. Chaque fichier non HTML est servi sous
+        son nom d'origine (revalidé) et sous son nom empreinté (immuable); les pages
+        HTML référencent les noms empreintés.
+    """
+    ressources: Dict[str, Ressource] = {}
+    empreintes: Dict[str, str] = {}
+    pages: Dict[str, bytes] = {}
+
+    for nom in sorted(os.listdir(chemin_frontend)):
+        chemin = os.path.join(chemin_frontend, nom)
+        if not os.path.isfile(chemin):
+            continue
+        with open(chemin, "rb") as fichier:
+            contenu = fichier.read()
+
+        if nom.endswith(".html"):
+            pages[nom] = contenu
+            continue
+
+        media_type = _type_media(nom)
+        nom_empreinte = _nom_empreinte(nom, contenu)
+        empreintes[nom] = nom_empreinte
+        ressources[nom] = Ressource(contenu, media_type, CACHE_REVALIDATION)
+        ressources[nom_empreinte] = Ressource(contenu, media_type, CACHE_IMMUABLE)
+
+    def remplacer(correspondance: re.Match) -> str:
+        nom = correspondance.group("nom")
+        if nom not in empreintes:
+            return correspondance.group(0)
+        return f'{correspondance.group("attribut")}="/{empreintes[nom]}"'
+
+    for nom, contenu in pages.items():
+        html = MOTIF_REFERENCE.sub(remplacer, contenu.decode("utf-8"))
+        ressources[nom] = Ressource(html.encode("utf-8"), _type_media(nom), CACHE_REVALIDATION)
+
+    return ressources
+
+
+def _encodage_accepte(accept_encoding: str, variantes: Dict[str, bytes]) -> Optional[str]:
+    acceptes = set()
+    for element in accept_encoding.split(","):
+        codage, _, parametres = element.strip().partition(";")
+        if parametres.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        acceptes.add(codage.strip().lower())
+    for codage in ("br", "gzip"):
+        if codage in variantes and (codage in acceptes or "*" in acceptes):
+            return codage
+    return None
+
+
+def servir(ressource: Ressource, request: Request) -> Response:
+    """Construit la réponse d'une ressource (304 si l'ETag du client est à jour)"""
+    entetes = {
+        "ETag": ressource.etag,
+        "Cache-Control": ressource.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and ressource.etag in (e.strip() for e in if_none_match.split(",")):
+        return Response(status_code=304, headers=entetes)
+
+    contenu = ressource.contenu
+    codage = _encodage_accepte(request.headers.get("accept-encoding", ""), ressource.variantes)
+    if codage:
+        contenu = ressource.variantes[codage]
+        entetes["Content-Encoding"] = codage
+
+    return Response(content=contenu, media_type=ressource.media_type, headers=entetes)
@@ -0,0 +1,267 @@
+"""
+Modèle de risque d'annulation des rendez-vous
+Entraînement hors ligne d'une régression logistique (NumPy uniquement) sur l'historique
+des rendez-vous, lu en flux par lots pour rester en mémoire bornée
+
+Usage:
+    python risque_annulation.py --epoques 3
+"""
+
+import argparse
+import os
+from datetime import datetime
+from typing import Optional, List
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import StatutRendezVous
+import archivage
+
+# Emplacement du modèle entraîné
+CHEMIN_MODELE = os.getenv(
+    "MODELE_RISQUE_CHEMIN",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "modele_risque.npz")
+)
+
+TAILLE_LOT = 10000
+TAILLE_MINI_LOT = 512
+
+# Les médecins sont projetés par hachage sur un nombre fixe de colonnes,
+# pour que la taille du modèle ne dépende pas du nombre de médecins
+NB_MEDECINS_HACHES = 64
+
+# biais, délai, annulations antérieures, jour (7), heure (24), médecin haché
+NB_CARACTERISTIQUES = 3 + 7 + 24 + NB_MEDECINS_HACHES
+
+# Poids du modèle chargé au démarrage (None si aucun modèle n'a été entraîné)
+_poids: Optional[np.ndarray] = None
+
+
+def construire_caracteristiques(
+        delai_jours: np.ndarray,
+        jour_semaine: np.ndarray,
+        heure: np.ndarray,
+        medecin_id: np.ndarray,
+        annulations_anterieures: np.ndarray
+) -> np.ndarray:
+    """
+    Construit la matrice de caractéristiques à partir de colonnes
+
+    Args:
+        delai_jours: Jours entre la prise du rendez-vous et sa date
+        jour_semaine: Jour de la semaine (0=Lundi)
+        heure: Heure du rendez-vous (0-23)
+        medecin_id: Identifiant du médecin
+        annulations_anterieures: Nombre d'annulations antérieures du patient
+
+    Returns:
+        Matrice (n, NB_CARACTERISTIQUES) en float32
+    """
+    n = len(delai_jours)
+    lignes = np.arange(n)
+    x = np.zeros((n, NB_CARACTERISTIQUES), dtype=np.float32)
+    x[:, 0] = 1.0
+    x[:, 1] = np.log1p(np.clip(delai_jours, 0, 365)) / np.log1p(365)
+    x[:, 2] = np.log1p(np.clip(annulations_anterieures, 0, None))
+    x[lignes, 3 + np.clip(jour_semaine, 0, 6)] = 1.0
+    x[lignes, 10 + np.clip(heure, 0, 23)] = 1.0
+    x[lignes, 34 + medecin_id % NB_MEDECINS_HACHES] = 1.0
+    return x
+
+
+def _sigmoide(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def _lots_historique(db: Session):
+    """
+    Parcourt l'historique par ordre chronologique et produit (X, y) par lot
+
+    Le nombre d'annulations antérieures de chaque patient est tenu dans un tableau
+    indexé par identifiant patient, agrandi au besoin.
+    """
+    # Tout l'historique : table vivante et archive
+    rdv = archivage.historique_complet()
+    requete = select(
+        rdv.patient_id,
+        rdv.medecin_id,
+        rdv.date_heure,
+        rdv.date_creation,
+        rdv.statut,
+    ).order_by(rdv.date_heure.asc(), rdv.id.asc())
+
+    annulations = np.zeros(1024, dtype=np.int32)
+    resultat = db.execute(requete.execution_options(stream_results=True))
+    for lot in resultat.yield_per(TAILLE_LOT).partitions():
+        patients = np.fromiter((l[0] or 0 for l in lot), dtype=np.int64, count=len(lot))
+        medecins = np.fromiter((l[1] or 0 for l in lot), dtype=np.int64, count=len(lot))
+        delais = np.fromiter(
+            ((l[2] - (l[3] or l[2])).days for l in lot), dtype=np.int64, count=len(lot)
+        )
+        jours = np.fromiter((l[2].weekday() for l in lot), dtype=np.int64, count=len(lot))
+        heures = np.fromiter((l[2].hour for l in lot), dtype=np.int64, count=len(lot))
+        y = np.fromiter(
+            (l[4] == StatutRendezVous.ANNULE.value for l in lot), dtype=np.float32, count=len(lot)
+        )
+
+        if patients.max() >= len(annulations):
+            agrandi = np.zeros(int(patients.max()) * 2 + 1, dtype=np.int32)
+            agrandi[:len(annulations)] = annulations
+            annulations = agrandi
+
+        # Annulations antérieures au lot, puis à l'intérieur du lot (rang parmi les annulations
+        # précédentes du même patient dans le lot)
+        anterieures = annulations[patients].astype(np.int64)
+        ordre = np.lexsort((np.arange(len(lot)), patients))
+        cumul = np.cumsum(y[ordre]) - y[ordre]
+        debut_groupe = np.r_[True, patients[ordre][1:] != patients[ordre][:-1]]
+        base = np.maximum.accumulate(np.where(debut_groupe, cumul, 0))
+        anterieures[ordre] += (cumul - base).astype(np.int64)
+        np.add.at(annulations, patients, y.astype(np.int32))
+
+        yield construire_caracteristiques(delais, jours, heures, medecins, anterieures), y
+
+
+def entrainer(
+        db: Session,
+        epoques: int = 3,
+        taux_apprentissage: float = 0.05,
+        regularisation: float = 1e-4
+) -> dict:
+    """
+    Entraîne la régression logistique par descente de gradient (Adam) sur mini-lots
+
+    Chaque époque relit l'historique en flux : la mémoire utilisée est bornée
+    par la taille d'un lot, quel que soit le nombre de rendez-vous.
+
+    Returns:
+        Dictionnaire avec les poids et les statistiques d'entraînement
+    """
+    poids = np.zeros(NB_CARACTERISTIQUES, dtype=np.float64)
+    moment_1 = np.zeros_like(poids)
+    moment_2 = np.zeros_like(poids)
+    beta_1, beta_2 = 0.9, 0.999
+    etape = 0
+    nombre = 0
+    perte = 0.0
+
+    for _ in range(epoques):
+        nombre = 0
+        perte = 0.0
+        for x_lot, y_lot in _lots_historique(db):
+            for debut in range(0, len(y_lot), TAILLE_MINI_LOT):
+                x = x_lot[debut:debut + TAILLE_MINI_LOT]
+                y = y_lot[debut:debut + TAILLE_MINI_LOT]
+                p = _sigmoide(x @ poids)
+                gradient = x.T @ (p - y) / len(y) + regularisation * poids
+
+                etape += 1
+                moment_1 = beta_1 * moment_1 + (1 - beta_1) * gradient
+                moment_2 = beta_2 * moment_2 + (1 - beta_2) * gradient ** 2
+                correction_1 = moment_1 / (1 - beta_1 ** etape)
+                correction_2 = moment_2 / (1 - beta_2 ** etape)
+                poids -= taux_apprentissage * correction_1 / (np.sqrt(correction_2) + 1e-8)
+
+                perte += float(-np.sum(y * np.log(p + 1e-9) + (1 - y) * np.log(1 - p + 1e-9)))
+                nombre += len(y)
+
+    return {
+        "poids": poids,
+        "nombre": nombre,
+        "perte_moyenne": perte / nombre if nombre else None,
+    }
+
+
+def sauvegarder_modele(poids: np.ndarray, chemin: Optional[str] = None):
+    """Enregistre les poids dans un fichier .npz compressé"""
+    np.savez_compressed(
+        chemin or CHEMIN_MODELE,
+        poids=poids.astype(np.float32),
+        nb_medecins_haches=np.int32(NB_MEDECINS_HACHES),
+        date_entrainement=np.bytes_(datetime.utcnow().isoformat())
+    )
+
+
+def charger_modele(chemin: Optional[str] = None) -> bool:
+    """
+    Charge le modèle une fois au démarrage
+
+    Returns:
+        True si un modèle compatible a été chargé
+    """
+    global _poids
+    chemin = chemin or CHEMIN_MODELE
+    if not os.path.exists(chemin):
+        _poids = None
+        return False
+
+    with np.load(chemin) as donnees:
+        if int(donnees["nb_medecins_haches"]) != NB_MEDECINS_HACHES:
+            _poids = None
+            return False
+        _poids = donnees["poids"].astype(np.float64)
+    return True
+
+
+def modele_disponible() -> bool:
+    return _poids is not None
+
+
+def scorer(rendez_vous: List[dict]) -> Optional[np.ndarray]:
+    """
+    Calcule la probabilité d'annulation d'une liste de rendez-vous
+
+    Args:
+        rendez_vous: Dictionnaires avec date_heure, date_creation, medecin_id
+            et annulations_anterieures
+
+    Returns:
+        Tableau de probabilités, ou None si aucun modèle n'est chargé
+    """
+    if _poids is None:
+        return None
+    if not rendez_vous:
+        return np.zeros(0)
+
+    n = len(rendez_vous)
+    dates = [r["date_heure"] for r in rendez_vous]
+    x = construire_caracteristiques(
+        np.fromiter(
+            ((d - (r["date_creation"] or d)).days for d, r in zip(dates, rendez_vous)),
+            dtype=np.int64, count=n
+        ),
+        np.fromiter((d.weekday() for d in dates), dtype=np.int64, count=n),
+        np.fromiter((d.hour for d in dates), dtype=np.int64, count=n),
+        np.fromiter((r["medecin_id"] or 0 for r in rendez_vous), dtype=np.int64, count=n),
+        np.fromiter((r["annulations_anterieures"] for r in rendez_vous), dtype=np.int64, count=n),
+    )
+    return _sigmoide(x @ _poids)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Entraîne le modèle de risque d'annulation")
+    parser.add_argument("--epoques", type=int, default=3)
+    parser.add_argument("--taux", type=float, default=0.05, help="Taux d'apprentissage initial")
+    parser.add_argument("--sortie", default=CHEMIN_MODELE, help="Fichier du modèle (.npz)")
+    arguments = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        resultat = entrainer(db, epoques=arguments.epoques, taux_apprentissage=arguments.taux)
+    finally:
+        db.close()
+
+    if not resultat["nombre"]:
+        print("⚠️ Aucun rendez-vous dans l'historique, modèle non enregistré")
+    else:
+        sauvegarder_modele(resultat["poids"], arguments.sortie)
+        print(f"✅ Modèle entraîné sur {resultat['nombre']} rendez-vous")
+        print(f"   - Perte moyenne : {resultat['perte_moyenne']:.4f}")
+        print(f"   - Enregistré dans {arguments.sortie}")
@@ -3,8 +3,8 @@ Schémas Pydantic pour la validation des données API
 """
 
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Union
+from datetime import datetime, date
 
 
 # ==================== Schémas Utilisateur ====================
@@ -147,6 +147,15 @@ class RendezVousAdminReponse(BaseModel):
     statut: str
     motif: Optional[str]
     notes: Optional[str]
+    risque_annulation: Optional[float] = None
+
+
+class RechercheReponse(BaseModel):
+    type: str  # "patients" ou "rendez_vous"
+    page: int
+    taille: int
+    suivant: bool  # une page suivante existe
+    resultats: List[Union[UtilisateurAdminReponse, RendezVousAdminReponse]]
 
 
 class RendezVousUpdateRequete(BaseModel):
@@ -181,12 +190,52 @@ class NotificationReponse(BaseModel):
         from_attributes = True
 
 
+class NotificationMasseRequete(BaseModel):
+    sujet: str
+    message: str
+    canal: Optional[str] = "placeholder"
+    role: Optional[str] = None
+    medecin_id: Optional[int] = None
+    date_debut: Optional[str] = None  # YYYY-MM-DD
+    date_fin: Optional[str] = None  # YYYY-MM-DD
+
+
+class TacheNotificationReponse(BaseModel):
+    tache_id: str
+    statut: str
+    total: int
+    inseres: int
+    progression: float
+    erreur: Optional[str] = None
+    date_creation: datetime
+    date_fin: Optional[datetime] = None
+
+
+# ==================== Import en masse ====================
+
+class ErreurImport(BaseModel):
+    ligne: int
+    erreur: str
+
+
+class ImportReponse(BaseModel):
+    type: str  # "patients", "medecins" ou "horaires"
+    lues: int
+    inserees: int
+    rejetees: int
+    erreurs: List[ErreurImport] = []  # les IMPORT_ERREURS_MAX premières
+    duree_s: float
+
+
 # ==================== ML Placeholder ====================
 
 class MLPlaceholderRequete(BaseModel):
     contexte: Optional[str] = None
     specialite: Optional[str] = None
-    date: Optional[str] = None
+    date: Optional[str] = None  # YYYY-MM-DD, date préférée
+    patient_id: Optional[int] = None
+    jours: int = 7
+    limite: int = 10
 
 
 class MLPlaceholderReponse(BaseModel):
@@ -194,3 +243,26 @@ class MLPlaceholderReponse(BaseModel):
     suggestions: List[dict] = []
     message: Optional[str] = None
 
+
+# ==================== Prévisions ====================
+
+class PrevisionDemandeReponse(BaseModel):
+    specialite: str
+    date: date
+    jour_semaine: int
+    heure: int
+    valeur: float
+
+    class Config:
+        from_attributes = True
+
+
+# ==================== Tableau de bord ====================
+
+class TableauDeBordReponse(BaseModel):
+    """Données d'ouverture d'un tableau de bord; seules les listes du rôle sont présentes"""
+    utilisateur: UtilisateurAuthReponse
+    medecins: List[MedecinReponse]
+    utilisateurs: Optional[List[UtilisateurAdminReponse]] = None  # admin
+    rendez_vous: Optional[List[RendezVousAdminReponse]] = None  # admin, secrétaire, médecin
+    previsions: Optional[List[PrevisionDemandeReponse]] = None  # admin
@@ -0,0 +1,80 @@
+"""
+Normalisation des spécialités médicales
+Forme repliée (sans accents ni majuscules, espaces réduits) stockée dans la colonne
+indexée `medecins.specialite_normalisee`, et synonymes courants ("cardio",
+"dentaire", "généraliste"...) ramenés à la spécialité correspondante.
+La recherche se fait par égalité ou préfixe sur la forme repliée, jamais par
+LIKE '%...%'.
+"""
+
+import re
+import unicodedata
+from typing import Optional
+
+# Forme repliée du synonyme -> forme repliée de la spécialité
+SYNONYMES = {
+    "cardio": "cardiologie",
+    "cardiologue": "cardiologie",
+    "coeur": "cardiologie",
+    "dentaire": "dentiste",
+    "dents": "dentiste",
+    "chirurgien dentiste": "dentiste",
+    "generaliste": "medecine generale",
+    "medecin generaliste": "medecine generale",
+    "medecin traitant": "medecine generale",
+    "pediatre": "pediatrie",
+    "enfant": "pediatrie",
+    "enfants": "pediatrie",
+    "dermato": "dermatologie",
+    "dermatologue": "dermatologie",
+    "peau": "dermatologie",
+    "gyneco": "gynecologie",
+    "gynecologue": "gynecologie",
+    "ophtalmo": "ophtalmologie",
+    "ophtalmologue": "ophtalmologie",
+    "yeux": "ophtalmologie",
+    "oto rhino laryngologie": "orl",
+    "psy": "psychiatrie",
+    "psychiatre": "psychiatrie",
+    "rhumato": "rhumatologie",
+    "rhumatologue": "rhumatologie",
+    "neuro": "neurologie",
+    "neurologue": "neurologie",
+    "kine": "kinesitherapie",
+    "kinesitherapeute": "kinesitherapie",
+}
+
+_SEPARATEURS = re.compile(r"[\s\-'’_/]+")
+
+
+def normaliser(texte: Optional[str]) -> str:
+    """Forme repliée : minuscules, sans accents, séparateurs réduits à un espace"""
+    if not texte:
+        return ""
+    decompose = unicodedata.normalize("NFKD", texte.casefold())
+    sans_accents = "".join(caractere for caractere in decompose if not unicodedata.combining(caractere))
+    return _SEPARATEURS.sub(" ", sans_accents).strip()
+
+
+def terme_recherche(texte: Optional[str]) -> str:
+    """Forme repliée d'une saisie utilisateur, synonymes résolus"""
+    terme = normaliser(texte)
+    return SYNONYMES.get(terme, terme)
+
+
+def borne_prefixe(prefixe: str) -> str:
+    """Borne supérieure exclue des chaînes commençant par `prefixe` (recherche par intervalle)"""
+    return prefixe[:-1] + chr(ord(prefixe[-1]) + 1)
+
+
+def filtre_sql(colonne, texte: Optional[str]):
+    """
+    Condition SQL de recherche par préfixe sur une colonne normalisée
+
+    Un intervalle [préfixe, borne) utilise l'index B-tree sur tous les moteurs,
+    contrairement à LIKE dont l'optimisation dépend de la collation.
+    """
+    terme = terme_recherche(texte)
+    if not terme:
+        return None
+    return (colonne >= terme) & (colonne < borne_prefixe(terme))
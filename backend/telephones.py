@@ -0,0 +1,134 @@
+"""
+Identité téléphonique des patients
+Les numéros sont ramenés à une forme canonique E.164 ("06 12 34 56 78",
+"0612345678" et "+33612345678" donnent "+33612345678"), stockée dans la colonne
+`utilisateurs.telephone_normalise`, unique parmi les patients (index partiel).
+Un numéro absent ou factice ("0000000000") n'a pas de forme canonique (NULL) :
+il n'identifie personne et n'est jamais fusionné.
+
+Usage:
+    python telephones.py --dedoublonner   # fusionne les patients ayant le même numéro
+"""
+
+import argparse
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+INDICATIF_PAR_DEFAUT = "33"
+TAILLE_LOT = 5000
+
+_NON_CHIFFRES = re.compile(r"\D")
+
+
+def normaliser(telephone: Optional[str]) -> Optional[str]:
+    """Forme E.164 du numéro, ou None s'il est absent, factice ou invalide"""
+    if not telephone:
+        return None
+    brut = telephone.strip()
+    chiffres = _NON_CHIFFRES.sub("", brut)
+    if brut.startswith("+"):
+        international = chiffres
+    elif chiffres.startswith("00"):
+        international = chiffres[2:]
+    elif len(chiffres) == 10 and chiffres.startswith("0"):
+        international = INDICATIF_PAR_DEFAUT + chiffres[1:]
+    elif len(chiffres) == 11 and chiffres.startswith(INDICATIF_PAR_DEFAUT):
+        international = chiffres
+    else:
+        return None
+    # Numéro national nul ("0000000000") ou longueur hors norme E.164
+    if not 8 <= len(international) <= 15 or not international[2:].strip("0"):
+        return None
+    return "+" + international
+
+
+# ==================== Dédoublonnage ====================
+
+def _doublons(connexion: Connection) -> Dict[int, int]:
+    """{id du patient en double: id du patient conservé (le plus ancien)}"""
+    from models import RoleUtilisateur
+
+    conserves: Dict[str, int] = {}
+    fusion: Dict[int, int] = {}
+    curseur = connexion.execution_options(stream_results=True, yield_per=TAILLE_LOT).execute(
+        text("SELECT id, telephone FROM utilisateurs WHERE role = :role ORDER BY id"),
+        {"role": RoleUtilisateur.PATIENT.value}
+    )
+    for identifiant, telephone in curseur:
+        canonique = normaliser(telephone)
+        if canonique is None:
+            continue
+        if canonique in conserves:
+            fusion[identifiant] = conserves[canonique]
+        else:
+            conserves[canonique] = identifiant
+    return fusion
+
+
+def dedoublonner_patients(connexion: Connection) -> dict:
+    """
+    Fusionne les patients ayant le même numéro canonique dans le plus ancien
+
+    Les rendez-vous et notifications des doublons sont rattachés au patient
+    conservé par des UPDATE ensemblistes (table temporaire de correspondance),
+    puis les doublons sont supprimés. À exécuter dans une transaction.
+    """
+    fusion = _doublons(connexion)
+    if not fusion:
+        return {"doublons": 0, "rendez_vous": 0, "notifications": 0}
+
+    connexion.execute(text(
+        "CREATE TEMPORARY TABLE fusion_patients (doublon INTEGER PRIMARY KEY, conserve INTEGER NOT NULL)"
+    ))
+    try:
+        paires: List[dict] = [{"doublon": doublon, "conserve": conserve} for doublon, conserve in fusion.items()]
+        for debut in range(0, len(paires), TAILLE_LOT):
+            connexion.execute(
+                text("INSERT INTO fusion_patients (doublon, conserve) VALUES (:doublon, :conserve)"),
+                paires[debut:debut + TAILLE_LOT]
+            )
+        comptes = {"doublons": len(fusion)}
+        for table, colonne in (("rendez_vous", "patient_id"), ("notifications", "utilisateur_id")):
+            comptes[table] = connexion.execute(text(
+                f"UPDATE {table} SET {colonne} = "
+                f"(SELECT conserve FROM fusion_patients WHERE doublon = {table}.{colonne}) "
+                f"WHERE {colonne} IN (SELECT doublon FROM fusion_patients)"
+            )).rowcount
+        connexion.execute(text("DELETE FROM utilisateurs WHERE id IN (SELECT doublon FROM fusion_patients)"))
+    finally:
+        connexion.execute(text("DROP TABLE fusion_patients"))
+    return comptes
+
+
+def remplir_forme_canonique(connexion: Connection):
+    """Calcule `telephone_normalise` de tous les utilisateurs (après dédoublonnage)"""
+    lignes = [
+        {"id": identifiant, "normalise": normaliser(telephone)}
+        for identifiant, telephone in connexion.execute(text("SELECT id, telephone FROM utilisateurs"))
+    ]
+    for debut in range(0, len(lignes), TAILLE_LOT):
+        connexion.execute(
+            text("UPDATE utilisateurs SET telephone_normalise = :normalise WHERE id = :id"),
+            lignes[debut:debut + TAILLE_LOT]
+        )
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Identité téléphonique des patients")
+    parser.add_argument("--dedoublonner", action="store_true",
+                        help="Fusionne les patients ayant le même numéro canonique")
+    arguments = parser.parse_args()
+
+    if arguments.dedoublonner:
+        with engine.begin() as connexion_base:
+            resultat = dedoublonner_patients(connexion_base)
+            remplir_forme_canonique(connexion_base)
+        print(f"✅ {resultat['doublons']} patient(s) fusionné(s), "
+              f"{resultat['rendez_vous']} rendez-vous et {resultat['notifications']} notification(s) rattachés")
+    else:
+        parser.print_help()
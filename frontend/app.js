@@ -16,7 +16,8 @@ let state = {
     historiqueChat: [],
     chatOuvert: false,
     enChargement: false,
-    utilisateur: null
+    utilisateur: null,
+    cleReservation: null  // Idempotency-Key réutilisée si la réservation est renvoyée
 };
 
 // ==================== Initialisation ====================
@@ -284,16 +285,24 @@ async function gererSoumissionFormulaire(event) {
         return;
     }
 
+    // Une même clé tant que la réservation n'a pas reçu de réponse :
+    // un double clic ou un renvoi après coupure ne crée pas de doublon
+    if (!state.cleReservation) {
+        state.cleReservation = crypto.randomUUID();
+    }
+
     try {
         const reponse = await fetch(`${CONFIG.API_URL}/api/rendez-vous`, {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Idempotency-Key': state.cleReservation
             },
             body: JSON.stringify(donnees)
         });
 
         const resultat = await reponse.json();
+        state.cleReservation = null;
 
         if (resultat.succes) {
             afficherConfirmation(resultat);
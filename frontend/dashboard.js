@@ -5,22 +5,12 @@ let allUsers = [];
 let allDoctors = [];
 
 document.addEventListener('DOMContentLoaded', async () => {
-    await checkAuth();
-    setupNavigation();
     await loadData();
+    setupNavigation();
     setupForms();
 });
 
 // ==================== Authentication ====================
-async function checkAuth() {
-    try {
-        const res = await fetch(`${API_URL}/api/auth/me`, { credentials: 'include' });
-        if (!res.ok) { window.location.href = '/login.html'; return; }
-        currentUser = await res.json();
-        updateUserDisplay();
-    } catch (e) { window.location.href = '/login.html'; }
-}
-
 function updateUserDisplay() {
     const el = (id) => document.getElementById(id);
     if (el('userName')) el('userName').textContent = currentUser.nom;
@@ -56,29 +46,39 @@ function showSection(sectionId) {
 function toggleSidebar() { document.getElementById('sidebar').classList.toggle('open'); }
 
 // ==================== Data Loading ====================
+// Un seul appel authentifié : profil et toutes les listes du rôle
 async function loadData() {
+    let data;
     try {
-        if (currentUser.role === 'admin') await loadAdminData();
-        else if (currentUser.role === 'secretaire') await loadSecretaryData();
-        else if (currentUser.role === 'medecin') await loadDoctorData();
-        else if (currentUser.role === 'patient') await loadPatientData();
-        await loadDoctorsList();
-    } catch (e) { console.error('Error:', e); showToast('Erreur de chargement', 'error'); }
+        const res = await fetch(`${API_URL}/api/dashboard/bootstrap`, { credentials: 'include' });
+        if (res.status === 401) { window.location.href = '/login.html'; return; }
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        data = await res.json();
+    } catch (e) {
+        if (!currentUser) { window.location.href = '/login.html'; return; }
+        console.error('Error:', e); showToast('Erreur de chargement', 'error'); return;
+    }
+    currentUser = data.utilisateur;
+    updateUserDisplay();
+    if (currentUser.role === 'admin') showAdminData(data);
+    else if (currentUser.role === 'secretaire') showSecretaryData(data.rendez_vous);
+    else if (currentUser.role === 'medecin') showDoctorData(data.rendez_vous);
+    else if (currentUser.role === 'patient') showPatientData();
+    allDoctors = data.medecins;
+    renderDoctorsGrid();
 }
 
-async function loadAdminData() {
-    const usersRes = await fetch(`${API_URL}/api/admin/users`, { credentials: 'include' });
-    if (usersRes.ok) {
-        allUsers = await usersRes.json();
-        updateEl('totalUsers', allUsers.length);
-        updateEl('totalMedecins', allUsers.filter(u => u.role === 'medecin').length);
-        renderUsersTable();
-    }
-    await loadAllAppointments();
+function showAdminData(data) {
+    allUsers = data.utilisateurs;
+    updateEl('totalUsers', allUsers.length);
+    updateEl('totalMedecins', allUsers.filter(u => u.role === 'medecin').length);
+    renderUsersTable();
+    showAllAppointments(data.rendez_vous);
+    renderForecastTable(data.previsions);
 }
 
-async function loadSecretaryData() {
-    await loadAllAppointments();
+function showSecretaryData(rendezVous) {
+    showAllAppointments(rendezVous);
     const today = new Date().toISOString().split('T')[0];
     const todayRdv = allAppointments.filter(r => r.date_heure.startsWith(today));
     updateEl('todayRdv', todayRdv.length);
@@ -88,44 +88,33 @@ async function loadSecretaryData() {
     renderTodayAppointments(todayRdv);
 }
 
-async function loadDoctorData() {
-    const res = await fetch(`${API_URL}/api/medecin/rendez-vous`, { credentials: 'include' });
-    if (res.ok) {
-        allAppointments = await res.json();
-        const today = new Date().toISOString().split('T')[0];
-        const todayRdv = allAppointments.filter(r => r.date_heure.startsWith(today));
-        updateEl('todayRdv', todayRdv.length);
-        updateEl('weekRdv', allAppointments.length);
-        const patients = new Set(allAppointments.map(r => r.patient_id));
-        updateEl('totalPatients', patients.size);
-        if (todayRdv.length > 0) {
-            updateEl('nextRdv', new Date(todayRdv[0].date_heure).toLocaleTimeString('fr-FR', {hour:'2-digit', minute:'2-digit'}));
-        }
-        renderDoctorAppointments(todayRdv);
+function showDoctorData(rendezVous) {
+    allAppointments = rendezVous;
+    const today = new Date().toISOString().split('T')[0];
+    const todayRdv = allAppointments.filter(r => r.date_heure.startsWith(today));
+    updateEl('todayRdv', todayRdv.length);
+    updateEl('weekRdv', allAppointments.length);
+    const patients = new Set(allAppointments.map(r => r.patient_id));
+    updateEl('totalPatients', patients.size);
+    if (todayRdv.length > 0) {
+        updateEl('nextRdv', new Date(todayRdv[0].date_heure).toLocaleTimeString('fr-FR', {hour:'2-digit', minute:'2-digit'}));
     }
+    renderDoctorAppointments(todayRdv);
 }
 
-async function loadPatientData() {
+function showPatientData() {
     updateEl('upcomingRdv', 0);
     updateEl('completedRdv', 0);
     updateEl('nextRdvDate', '-');
     renderPatientAppointments([]);
 }
 
-async function loadAllAppointments() {
-    const res = await fetch(`${API_URL}/api/admin/rendez-vous`, { credentials: 'include' });
-    if (res.ok) {
-        allAppointments = await res.json();
-        updateEl('totalRdv', allAppointments.length);
-        updateEl('rdvConfirmes', allAppointments.filter(r => r.statut === 'confirme').length);
-        renderAppointmentsTable();
-        renderAllAppointmentsTable();
-    }
-}
-
-async function loadDoctorsList() {
-    const res = await fetch(`${API_URL}/api/medecins`);
-    if (res.ok) { allDoctors = await res.json(); renderDoctorsGrid(); }
+function showAllAppointments(rendezVous) {
+    allAppointments = rendezVous;
+    updateEl('totalRdv', allAppointments.length);
+    updateEl('rdvConfirmes', allAppointments.filter(r => r.statut === 'confirme').length);
+    renderAppointmentsTable();
+    renderAllAppointmentsTable();
 }
 
 // ==================== Rendering ====================
@@ -251,6 +240,25 @@ function renderUsersTable() {
     </tr>`).join('');
 }
 
+function renderForecastTable(forecasts) {
+    const tbody = document.getElementById('forecastTableBody');
+    if (!tbody) return;
+    if (forecasts.length === 0) { tbody.innerHTML = '<tr><td colspan="4" class="loading-cell">Aucune prévision</td></tr>'; return; }
+    const days = {};
+    forecasts.forEach(f => {
+        const key = `${f.date}|${f.specialite}`;
+        if (!days[key]) days[key] = { date: f.date, specialite: f.specialite, total: 0, peak: f };
+        days[key].total += f.valeur;
+        if (f.valeur > days[key].peak.valeur) days[key].peak = f;
+    });
+    tbody.innerHTML = Object.values(days).map(d => `<tr>
+        <td>${new Date(d.date).toLocaleDateString('fr-FR', {weekday:'short', day:'numeric', month:'short'})}</td>
+        <td>${d.specialite}</td>
+        <td><strong>${d.total.toFixed(1)}</strong></td>
+        <td>${String(d.peak.heure).padStart(2, '0')}h</td>
+    </tr>`).join('');
+}
+
 function renderDoctorsGrid() {
     const container = document.getElementById('doctorsGrid');
     if (!container) return;